@@ -0,0 +1,422 @@
+#!/usr/bin/env python
+"""IVF approximate nearest-neighbour index for the pure vector method.
+
+Pure vector search scores every ``semantic_chunks`` embedding, so its cost
+grows linearly with the index. This module clusters the normalized
+embeddings of all shards with k-means (``nlist`` centroids) and, at query
+time, scores only the chunks in the ``nprobe`` closest clusters.
+
+* ``nlist`` (build) and ``nprobe`` (query) trade recall for latency.
+* ``insert()`` appends re-embedded chunks to their nearest existing
+  cluster and tombstones the rows they replace, so the index follows
+  incremental re-embedding without retraining; ``build`` again once many
+  rows have churned. embed_pipeline.py ``sync`` calls ``delete_file`` and
+  ``insert`` for every file it writes, then ``mark_current`` per shard.
+* Staleness is tracked per shard on ``semantic_chunks`` alone: the meta
+  file records each shard's row count and id high-water mark
+  (``chunk_state``) when it was last indexed, so edits to other tables and
+  shards updated through ``insert`` do not leave the index stale.
+
+Files next to the shards:
+
+* ``_ann_vectors.f32``  N x dim float32, append-only, memory-mapped
+* ``_ann_centroids.npy`` nlist x dim float32
+* ``_ann_rows.db``      row -> (shard, chunk id, file path, list id, deleted)
+* ``_ann_ivf.json``     dim, nlist, row count, per-shard chunk states
+
+Usage::
+
+    python ann_index.py build INDEX_ROOT [--nlist N]
+    python ann_index.py bench INDEX_ROOT [--nprobe 1,4,16] [--queries 100]
+    python ann_index.py bench --synthetic 200000 --dim 384
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+from binary_index import iter_shard_vectors
+from index_shards import build_path, find_index_dbs, open_readonly, read_meta, write_meta
+
+VECTORS_NAME = "_ann_vectors.f32"
+CENTROIDS_NAME = "_ann_centroids.npy"
+ROWS_NAME = "_ann_rows.db"
+META_NAME = "_ann_ivf.json"
+SCHEMA_VERSION = 2
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("ann_index requires numpy: pip install numpy")
+
+
+def normalize(vectors: "np.ndarray") -> "np.ndarray":
+    """L2-normalize rows so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def assign(vectors: "np.ndarray", centroids: "np.ndarray", block_rows: int = 16384) -> "np.ndarray":
+    """Nearest centroid per row, in blocks so the score matrix stays small."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_rows):
+        block = vectors[start:start + block_rows]
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+def kmeans(vectors: "np.ndarray", nlist: int, iterations: int = 20, seed: int = 0) -> "np.ndarray":
+    """Spherical k-means on normalized vectors; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        filled = np.flatnonzero(counts)
+        offsets = np.concatenate(([0], np.cumsum(counts[filled])[:-1]))
+        sums[filled] = np.add.reduceat(vectors[order], offsets, axis=0)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points instead of dropping them
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def chunk_state(db_path: str) -> str:
+    """Row count and id high-water mark of a shard's semantic_chunks.
+
+    Every insert or delete moves one of them; codexlens replaces rows rather
+    than updating embeddings in place.
+    """
+    conn = open_readonly(db_path)
+    try:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "semantic_chunks" not in tables:
+            return ""
+        count, top = conn.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM semantic_chunks").fetchone()
+        if "sqlite_sequence" in tables:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'semantic_chunks'").fetchone()
+            top = max(top, row[0] if row else 0)
+    finally:
+        conn.close()
+    return f"{count}:{top}"
+
+
+def chunk_states(index_root: str, index_files: Optional[List[str]] = None) -> Dict[str, str]:
+    """Shard path relative to index_root -> chunk_state."""
+    return {os.path.relpath(db_path, index_root): chunk_state(db_path)
+            for db_path in (index_files if index_files is not None else find_index_dbs(index_root))}
+
+
+def default_nlist(count: int) -> int:
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+
+def build(index_root: str, nlist: Optional[int] = None, train_per_list: int = 64) -> dict:
+    """Train centroids over every shard's embeddings and write the IVF index."""
+    _require_numpy()
+    index_files = find_index_dbs(index_root)
+    states = chunk_states(index_root, index_files)
+
+    rows: List[Tuple[str, int, str]] = []
+    vectors: List["np.ndarray"] = []
+    dim: Optional[int] = None
+    for db_path in index_files:
+        shard = os.path.relpath(db_path, index_root)
+        for chunk_id, file_path, blob in iter_shard_vectors(db_path):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            dim = dim or vector.size
+            if vector.size != dim:
+                continue
+            vectors.append(vector)
+            rows.append((shard, chunk_id, file_path))
+
+    matrix = normalize(np.vstack(vectors)) if vectors else np.zeros((0, dim or 0), dtype=np.float32)
+    return write_index(index_root, matrix, rows, nlist, states, train_per_list)
+
+
+def write_index(index_root: str, matrix: "np.ndarray", rows: Sequence[Tuple[str, int, str]],
+                nlist: Optional[int], shards: Dict[str, str], train_per_list: int = 64) -> dict:
+    """Train on a sample of train_per_list points per centroid, then assign every row."""
+    count, dim = matrix.shape
+    nlist = min(nlist or default_nlist(count), max(count, 1))
+    max_train = nlist * train_per_list
+    rng = np.random.default_rng(0)
+    sample = matrix if count <= max_train else matrix[rng.choice(count, size=max_train, replace=False)]
+    centroids = kmeans(sample, nlist) if count else np.zeros((0, dim), dtype=np.float32)
+    assignment = assign(matrix, centroids) if count else np.zeros(0, dtype=np.int64)
+
+    paths = [os.path.join(index_root, name) for name in (VECTORS_NAME, CENTROIDS_NAME, ROWS_NAME)]
+    tmp_vectors, tmp_centroids, tmp_rows = [build_path(path) for path in paths]
+    matrix.astype(np.float32).tofile(tmp_vectors)
+    with open(tmp_centroids, "wb") as f:
+        np.save(f, centroids)
+
+    conn = sqlite3.connect(tmp_rows)
+    conn.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, shard TEXT NOT NULL, chunk_id INTEGER NOT NULL,"
+                 " file_path TEXT NOT NULL, list_id INTEGER NOT NULL, deleted INTEGER NOT NULL DEFAULT 0)")
+    conn.execute("CREATE INDEX idx_rows_chunk ON rows (shard, chunk_id)")
+    conn.execute("CREATE INDEX idx_rows_file ON rows (shard, file_path)")
+    conn.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, 0)",
+                     [(i, shard, chunk_id, path, int(assignment[i]))
+                      for i, (shard, chunk_id, path) in enumerate(rows)])
+    conn.commit()
+    conn.close()
+    for tmp_path, path in zip((tmp_vectors, tmp_centroids, tmp_rows), paths):
+        os.replace(tmp_path, path)
+
+    meta = {"schema_version": SCHEMA_VERSION, "dim": int(dim), "nlist": int(nlist), "count": int(count),
+            "metric": "cosine", "shards": shards, "built_at": time.time()}
+    write_meta(index_root, META_NAME, meta)
+    return meta
+
+
+class IVFIndex:
+    """Query and incrementally extend a built IVF index."""
+
+    def __init__(self, index_root: str):
+        _require_numpy()
+        self.index_root = index_root
+        self.meta = read_meta(index_root, META_NAME, SCHEMA_VERSION)
+        self.dim = self.meta["dim"]
+        self.centroids = np.load(os.path.join(index_root, CENTROIDS_NAME))
+        self._rows = sqlite3.connect(os.path.join(index_root, ROWS_NAME), check_same_thread=False)
+        # Indexes built before delete_file looked rows up by file lack this one
+        self._rows.execute("CREATE INDEX IF NOT EXISTS idx_rows_file ON rows (shard, file_path)")
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def open(cls, index_root: str) -> Optional["IVFIndex"]:
+        """The index under index_root, or None when it has not been built."""
+        if not os.path.exists(os.path.join(index_root, META_NAME)):
+            return None
+        return cls(index_root)
+
+    def _write_meta(self) -> None:
+        write_meta(self.index_root, META_NAME, self.meta)
+
+    def _load(self) -> None:
+        """Read every row's list and tombstone once; insert/delete_file then update in place."""
+        listing = self._rows.execute("SELECT list_id, deleted FROM rows ORDER BY row").fetchall()
+        self.count = len(listing)
+        self._map_vectors()
+        state = np.array(listing, dtype=np.int64).reshape(-1, 2)
+        self.deleted = state[:, 1].astype(bool)
+        live = np.flatnonzero(~self.deleted)
+        assignment = state[live, 0]
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        # Live rows per inverted list, ascending
+        self._lists = [live[order[offsets[i]:offsets[i + 1]]] for i in range(len(self.centroids))]
+
+    def _map_vectors(self) -> None:
+        path = os.path.join(self.index_root, VECTORS_NAME)
+        if self.count:
+            self.vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+    def _tombstone(self, found: Sequence[Tuple[int, int]]) -> None:
+        """Drop (row, list id) pairs from the in-memory lists and mark them deleted."""
+        by_list: dict = {}
+        for row, list_id in found:
+            by_list.setdefault(list_id, []).append(row)
+            self.deleted[row] = True
+        for list_id, rows in by_list.items():
+            members = self._lists[list_id]
+            self._lists[list_id] = members[~np.isin(members, rows)]
+
+    def is_stale(self) -> bool:
+        """True when a shard's semantic_chunks changed, or a shard was added or removed, since indexing."""
+        return chunk_states(self.index_root) != self.meta.get("shards")
+
+    def mark_current(self, shard: str, state: str) -> None:
+        """Record that shard's rows are up to date as of its chunk_state (after insert/delete_file)."""
+        with self._lock:
+            self.meta["shards"][shard] = state
+            self._write_meta()
+
+    def exact(self, query: "np.ndarray", k: int = 10) -> List[Tuple[int, float]]:
+        """Brute-force cosine top-k over every live row (the current pure vector path)."""
+        scores = self.vectors @ normalize(query)
+        scores[self.deleted] = -np.inf
+        return _topk(np.arange(self.count), scores, k)
+
+    def search(self, query: "np.ndarray", k: int = 10, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """Approximate cosine top-k from the nprobe nearest clusters."""
+        query = normalize(query)
+        nprobe = min(nprobe, len(self.centroids))
+        if nprobe <= 0:
+            return []
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidates = np.concatenate([self._lists[p] for p in probes])
+        if candidates.size == 0:
+            return []
+        candidates.sort()  # sequential reads from the memory map
+        return _topk(candidates, self.vectors[candidates] @ query, k)
+
+    def resolve(self, hits: List[Tuple[int, float]]) -> List[dict]:
+        results = []
+        for row, score in hits:
+            shard, chunk_id, path = self._rows.execute(
+                "SELECT shard, chunk_id, file_path FROM rows WHERE row = ?", (row,)).fetchone()
+            results.append({"row": row, "shard": shard, "chunk_id": chunk_id, "path": path, "score": score})
+        return results
+
+    def insert(self, items: Sequence[Tuple[str, int, str, "np.ndarray"]]) -> int:
+        """Add re-embedded chunks as (shard, chunk id, file path, vector).
+
+        Rows for the same (shard, chunk id) are tombstoned first, so
+        re-embedding a chunk replaces it rather than duplicating it.
+        """
+        if not items:
+            return 0
+        with self._lock:
+            matrix = normalize(np.vstack([vector for _, _, _, vector in items]))
+            assignment = assign(matrix, self.centroids)
+            replaced = [found for shard, chunk_id, _, _ in items for found in self._rows.execute(
+                "SELECT row, list_id FROM rows WHERE shard = ? AND chunk_id = ? AND deleted = 0",
+                (shard, chunk_id)).fetchall()]
+            self._rows.executemany("UPDATE rows SET deleted = 1 WHERE row = ?", [(row,) for row, _ in replaced])
+            self._rows.executemany(
+                "INSERT INTO rows VALUES (?, ?, ?, ?, ?, 0)",
+                [(self.count + i, shard, chunk_id, path, int(assignment[i]))
+                 for i, (shard, chunk_id, path, _) in enumerate(items)])
+            with open(os.path.join(self.index_root, VECTORS_NAME), "ab") as f:
+                f.write(matrix.astype(np.float32).tobytes())
+            self._rows.commit()
+            self.meta["count"] = self.count + len(items)
+            self._write_meta()
+
+            self._tombstone(replaced)
+            first = self.count
+            self.count += len(items)
+            self._map_vectors()
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(items), dtype=bool)])
+            for list_id in np.unique(assignment):
+                # New rows are numbered after every existing row, so lists stay ascending
+                added = first + np.flatnonzero(assignment == list_id)
+                self._lists[list_id] = np.concatenate([self._lists[list_id], added])
+        return len(items)
+
+    def delete_file(self, shard: str, file_path: str) -> int:
+        """Tombstone every row of a file (removed or about to be re-embedded)."""
+        with self._lock:
+            found = self._rows.execute("SELECT row, list_id FROM rows WHERE shard = ? AND file_path = ?"
+                                       " AND deleted = 0", (shard, file_path)).fetchall()
+            self._rows.executemany("UPDATE rows SET deleted = 1 WHERE row = ?", [(row,) for row, _ in found])
+            self._rows.commit()
+            self._tombstone(found)
+        return len(found)
+
+    def close(self) -> None:
+        self._rows.close()
+
+
+def _topk(rows: "np.ndarray", scores: "np.ndarray", k: int) -> List[Tuple[int, float]]:
+    """Top-k by descending score, ties by row, as (row, score)."""
+    k = min(k, int(np.isfinite(scores).sum()))
+    if k <= 0:
+        return []
+    part = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    order = np.lexsort((rows[part], -scores[part]))
+    return [(int(rows[part[i]]), float(scores[part[i]])) for i in order]
+
+
+def recall_at_k(approx: List[Tuple[int, float]], exact: List[Tuple[int, float]]) -> float:
+    truth = {row for row, _ in exact}
+    return len(truth & {row for row, _ in approx}) / len(truth) if truth else 1.0
+
+
+def _synthetic_index(count: int, dim: int, clusters: int = 256) -> str:
+    """Clustered random embeddings (more realistic than uniform noise for IVF)."""
+    root = tempfile.mkdtemp(prefix="ann-index-bench-")
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    matrix = normalize(centers[labels] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32))
+    write_index(root, matrix, [("synthetic", i, f"chunk_{i}") for i in range(count)], None, {})
+    return root
+
+
+def bench(args: argparse.Namespace) -> int:
+    _require_numpy()
+    root = _synthetic_index(args.synthetic, args.dim) if args.synthetic else args.index_root
+    index = IVFIndex(root)
+    live = np.flatnonzero(~index.deleted)
+    if live.size == 0:
+        print("index is empty")
+        return 1
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(live, size=min(args.queries, live.size), replace=False)
+    queries = np.asarray(index.vectors[picks]) + 0.05 * rng.normal(size=(len(picks), index.dim)).astype(np.float32)
+
+    def timed(fn) -> Tuple[List[List[Tuple[int, float]]], float]:
+        start = time.perf_counter()
+        hits = [fn(q) for q in queries]
+        return hits, (time.perf_counter() - start) * 1000 / len(queries)
+
+    exact_hits, exact_ms = timed(lambda q: index.exact(q, args.k))
+    print(f"rows={index.count} dim={index.dim} nlist={len(index.centroids)} queries={len(queries)} k={args.k}")
+    print(f"{'mode':<16} {'recall@' + str(args.k):>10} {'ms/query':>10} {'speedup':>8}")
+    print(f"{'exact':<16} {1.0:>10.3f} {exact_ms:>10.2f} {1.0:>8.1f}x")
+    for nprobe in args.nprobe:
+        approx_hits, ann_ms = timed(lambda q: index.search(q, args.k, nprobe))
+        recall = sum(recall_at_k(a, e) for a, e in zip(approx_hits, exact_hits)) / len(queries)
+        print(f"{'ivf nprobe=' + str(nprobe):<16} {recall:>10.3f} {ann_ms:>10.2f} {exact_ms / ann_ms:>8.1f}x")
+
+    if not args.synthetic and index.is_stale():
+        print("warning: shards changed since the index was built; run 'build' again")
+    index.close()
+    if args.synthetic:
+        del index
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="IVF approximate nearest-neighbour index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Cluster all shard embeddings into an IVF index")
+    build_parser.add_argument("index_root")
+    build_parser.add_argument("--nlist", type=int, help="Number of clusters (default: 4 * sqrt(N))")
+
+    bench_parser = sub.add_parser("bench", help="Report recall@k against exact search together with latency")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--nprobe", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4, 16, 64],
+                              help="Comma-separated nprobe values (default: 1,4,16,64)")
+    bench_parser.add_argument("--queries", type=int, default=100)
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N clustered random vectors")
+    bench_parser.add_argument("--dim", type=int, default=384, help="Dimensions for --synthetic")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        print(json.dumps(build(args.index_root, args.nlist), indent=2))
+        return 0
+    if not args.index_root and not args.synthetic:
+        parser.error("bench needs INDEX_ROOT or --synthetic N")
+    return bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
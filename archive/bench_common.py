@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Helpers shared by the search benchmarks: latency percentiles and synthetic shards.
+
+The sidecar index scripts benchmark against throwaway trees of
+``_index.db`` shards. These are written with the ``semantic_chunks`` table
+codexlens creates, so the code under test reads them exactly as it reads
+a real index.
+"""
+import math
+import os
+import sqlite3
+import tempfile
+from typing import Iterable, Sequence, Tuple
+
+from index_shards import INDEX_DB_NAME
+
+# Owned by codexlens: the archive scripts write into it but never create it
+# in a real index, only in synthetic benchmark shards.
+SEMANTIC_CHUNKS_TABLE = """
+CREATE TABLE semantic_chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    content TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    metadata TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100); 0.0 when there are no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def synthetic_root(name: str) -> str:
+    """A new temporary directory for one benchmark's shards."""
+    return tempfile.mkdtemp(prefix=f"{name}-bench-")
+
+
+def create_shard(root: str, directory: str) -> sqlite3.Connection:
+    """Connection to a new, empty ``_index.db`` in root/directory."""
+    os.makedirs(os.path.join(root, directory), exist_ok=True)
+    return sqlite3.connect(os.path.join(root, directory, INDEX_DB_NAME))
+
+
+def write_chunk_shard(root: str, directory: str, rows: Iterable[Tuple[int, str, str, bytes]]) -> None:
+    """A shard whose semantic_chunks holds (id, file_path, content, embedding) rows.
+
+    Content-only benchmarks pass ``b""`` embeddings.
+    """
+    conn = create_shard(root, directory)
+    try:
+        conn.executescript(SEMANTIC_CHUNKS_TABLE)
+        conn.executemany("INSERT INTO semantic_chunks (id, file_path, content, embedding) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def nearby_queries(matrix, rng, count: int = 50, noise: float = 0.3):
+    """count random rows of matrix plus Gaussian noise, so queries land near the data."""
+    picks = rng.choice(len(matrix), size=count, replace=False)
+    return matrix[picks] + (noise * rng.normal(size=(count, matrix.shape[1]))).astype(matrix.dtype)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Queries shared by the search benchmarks, so every tool measures the same intents.
+
+``TEST_QUERIES`` target the project the benchmarks were first written
+against (``DEFAULT_PROJECT``, overridable with ``CODEXLENS_BENCH_PROJECT``
+or each script's ``--project``). ``load_queries`` reads the
+``queries.jsonl`` of a synth_corpus.py corpus instead, for runs that need no
+particular checkout, and ``load_qrels`` its relevance labels.
+"""
+import json
+import os
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_PROJECT = os.environ.get("CODEXLENS_BENCH_PROJECT") or r"D:\dongdiankaifa9\hydro_generator_module"
+
+# Test queries covering different search intents
+TEST_QUERIES = [
+    ("热网络计算", "Chinese: thermal network calculation"),
+    ("ThermalResistance", "Code identifier"),
+    ("boundary condition handling", "Natural language"),
+    ("stator slot cooling", "Domain-specific"),
+    ("def build", "Code pattern"),
+]
+
+
+def load_queries(path: str) -> List[Tuple[str, str]]:
+    """(query, description) pairs from a queries.jsonl file."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                queries.append((record["query"], record.get("description") or record.get("kind", "")))
+    return queries
+
+
+def load_qrels(qrels_path: str, queries_path: str) -> Dict[str, Dict[str, int]]:
+    """query text -> {repo-relative path: grade} from TREC qrels and the matching queries.jsonl."""
+    texts = {}
+    with open(queries_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts[record["id"]] = record["query"]
+    qrels: Dict[str, Dict[str, int]] = {}
+    with open(qrels_path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 4 or parts[0] not in texts:
+                continue
+            query_id, _, path, grade = parts
+            qrels.setdefault(texts[query_id], {})[path.replace("\\", "/")] = int(grade)
+    return qrels
+
+
+def enter_project(path: str) -> None:
+    """chdir into the project to search, or exit with a clear message."""
+    if not os.path.isdir(path):
+        sys.exit(f"Project directory not found: {path} (pass --project or set CODEXLENS_BENCH_PROJECT)")
+    os.chdir(path)
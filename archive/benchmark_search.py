@@ -5,14 +5,43 @@ Multi-dimensional search benchmark: Compare search methods across multiple queri
 
 Dimensions:
 1. Speed (time_ms)
-2. Result Quality (relevance score distribution)
+2. Result Quality (relevance score distribution; nDCG@10 / MRR / recall@k
+   against ``--qrels`` labels when given)
 3. Ranking Stability (position changes vs baseline)
 4. Coverage (unique files found)
+
+By default every search runs in a fresh ``python -m codexlens`` subprocess,
+so each timing includes interpreter startup, model load and index open.
+``--in-process`` imports codexlens once, warms each method, and reports
+cold-start time separately from steady-state p50/p95/p99 latency.
+``--in-process --cache`` serves repeats from an LRU result cache keyed on
+the index generation and reports hit and miss latency separately.
+``--rerank-backend mock|cross-encoder|api`` reranks the hybrid results
+through archive/rerank.py and reports rerank time apart from backend time.
+``--batch`` additionally sends every query of a method in one
+``search --batch`` call and reports queries/sec next to per-query latency.
+``--ndjson`` and ``--batch`` exit with an error when the installed
+codexlens CLI lacks those options (search_stream.search_options).
+``--daemon`` sends every search to a running archive/search_daemon.py
+instead, to compare cold CLI latency with a warm resident server.
+Every mode reports a per-method stage breakdown from
+``result.stats.stages`` (see archive/search_trace.py), and latency split
+into CJK and other queries; ``--cjk-fts`` adds the archive/cjk_fts.py n-gram
+index to that table with its size overhead. Each query line shows the path
+that answered it (``symbol``, ``fts_cjk`` or ``semantic``); ``--symbol-index``
+sends identifier queries to archive/symbol_index.py first.
+
+``--output results.json`` (or ``.csv``) records every run for tracking
+across releases; ``--compare base.json new.json`` diffs two result files and
+exits non-zero when p95 latency or ranking similarity regresses past the
+configured thresholds.
 """
-import subprocess
+import argparse
+import csv
+import math
 import sys
+import tempfile
 import os
-import re
 import json
 import time
 import io
@@ -21,19 +50,37 @@ import io
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
+from datetime import datetime, timezone
 
-os.chdir(r"D:\dongdiankaifa9\hydro_generator_module")
+from bench_common import percentile
+from bench_queries import DEFAULT_PROJECT, TEST_QUERIES, enter_project, load_qrels, load_queries
+from cjk_fts import MODES as FTS_MODES, CjkFts, has_cjk
+from index_shards import default_index_root
+from relevance import evaluate, pareto_frontier, relative_key
+from rerank import BACKENDS, Reranker, create_backend
+from search_cache import LRUCache, ResultCache, cache_codexlens_embeddings
+from search_trace import Tracer, codexlens_stages, instrument_codexlens, span, tracing
+from symbol_index import FAST_PATH_METHODS, SymbolIndex, answer as symbol_answer
+from search_stream import (
+    DEFAULT_SOCKET,
+    build_batch_command,
+    build_search_command,
+    collect_batch,
+    daemon_request,
+    iter_records,
+    parse_output,
+    project_request,
+    run_codexlens_batch,
+    run_codexlens_inprocess,
+    run_codexlens_search,
+    search_options,
+    supports_batch,
+    write_batch_file,
+)
 
-# Test queries covering different search intents
-TEST_QUERIES = [
-    ("热网络计算", "Chinese: thermal network calculation"),
-    ("ThermalResistance", "Code identifier"),
-    ("boundary condition handling", "Natural language"),
-    ("stator slot cooling", "Domain-specific"),
-    ("def build", "Code pattern"),
-]
+RESULTS_SCHEMA_VERSION = 1
 
 # Search methods to compare
 SEARCH_METHODS = [
@@ -43,9 +90,6 @@ SEARCH_METHODS = [
     ("cascade", "hybrid", "Cascade Hybrid (Cross-Encoder)"),
 ]
 
-ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
-
-
 @dataclass
 class SearchResult:
     method: str
@@ -57,64 +101,23 @@ class SearchResult:
     top_scores: List[float]
     success: bool
     error: Optional[str] = None
+    wall_ms: float = 0.0
+    cached: bool = False
+    top_contents: List[str] = field(default_factory=list)
+    stages: Dict[str, float] = field(default_factory=dict)
+    top_paths: List[str] = field(default_factory=list)
+    route: str = "semantic"
 
 
-def run_search(query: str, method: str, strategy: Optional[str] = None, limit: int = 10) -> SearchResult:
-    """Run a search and return structured result."""
-    cmd = [sys.executable, "-m", "codexlens", "search", query,
-           "--method", method, "--limit", str(limit), "--json"]
-
-    if strategy and method == "cascade":
-        cmd.extend(["--cascade-strategy", strategy])
-
-    start = time.perf_counter()
-    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
-    elapsed = (time.perf_counter() - start) * 1000
-
-    # Strip ANSI codes
-    output = ansi_escape.sub('', result.stdout + result.stderr)
-
-    # Parse JSON
-    start_idx = output.find('{')
-    if start_idx < 0:
-        return SearchResult(
-            method=method, strategy=strategy, query=query,
-            time_ms=elapsed, count=0, top_files=[], top_scores=[],
-            success=False, error="No JSON found"
-        )
-
-    # Parse nested JSON properly
-    in_string = False
-    escaped = False
-    depth = 0
-    end_idx = start_idx
-
-    for i, c in enumerate(output[start_idx:]):
-        if escaped:
-            escaped = False
-            continue
-        if c == '\\':
-            escaped = True
-            continue
-        if c == '"' and not escaped:
-            in_string = not in_string
-            continue
-        if not in_string:
-            if c == '{':
-                depth += 1
-            elif c == '}':
-                depth -= 1
-                if depth == 0:
-                    end_idx = start_idx + i + 1
-                    break
-
+def parse_search_output(data: Dict[str, Any], query: str, method: str, strategy: Optional[str],
+                        elapsed: float, limit: int = 10) -> SearchResult:
+    """Turn a parsed ``--json`` document into a SearchResult."""
     try:
-        data = json.loads(output[start_idx:end_idx])
         if not data.get("success"):
             return SearchResult(
                 method=method, strategy=strategy, query=query,
                 time_ms=elapsed, count=0, top_files=[], top_scores=[],
-                success=False, error=data.get("error", "Unknown error")
+                success=False, error=data.get("error", "Unknown error"), wall_ms=elapsed
             )
 
         results = data.get("result", {}).get("results", [])[:limit]
@@ -122,6 +125,7 @@ def run_search(query: str, method: str, strategy: Optional[str] = None, limit: i
 
         top_files = [os.path.basename(r.get("path", "")) for r in results]
         top_scores = [r.get("score", 0) for r in results]
+        top_contents = [r.get("content") or r.get("excerpt") or r.get("path", "") for r in results]
 
         return SearchResult(
             method=method, strategy=strategy, query=query,
@@ -129,16 +133,304 @@ def run_search(query: str, method: str, strategy: Optional[str] = None, limit: i
             count=len(results),
             top_files=top_files,
             top_scores=top_scores,
-            success=True
+            success=True,
+            wall_ms=elapsed,
+            top_contents=top_contents,
+            stages=stats.get("stages") or {},
+            top_paths=[r.get("path", "") for r in results],
+            route=stats.get("route", "semantic")
         )
     except Exception as e:
         return SearchResult(
             method=method, strategy=strategy, query=query,
             time_ms=elapsed, count=0, top_files=[], top_scores=[],
-            success=False, error=str(e)
+            success=False, error=str(e), wall_ms=elapsed
         )
 
 
+def run_search(query: str, method: str, strategy: Optional[str] = None, limit: int = 10,
+               ndjson: bool = False) -> SearchResult:
+    """Run a search in a fresh subprocess and return structured result.
+
+    Every call pays interpreter startup, model load and index open; a
+    running search daemon is deliberately bypassed.
+    """
+    start = time.perf_counter()
+    with tracing() as tracer, span("cli.subprocess"):
+        data = run_codexlens_search(query, method, strategy, limit, ndjson=ndjson, use_daemon=False)
+    elapsed = (time.perf_counter() - start) * 1000
+    tracer.attach(data)
+
+    return parse_search_output(data, query, method, strategy, elapsed, limit)
+
+
+class InProcessRunner:
+    """Run ``codexlens search`` inside this interpreter.
+
+    codexlens is imported once; its module-level caches (embedder, reranker,
+    open indexes) survive between calls, so after a warm-up call per method
+    the measured time is steady-state query latency only.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None, embeddings: Optional[LRUCache] = None):
+        start = time.perf_counter()
+        import codexlens  # noqa: F401
+        self.import_ms = (time.perf_counter() - start) * 1000
+        # Before the first search, so every run reports codexlens stages, not only client spans
+        self.instrumented = instrument_codexlens()
+        self.cache = cache
+        # Query embeddings shared by the methods that embed the same query
+        self.embeddings = embeddings
+        if embeddings is not None:
+            cache_codexlens_embeddings(embeddings)
+
+    def _invoke(self, args: List[str]) -> Tuple[str, float, Optional[str]]:
+        """Run the CLI entry point with args; return (stdout, elapsed_ms, error)."""
+        return run_codexlens_inprocess(args)
+
+    def run(self, query: str, method: str, strategy: Optional[str] = None, limit: int = 10,
+            ndjson: bool = False) -> SearchResult:
+        tracer = Tracer()
+        if self.cache is not None:
+            start = time.perf_counter()
+            with tracing(tracer), span("cache.lookup"):
+                data = self.cache.get(query, method, strategy, limit)
+            if data is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                data = json.loads(json.dumps(data))  # annotate a copy, not the cached document
+                data["result"]["stats"]["cache"] = self.cache.stats()
+                result = parse_search_output(data, query, method, strategy, elapsed, limit)
+                result.time_ms = elapsed
+                result.cached = True
+                result.stages = tracer.stages()  # not the stages of the run that filled the cache
+                return result
+
+        with tracing(tracer):
+            with span("cli.run"):
+                output, elapsed, error = self._invoke(build_search_command(query, method, strategy, limit, ndjson))
+            with span("cli.parse"):
+                data = {"success": False, "error": error} if error else parse_output(output)
+        tracer.attach(data)
+        if self.cache is not None and data.get("success"):
+            self.cache.put(query, method, strategy, limit, data)
+            data = json.loads(json.dumps(data))
+            data.setdefault("result", {}).setdefault("stats", {})["cache"] = self.cache.stats()
+        return parse_search_output(data, query, method, strategy, elapsed, limit)
+
+    def run_batch(self, queries: List[str], method: str, strategy: Optional[str] = None,
+                  limit: int = 10) -> List[Dict[str, Any]]:
+        fd, queries_path = tempfile.mkstemp(prefix="codexlens-batch-", suffix=".jsonl")
+        os.close(fd)
+        try:
+            write_batch_file(queries, queries_path)
+            output, _, error = self._invoke(build_batch_command(queries_path, method, strategy, limit))
+        finally:
+            os.remove(queries_path)
+        if error:
+            return [{"success": False, "error": error} for _ in queries]
+        return collect_batch(iter_records(output.splitlines(keepends=True)), len(queries))
+
+
+class DaemonRunner:
+    """Send searches to a running search_daemon.py over its Unix socket.
+
+    Timings are client round trips, so they include socket and JSON
+    overhead but no process startup or model load.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        status = daemon_request({"op": "status"}, socket_path, timeout=5.0)
+        if status is None or not status.get("success"):
+            raise RuntimeError(f"No search daemon on {socket_path} (start it with: python search_daemon.py serve)")
+        project = status.get("project")
+        if project and project != os.path.realpath(os.getcwd()):
+            raise RuntimeError(f"The search daemon on {socket_path} serves {project}, not {os.getcwd()};"
+                               " start one from the project directory")
+        self.import_ms = status.get("import_ms", 0.0)
+
+    def run(self, query: str, method: str, strategy: Optional[str] = None, limit: int = 10,
+            ndjson: bool = False) -> SearchResult:
+        start = time.perf_counter()
+        data = daemon_request(project_request({"op": "search", "query": query, "method": method,
+                                               "strategy": strategy, "limit": limit}), self.socket_path)
+        elapsed = (time.perf_counter() - start) * 1000
+        if data is None:
+            data = {"success": False, "error": "Search daemon went away"}
+        elif data.get("success"):
+            # Socket and JSON time is what the daemon's own stages do not cover
+            stats = data["result"]["stats"]
+            served = stats.get("daemon", {})
+            stats.setdefault("stages", {})["daemon.transport"] = max(
+                0.0, elapsed - served.get("run_ms", 0.0) - served.get("queue_ms", 0.0))
+        return parse_search_output(data, query, method, strategy, elapsed, limit)
+
+    def run_batch(self, queries: List[str], method: str, strategy: Optional[str] = None,
+                  limit: int = 10) -> List[Dict[str, Any]]:
+        data = daemon_request(project_request({"op": "batch", "queries": queries, "method": method,
+                                               "strategy": strategy, "limit": limit}), self.socket_path)
+        if not data or not data.get("success"):
+            error = data.get("error") if data else "Search daemon went away"
+            return [{"success": False, "error": error} for _ in queries]
+        return data["results"]
+
+
+@dataclass
+class BatchStats:
+    method_name: str
+    query_count: int
+    wall_ms: List[float] = field(default_factory=list)
+    query_ms: List[float] = field(default_factory=list)
+    failed: int = 0
+
+    @property
+    def qps(self) -> float:
+        total_ms = sum(self.wall_ms)
+        return self.query_count * len(self.wall_ms) / (total_ms / 1000) if total_ms > 0 else 0.0
+
+
+def run_batch_benchmark(runner: Optional[Union[InProcessRunner, DaemonRunner]], repeat: int, limit: int,
+                        test_queries: List[Tuple[str, str]] = TEST_QUERIES) -> Dict[str, BatchStats]:
+    """Send all test queries as one --batch call per method and measure throughput.
+
+    The CLI shares one loaded embedder and open index across the batch, so
+    queries/sec here is the number to compare against sequential latency.
+    """
+    queries = [query for query, _ in test_queries]
+    batch: Dict[str, BatchStats] = {}
+
+    for method, strategy, method_name in SEARCH_METHODS:
+        method_key = f"{method}_{strategy}" if strategy else method
+        stats = BatchStats(method_name=method_name, query_count=len(queries))
+        print(f"  ⏳ {method_name}...", end=" ", flush=True)
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            if runner:
+                docs = runner.run_batch(queries, method, strategy, limit)
+            else:
+                docs = run_codexlens_batch(queries, method, strategy, limit, use_daemon=False)
+            stats.wall_ms.append((time.perf_counter() - start) * 1000)
+
+            for doc in docs:
+                if doc.get("success"):
+                    stats.query_ms.append(doc.get("result", {}).get("stats", {}).get("time_ms", 0.0))
+                else:
+                    stats.failed += 1
+
+        batch[method_key] = stats
+        print(f"✓ {stats.qps:.1f} q/s" + (f", {stats.failed} failed" if stats.failed else ""))
+
+    return batch
+
+
+@dataclass
+class LatencyStats:
+    method_name: str
+    cold_ms: float
+    samples: List[float] = field(default_factory=list)
+
+    @property
+    def p50(self) -> float:
+        return percentile(self.samples, 50)
+
+    @property
+    def p95(self) -> float:
+        return percentile(self.samples, 95)
+
+    @property
+    def p99(self) -> float:
+        return percentile(self.samples, 99)
+
+
+def stage_breakdown(runs: List[Tuple[str, SearchResult]]) -> Dict[str, Dict[str, float]]:
+    """Average ms per stage for each method, over successful uncached runs.
+
+    A stage missing from a run counts as 0 ms for that run.
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    counts: Dict[str, int] = {}
+    for method_key, r in runs:
+        if not r.success or r.cached:
+            continue
+        counts[method_key] = counts.get(method_key, 0) + 1
+        method_totals = totals.setdefault(method_key, {})
+        for stage, ms in r.stages.items():
+            method_totals[stage] = method_totals.get(stage, 0.0) + ms
+    return {method_key: {stage: ms / counts[method_key] for stage, ms in stages.items()}
+            for method_key, stages in totals.items() if stages}
+
+
+def script_latency(runs: List[Tuple[str, SearchResult]]) -> Dict[str, Dict[str, List[float]]]:
+    """Wall-clock samples per method, split into CJK and other queries (successful, uncached runs)."""
+    split: Dict[str, Dict[str, List[float]]] = {}
+    for method_key, r in runs:
+        if r.success and not r.cached:
+            group = "cjk" if has_cjk(r.query) else "other"
+            split.setdefault(method_key, {"cjk": [], "other": []})[group].append(r.wall_ms)
+    return split
+
+
+def fts_benchmark(index_root: str, mode: str, queries: List[str], repeat: int,
+                  limit: int) -> Optional[Dict[str, Any]]:
+    """Size overhead and CJK/other latency of the cjk_fts.py index, or None if it is not built."""
+    index = CjkFts.open(index_root, mode)
+    if index is None:
+        return None
+    samples: Dict[str, List[float]] = {"cjk": [], "other": []}
+    answered = {"cjk": 0, "other": 0}
+    try:
+        for query in queries:
+            group = "cjk" if has_cjk(query) else "other"
+            hits = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = index.search(query, limit)
+                samples[group].append((time.perf_counter() - start) * 1000)
+            answered[group] += bool(hits)
+        stale = index.is_stale()
+    finally:
+        index.close()
+    meta = index.meta
+    return {
+        "mode": mode,
+        "bytes": meta["bytes"],
+        "shard_bytes": meta["shard_bytes"],
+        "overhead": meta["bytes"] / meta["shard_bytes"] if meta["shard_bytes"] else None,
+        "stale": stale,
+        "answered": answered,
+        "samples": samples,
+    }
+
+
+def route_counts(all_results: Dict[str, Dict[str, SearchResult]], method_key: str) -> Dict[str, int]:
+    """How many queries of a method each path (symbol, fts_cjk, semantic) answered."""
+    counts: Dict[str, int] = {}
+    for results in all_results.values():
+        result = results.get(method_key)
+        if result is not None and result.success:
+            counts[result.route] = counts.get(result.route, 0) + 1
+    return counts
+
+
+def method_quality(all_results: Dict[str, Dict[str, SearchResult]], method_key: str,
+                   qrels: Dict[str, Dict[str, int]], k: int) -> Optional[Dict[str, float]]:
+    """Mean nDCG@10, MRR and recall@k of a method over the labelled queries.
+
+    A failed search scores 0 on every metric rather than being skipped.
+    """
+    per_query = []
+    for query, grades in qrels.items():
+        result = all_results.get(query, {}).get(method_key)
+        if result is None:
+            continue
+        ranked = [relative_key(path) for path in result.top_paths] if result.success else []
+        per_query.append(evaluate(ranked, grades, k))
+    if not per_query:
+        return None
+    return {metric: sum(q[metric] for q in per_query) / len(per_query) for metric in per_query[0]}
+
+
 def calculate_ranking_similarity(baseline: List[str], candidate: List[str]) -> float:
     """Calculate ranking similarity using normalized DCG."""
     if not baseline or not candidate:
@@ -156,23 +448,310 @@ def calculate_ranking_similarity(baseline: List[str], candidate: List[str]) -> f
     return score / min(len(baseline), 10)
 
 
+def method_similarity(all_results: Dict[str, Dict[str, SearchResult]], method_key: str) -> Optional[float]:
+    """Average ranking similarity of a method against the hybrid baseline."""
+    if method_key == "hybrid":
+        return 1.0
+
+    similarities = []
+    for query in all_results:
+        baseline = all_results[query].get("hybrid")
+        candidate = all_results[query].get(method_key)
+        if baseline and candidate and baseline.success and candidate.success:
+            similarities.append(calculate_ranking_similarity(baseline.top_files, candidate.top_files))
+
+    return sum(similarities) / len(similarities) if similarities else None
+
+
+def write_results(path: str, args: argparse.Namespace, runs: List[Tuple[str, SearchResult]],
+                  latency: Dict[str, LatencyStats],
+                  all_results: Dict[str, Dict[str, SearchResult]],
+                  batch: Dict[str, BatchStats], runner_cache: Optional[ResultCache] = None,
+                  qrels: Optional[Dict[str, Dict[str, int]]] = None,
+                  fts: Optional[Dict[str, Any]] = None) -> None:
+    """Write every run plus per-method summaries as JSON, or runs only as CSV."""
+    if path.lower().endswith(".csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["method_key", "query", "success", "time_ms", "wall_ms",
+                             "count", "top_files", "top_scores", "error"])
+            for method_key, r in runs:
+                writer.writerow([method_key, r.query, r.success, f"{r.time_ms:.3f}", f"{r.wall_ms:.3f}",
+                                 r.count, ";".join(r.top_files),
+                                 ";".join(f"{score:.6f}" for score in r.top_scores), r.error or ""])
+        return
+
+    methods = {}
+    stages = stage_breakdown(runs)
+    scripts = script_latency(runs)
+    for method, strategy, method_name in SEARCH_METHODS:
+        method_key = f"{method}_{strategy}" if strategy else method
+        stats = latency[method_key]
+        methods[method_key] = {
+            "name": method_name,
+            "method": method,
+            "strategy": strategy,
+            "cold_ms": stats.cold_ms,
+            "p50_ms": stats.p50,
+            "p95_ms": stats.p95,
+            "p99_ms": stats.p99,
+            "samples": len(stats.samples),
+            "ranking_similarity": method_similarity(all_results, method_key),
+            "stages_ms": stages.get(method_key, {}),
+            "routes": route_counts(all_results, method_key),
+            "latency_by_script": {group: {"p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95),
+                                          "samples": len(values)}
+                                  for group, values in scripts.get(method_key, {}).items()},
+        }
+        if qrels:
+            methods[method_key]["quality"] = method_quality(all_results, method_key, qrels, args.limit)
+        if method_key in batch:
+            stats = batch[method_key]
+            methods[method_key]["batch"] = {
+                "queries_per_sec": stats.qps,
+                "wall_ms": stats.wall_ms,
+                "query_p50_ms": percentile(stats.query_ms, 50),
+                "query_p95_ms": percentile(stats.query_ms, 95),
+                "failed": stats.failed,
+            }
+
+    payload = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "project": os.getcwd(),
+        "mode": "daemon" if args.daemon else "in-process" if args.in_process else "subprocess",
+        "repeat": args.repeat,
+        "limit": args.limit,
+        "methods": methods,
+        "runs": [dict({k: v for k, v in vars(r).items() if k != "top_contents"}, method_key=method_key)
+                 for method_key, r in runs],
+    }
+    if runner_cache is not None:
+        payload["cache"] = runner_cache.stats()
+    if fts is not None:
+        payload["cjk_fts"] = dict({k: v for k, v in fts.items() if k != "samples"}, latency={
+            group: {"p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95)}
+            for group, values in fts["samples"].items()})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def compare_results(base_path: str, new_path: str, max_p95_regression: float,
+                    max_similarity_drop: float, max_ndcg_drop: float = 0.02) -> int:
+    """Diff two JSON result files; return 1 if any method regressed past a threshold.
+
+    p95 regression is relative (0.10 = 10% slower); similarity and nDCG@10
+    drops are absolute, and nDCG is only checked when both files have it.
+    A method missing from the new file, one whose searches all failed, and a
+    similarity that disappeared are regressions too.
+    """
+    with open(base_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    print_divider()
+    print(f"📈 基准对比: {base_path} → {new_path}")
+    print_divider()
+    print(f"{'方法':<35} {'p95 基线':>10} {'p95 新':>10} {'变化':>8} {'相似度变化':>12}  结果")
+    print("-" * 90)
+
+    failures = []
+    for method_key, old in base.get("methods", {}).items():
+        cur = new.get("methods", {}).get(method_key)
+        if cur is None:
+            print(f"{old['name']:<35} {'(新结果中缺失)':>30}  ✗")
+            failures.append(f"{old['name']}: missing from {new_path}")
+            continue
+
+        reasons = []
+        if not cur.get("samples"):
+            # Every search failed: p95 is 0 and would read as a speed-up
+            reasons.append("all searches failed")
+            p95_change = math.inf
+        else:
+            p95_change = (cur["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] > 0 else 0.0
+        old_sim, new_sim = old.get("ranking_similarity"), cur.get("ranking_similarity")
+        if old_sim is not None and new_sim is None:
+            reasons.append("similarity missing")
+            sim_change = -old_sim
+        else:
+            sim_change = new_sim - old_sim if old_sim is not None and new_sim is not None else 0.0
+        sim_drop = -sim_change
+
+        if math.isfinite(p95_change) and p95_change > max_p95_regression:
+            reasons.append(f"p95 +{p95_change:.0%}")
+        if new_sim is not None and sim_drop > max_similarity_drop:
+            reasons.append(f"similarity -{sim_drop:.3f}")
+        old_ndcg = (old.get("quality") or {}).get("ndcg@10")
+        new_ndcg = (cur.get("quality") or {}).get("ndcg@10")
+        if old_ndcg is not None and new_ndcg is not None and old_ndcg - new_ndcg > max_ndcg_drop:
+            reasons.append(f"nDCG@10 -{old_ndcg - new_ndcg:.3f}")
+        failures.extend(f"{old['name']}: {reason}" for reason in reasons)
+
+        print(f"{old['name']:<35} {old['p95_ms']:>10.1f} {cur['p95_ms']:>10.1f} {p95_change:>+8.0%} "
+              f"{sim_change:>+12.4f}  {'✗ ' + ', '.join(reasons) if reasons else '✓'}")
+
+    print()
+    if failures:
+        print(f"❌ 性能回归 (阈值: p95 +{max_p95_regression:.0%}, 相似度 -{max_similarity_drop}, "
+              f"nDCG@10 -{max_ndcg_drop}):")
+        for failure in failures:
+            print(f"  • {failure}")
+        return 1
+
+    print("✅ 无性能回归")
+    return 0
+
+
 def print_divider(char="=", width=80):
     print(char * width)
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CodexLens search method benchmark")
+    parser.add_argument("--project", default=DEFAULT_PROJECT,
+                        help=f"Indexed project to search in (default: {DEFAULT_PROJECT})")
+    parser.add_argument("--queries", metavar="JSONL",
+                        help="Query set to run instead of the built-in TEST_QUERIES (e.g. a synth_corpus.py queries.jsonl)")
+    parser.add_argument("--qrels", metavar="PATH",
+                        help="TREC qrels for --queries; adds nDCG@10, MRR and recall@limit per method")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Load codexlens once and measure steady-state latency")
+    parser.add_argument("--daemon", nargs="?", const=DEFAULT_SOCKET, metavar="SOCKET",
+                        help=f"Send searches to a running search daemon (default socket: {DEFAULT_SOCKET})")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per (query, method) pair (default: 3)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per search (default: 10)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Request streaming NDJSON output from the CLI instead of --json")
+    parser.add_argument("--cache", action="store_true",
+                        help="With --in-process, serve repeated searches from an LRU result cache"
+                             " and repeated query texts from a query-embedding cache")
+    parser.add_argument("--cache-size", type=int, default=256, help="Result cache entries (default: 256)")
+    parser.add_argument("--index-root", metavar="DIR",
+                        help="Index directory whose shards invalidate the cache (default: codexlens path for cwd)")
+    parser.add_argument("--cjk-fts", nargs="?", const="bigram", choices=FTS_MODES, metavar="MODE",
+                        help="Also time the cjk_fts.py index built in this mode under --index-root and report"
+                             " its size overhead (default mode: bigram)")
+    parser.add_argument("--symbol-index", action="store_true",
+                        help="Answer identifier queries to hybrid/cascade from the symbol_index.py index under"
+                             " --index-root before searching, as the daemon's fast path does")
+    parser.add_argument("--rerank-backend", choices=sorted(BACKENDS),
+                        help="Rerank each query's hybrid results with this backend and report its overhead")
+    parser.add_argument("--batch", action="store_true",
+                        help="Also send all queries per method as one `search --batch` call and report queries/sec")
+    parser.add_argument("--output", metavar="PATH",
+                        help="Write per-run results to PATH (.json, or .csv for runs only)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="Compare two JSON result files instead of running searches")
+    parser.add_argument("--max-p95-regression", type=float, default=0.10,
+                        help="Allowed relative p95 latency increase in --compare (default: 0.10)")
+    parser.add_argument("--max-similarity-drop", type=float, default=0.05,
+                        help="Allowed absolute ranking-similarity drop in --compare (default: 0.05)")
+    parser.add_argument("--max-ndcg-drop", type=float, default=0.02,
+                        help="Allowed absolute nDCG@10 drop in --compare (default: 0.02)")
+    args = parser.parse_args(argv)
+    if args.qrels and not args.queries:
+        parser.error("--qrels needs --queries (qrels refer to query ids)")
+    if args.cache and not args.in_process:
+        parser.error("--cache requires --in-process (a fresh subprocess has no cache to reuse)")
+    if args.daemon and args.in_process:
+        parser.error("--daemon and --in-process are alternative runners; pick one")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        return compare_results(args.compare[0], args.compare[1],
+                               args.max_p95_regression, args.max_similarity_drop, args.max_ndcg_drop)
+
+    test_queries = load_queries(args.queries) if args.queries else TEST_QUERIES
+    qrels = load_qrels(args.qrels, args.queries) if args.qrels else {}
+    # Paths given on the command line are relative to where the benchmark was started
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.index_root = os.path.abspath(args.index_root) if args.index_root else None
+    enter_project(args.project)
+    repeat = max(1, args.repeat)
+    # Neither option is in every codexlens release; measuring without them would mislabel the numbers
+    if args.ndjson and "--ndjson" not in search_options():
+        print("❌ 当前 codexlens 的 search 没有 --ndjson 选项, 去掉 --ndjson 后重试")
+        return 1
+    if args.batch and not supports_batch():
+        print("❌ 当前 codexlens 的 search 没有 --batch 选项, 去掉 --batch 后重试")
+        return 1
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.index_root or default_index_root(os.getcwd()), maxsize=args.cache_size)
+    if args.daemon:
+        try:
+            runner = DaemonRunner(args.daemon)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+    else:
+        runner = InProcessRunner(cache, LRUCache(4096) if args.cache else None) if args.in_process else None
+
+    symbols = None
+    if args.symbol_index:
+        index_root = args.index_root or default_index_root(os.getcwd())
+        symbols = SymbolIndex.open(index_root)
+        if symbols is None:
+            print(f"❌ 未找到符号索引: python symbol_index.py build {index_root}")
+            return 1
+        if symbols.is_stale():
+            print("⚠️ 符号索引已过期 (分片在构建后有写入), 本次不走符号快速路径")
+            symbols = None
+
+    def search(query: str, method: str, strategy: Optional[str], limit: int) -> SearchResult:
+        if symbols is not None and method in FAST_PATH_METHODS:
+            start = time.perf_counter()
+            with tracing() as tracer, span("symbol.lookup"):
+                data = symbol_answer(symbols, query, limit)
+            if data is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                return parse_search_output(tracer.attach(data), query, method, strategy, elapsed, limit)
+        run = runner.run if runner else run_search
+        return run(query, method, strategy, limit, ndjson=args.ndjson)
+
     print_divider()
     print("🔬 CodexLens 搜索方法多维度对比测试")
     print_divider()
     print(f"测试目录: {os.getcwd()}")
-    print(f"测试查询数: {len(TEST_QUERIES)}")
+    print(f"测试查询数: {len(test_queries)}")
     print(f"对比方法数: {len(SEARCH_METHODS)}")
+    if args.daemon:
+        mode = f"守护进程 ({args.daemon})"
+    else:
+        mode = '进程内 (常驻)' if runner else '子进程 (每次冷启动)'
+    print(f"运行模式: {mode}, 每组重复 {repeat} 次")
+    if runner:
+        print(f"codexlens 导入耗时: {runner.import_ms:.0f}ms")
+    if isinstance(runner, InProcessRunner):
+        wrapped = sum(reason is None for reason in runner.instrumented.values())
+        print(f"codexlens 插桩阶段函数: {wrapped}")
     print_divider()
 
     all_results: Dict[str, Dict[str, SearchResult]] = {}
+    latency: Dict[str, LatencyStats] = {}
+    cached_latency: Dict[str, List[float]] = {}
+    runs: List[Tuple[str, SearchResult]] = []
+
+    # Warm-up: the first call of each method pays model load and index open
+    print("\n🔥 预热 (冷启动)")
+    print("-" * 60)
+    warmup_query = test_queries[0][0]
+    for method, strategy, method_name in SEARCH_METHODS:
+        method_key = f"{method}_{strategy}" if strategy else method
+        print(f"  ⏳ {method_name}...", end=" ", flush=True)
+        warm = search(warmup_query, method, strategy, args.limit)
+        cold_ms = warm.wall_ms
+        latency[method_key] = LatencyStats(method_name=method_name, cold_ms=cold_ms)
+        print(f"{cold_ms:.0f}ms" if warm.success else f"✗ {warm.error}")
 
     # Run all tests
-    for query, query_desc in TEST_QUERIES:
+    for query, query_desc in test_queries:
         print(f"\n📝 查询: \"{query}\" ({query_desc})")
         print("-" * 60)
 
@@ -182,14 +761,49 @@ def main():
             method_key = f"{method}_{strategy}" if strategy else method
             print(f"  ⏳ {method_name}...", end=" ", flush=True)
 
-            result = run_search(query, method, strategy)
+            result = None
+            for _ in range(repeat):
+                run = search(query, method, strategy, args.limit)
+                runs.append((method_key, run))
+                if run.success and run.cached:
+                    cached_latency.setdefault(method_key, []).append(run.wall_ms)
+                elif run.success:
+                    latency[method_key].samples.append(run.wall_ms)
+                if result is None:
+                    result = run
             all_results[query][method_key] = result
 
             if result.success:
-                print(f"✓ {result.time_ms:.0f}ms, {result.count} results")
+                print(f"✓ {result.time_ms:.0f}ms, {result.count} results [{result.route}]")
             else:
                 print(f"✗ {result.error}")
 
+    rerank_totals: List[float] = []
+    rerank_backend_times: List[float] = []
+    if args.rerank_backend:
+        # No score cache here: every pair is scored so the overhead is real
+        reranker = Reranker(create_backend(args.rerank_backend))
+        for query, _ in test_queries:
+            hybrid = all_results[query].get("hybrid")
+            if hybrid and hybrid.success and hybrid.top_contents:
+                reranker.reset_stats()
+                reranker.rerank(query, hybrid.top_contents)
+                rerank_totals.append(reranker.stats["wall_ms"])
+                rerank_backend_times.append(reranker.stats["backend_ms"])
+
+    fts = None
+    if args.cjk_fts:
+        index_root = args.index_root or default_index_root(os.getcwd())
+        fts = fts_benchmark(index_root, args.cjk_fts, [q for q, _ in test_queries], repeat, args.limit)
+        if fts is None:
+            print(f"\n⚠️ 未找到 {args.cjk_fts} CJK 全文索引: python cjk_fts.py build {index_root} --mode {args.cjk_fts}")
+
+    batch: Dict[str, BatchStats] = {}
+    if args.batch:
+        print(f"\n📦 批量查询 (search --batch, {len(test_queries)} 条/批)")
+        print("-" * 60)
+        batch = run_batch_benchmark(runner, repeat, args.limit, test_queries)
+
     # === Analysis ===
     print("\n")
     print_divider()
@@ -231,6 +845,99 @@ def main():
         speedup = slowest[1] / fastest[1] if fastest[1] > 0 else 0
         print(f"\n🏆 最快: {fastest[0]} (比最慢快 {speedup:.1f}x)")
 
+    # Cold start vs steady state
+    print(f"\n冷启动 vs 稳态延迟 (墙钟 ms, 每方法 {repeat * len(test_queries)} 次采样)")
+    print(f"{'方法':<35} {'冷启动':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    print("-" * 79)
+    for method, strategy, method_name in SEARCH_METHODS:
+        method_key = f"{method}_{strategy}" if strategy else method
+        stats = latency[method_key]
+        if stats.samples:
+            print(f"{method_name:<35} {stats.cold_ms:>10.0f} {stats.p50:>10.1f} {stats.p95:>10.1f} {stats.p99:>10.1f}")
+
+    scripts = script_latency(runs)
+    if any(split["cjk"] and split["other"] for split in scripts.values()) or fts is not None:
+        print("\nCJK vs 其他查询延迟 (墙钟 ms)")
+        print(f"{'方法':<35} {'CJK p50':>10} {'CJK p95':>10} {'其他 p50':>10} {'其他 p95':>10}")
+        print("-" * 79)
+        rows = [(method_name, scripts.get(f"{method}_{strategy}" if strategy else method))
+                for method, strategy, method_name in SEARCH_METHODS]
+        if fts is not None:
+            rows.append((f"N-gram FTS ({fts['mode']})", fts["samples"]))
+        for method_name, split in rows:
+            if split:
+                print(f"{method_name:<35} {percentile(split['cjk'], 50):>10.2f} {percentile(split['cjk'], 95):>10.2f} "
+                      f"{percentile(split['other'], 50):>10.2f} {percentile(split['other'], 95):>10.2f}")
+        if fts is not None:
+            overhead = f"{fts['overhead']:.1%}" if fts["overhead"] is not None else "-"
+            print(f"N-gram FTS 索引: {fts['bytes'] / 1e6:.1f} MB, 占分片体积 {overhead}; "
+                  f"有结果的查询 CJK {fts['answered']['cjk']}, 其他 {fts['answered']['other']}"
+                  + (" (⚠️ 索引已过期, 请重新 build)" if fts["stale"] else ""))
+
+    routes = {key: route_counts(all_results, key) for key in latency}
+    if any(set(counts) - {"semantic"} for counts in routes.values()):
+        print("\n查询路由 (每条查询首次运行走的路径)")
+        print(f"{'方法':<35} {'symbol':>10} {'fts_cjk':>10} {'semantic':>10}")
+        print("-" * 67)
+        for method, strategy, method_name in SEARCH_METHODS:
+            counts = routes[f"{method}_{strategy}" if strategy else method]
+            print(f"{method_name:<35} {counts.get('symbol', 0):>10} {counts.get('fts_cjk', 0):>10} "
+                  f"{counts.get('semantic', 0):>10}")
+
+    stages = stage_breakdown(runs)
+    if stages:
+        print("\n阶段耗时分解 (result.stats.stages, 每次搜索平均 ms; 阶段可嵌套, 占比之和可超过 100%)")
+        print(f"{'方法 / 阶段':<35} {'平均':>10} {'占墙钟':>10}")
+        print("-" * 57)
+        for method, strategy, method_name in SEARCH_METHODS:
+            method_key = f"{method}_{strategy}" if strategy else method
+            if method_key not in stages:
+                continue
+            wall = [r.wall_ms for key, r in runs if key == method_key and r.success and not r.cached]
+            avg_wall = sum(wall) / len(wall)
+            print(f"{method_name:<35} {avg_wall:>10.1f} {'100%':>10}")
+            for stage, ms in sorted(stages[method_key].items(), key=lambda item: -item[1]):
+                share = f"{ms / avg_wall:.0%}" if avg_wall > 0 else "-"
+                print(f"  {stage:<33} {ms:>10.1f} {share:>10}")
+        if not any(codexlens_stages(method_stages) for method_stages in stages.values()):
+            print("⚠️ 阶段表中没有 codexlens 内部阶段 (嵌入/FTS/向量/融合/重排), 只有客户端耗时; "
+                  "请用 --in-process 或 --daemon 运行, 或通过 CODEXLENS_TRACE_TARGETS 指定要插桩的函数")
+
+    if rerank_totals:
+        print(f"\n重排开销 (Hybrid Top-{args.limit}, backend={args.rerank_backend}, ms)")
+        print(f"{'':<20} {'p50':>10} {'p95':>10}")
+        print("-" * 42)
+        overhead = [total - backend for total, backend in zip(rerank_totals, rerank_backend_times)]
+        for label, values in (("总计", rerank_totals), ("backend 调用", rerank_backend_times),
+                              ("批处理/调度开销", overhead)):
+            print(f"{label:<20} {percentile(values, 50):>10.2f} {percentile(values, 95):>10.2f}")
+
+    if cache is not None:
+        print("\n结果缓存: 未命中 vs 命中延迟 (墙钟 ms)")
+        print(f"{'方法':<35} {'未命中 p50':>12} {'命中 p50':>12} {'命中 p95':>12}")
+        print("-" * 75)
+        for method, strategy, method_name in SEARCH_METHODS:
+            method_key = f"{method}_{strategy}" if strategy else method
+            hits = cached_latency.get(method_key, [])
+            print(f"{method_name:<35} {latency[method_key].p50:>12.2f} "
+                  f"{percentile(hits, 50):>12.3f} {percentile(hits, 95):>12.3f}")
+        cache_stats = cache.stats()
+        print(f"命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}, 失效 {cache_stats['invalidations']} 次")
+        if isinstance(runner, InProcessRunner) and runner.embeddings is not None:
+            embed_stats = runner.embeddings.stats()
+            print(f"查询嵌入缓存: 命中 {embed_stats['hits']} / 未命中 {embed_stats['misses']}")
+
+    if batch:
+        print("\n批量吞吐量 vs 逐条延迟")
+        print(f"{'方法':<35} {'逐条 q/s':>10} {'批量 q/s':>10} {'批量 p50':>10} {'批量 p95':>10}")
+        print("-" * 79)
+        for method, strategy, method_name in SEARCH_METHODS:
+            method_key = f"{method}_{strategy}" if strategy else method
+            stats, sequential = batch[method_key], latency[method_key]
+            sequential_qps = 1000 / sequential.p50 if sequential.p50 > 0 else 0.0
+            print(f"{method_name:<35} {sequential_qps:>10.1f} {stats.qps:>10.1f} "
+                  f"{percentile(stats.query_ms, 50):>10.1f} {percentile(stats.query_ms, 95):>10.1f}")
+
     # 2. Score Distribution
     print("\n### 2️⃣ 相关性得分分布 (Top-10 平均分)")
     print("-" * 60)
@@ -254,6 +961,24 @@ def main():
             max_score = max(scores)
             print(f"{method_name:<35} {avg_score:>12.4f} {min_score:.4f} - {max_score:.4f}")
 
+    quality: Dict[str, Dict[str, float]] = {}
+    if qrels:
+        for method, strategy, method_name in SEARCH_METHODS:
+            method_key = f"{method}_{strategy}" if strategy else method
+            scores = method_quality(all_results, method_key, qrels, args.limit)
+            if scores is not None:
+                quality[method_key] = scores
+        recall_key = f"recall@{args.limit}"
+        print(f"\n相关性质量 (qrels: {args.qrels}, {len(qrels)} 条标注查询)")
+        print(f"{'方法':<35} {'nDCG@10':>10} {'MRR':>10} {recall_key:>10} {'p50 ms':>10}")
+        print("-" * 79)
+        for method, strategy, method_name in SEARCH_METHODS:
+            method_key = f"{method}_{strategy}" if strategy else method
+            if method_key in quality:
+                q = quality[method_key]
+                print(f"{method_name:<35} {q['ndcg@10']:>10.4f} {q['mrr']:>10.4f} {q[recall_key]:>10.4f} "
+                      f"{latency[method_key].p50:>10.1f}")
+
     # 3. Ranking Stability (vs Hybrid as baseline)
     print("\n### 3️⃣ 排名稳定性 (与 Hybrid 基线对比)")
     print("-" * 60)
@@ -267,16 +992,8 @@ def main():
             print(f"{method_name:<35} {'1.0000':>12} {'(基线)':>20}")
             continue
 
-        similarities = []
-        for query in all_results:
-            baseline = all_results[query].get("hybrid")
-            candidate = all_results[query].get(method_key)
-            if baseline and candidate and baseline.success and candidate.success:
-                sim = calculate_ranking_similarity(baseline.top_files, candidate.top_files)
-                similarities.append(sim)
-
-        if similarities:
-            avg_sim = sum(similarities) / len(similarities)
+        avg_sim = method_similarity(all_results, method_key)
+        if avg_sim is not None:
             diff_level = "高度一致" if avg_sim > 0.7 else "中度差异" if avg_sim > 0.4 else "显著差异"
             print(f"{method_name:<35} {avg_sim:>12.4f} {diff_level:>20}")
 
@@ -284,7 +1001,7 @@ def main():
     print("\n### 4️⃣ 各查询详细对比")
     print("-" * 60)
 
-    for query, query_desc in TEST_QUERIES:
+    for query, query_desc in test_queries:
         print(f"\n📌 \"{query}\" ({query_desc})")
         print()
 
@@ -306,7 +1023,20 @@ def main():
     print("📋 总结")
     print_divider()
 
-    print("""
+    if quality:
+        # Measured trade-off instead of the fixed characterisation below
+        points = {key: (latency[key].p50, q["ndcg@10"]) for key, q in quality.items() if latency[key].samples}
+        frontier = pareto_frontier(points)
+        names = {f"{m}_{s}" if s else m: name for m, s, name in SEARCH_METHODS}
+        print("\n延迟-质量 Pareto 前沿 (p50 ms vs nDCG@10, 由快到慢):")
+        for key in frontier:
+            print(f"  • {names[key]:<35} {points[key][0]:>10.1f}ms  nDCG@10 {points[key][1]:.4f}")
+        dominated = [key for key in points if key not in frontier]
+        if dominated:
+            print("被支配 (存在更快且不更差的方法): " + ", ".join(names[key] for key in dominated))
+        print()
+    else:
+        print("""
 ┌─────────────────────────────────────────────────────────────────────┐
 │ 方法特点总结                                                          │
 ├─────────────────────────────────────────────────────────────────────┤
@@ -325,6 +1055,12 @@ def main():
 
     print_divider()
 
+    if args.output:
+        write_results(args.output, args, runs, latency, all_results, batch, cache, qrels, fts)
+        print(f"💾 结果已写入: {args.output}")
+
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""Consolidated, memory-mapped binary vector index for cascade binary search.
+
+The coarse stage of ``cascade --cascade-strategy binary`` otherwise has to
+open every per-directory ``_index.db`` and read its ``semantic_chunks``.
+This module packs the sign bits of every chunk embedding into one file next
+to the shards, so a query is a single pass over a memory map:
+
+* ``_binary_vectors.bin``   N rows x (dim / 8) bytes, packed sign bits
+* ``_binary_chunks.db``     row -> (shard, chunk id, file path)
+* ``_binary_vectors.json``  dim, row count, and the index generation it was
+                            built from (used for staleness checks)
+
+Hamming distance is XOR + popcount over 64-bit words, computed in fixed-size
+blocks into buffers allocated once per index, so steady-state queries do
+not allocate per row.
+
+Usage::
+
+    python binary_index.py build INDEX_ROOT
+    python binary_index.py bench INDEX_ROOT [--queries 50] [--k 200] [--verify]
+    python binary_index.py bench --synthetic 1000000 --dim 1024
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+from index_shards import (GenerationWatch, build_path, find_index_dbs, index_generation, open_readonly, read_meta,
+                          write_meta)
+
+VECTORS_NAME = "_binary_vectors.bin"
+CHUNKS_NAME = "_binary_chunks.db"
+META_NAME = "_binary_vectors.json"
+SCHEMA_VERSION = 1
+DEFAULT_BLOCK_ROWS = 65536
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("binary_index requires numpy: pip install numpy")
+
+
+def pack_signs(vectors: "np.ndarray") -> "np.ndarray":
+    """Sign-binarize float vectors (> 0 -> 1) and pack 8 dimensions per byte."""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def iter_shard_vectors(db_path: str) -> Iterator[Tuple[int, str, bytes]]:
+    """Yield (chunk id, file path, float32 embedding blob) from one shard."""
+    conn = open_readonly(db_path)
+    try:
+        try:
+            cursor = conn.execute("SELECT id, file_path, embedding FROM semantic_chunks ORDER BY id")
+        except sqlite3.OperationalError:
+            return
+        for row in cursor:
+            yield row
+    finally:
+        conn.close()
+
+
+def build(index_root: str) -> dict:
+    """Build (or rebuild) the binary index for every shard under index_root.
+
+    Shards are streamed one at a time, so memory stays bounded by the
+    largest shard rather than the whole index.
+    """
+    _require_numpy()
+    index_files = find_index_dbs(index_root)
+    generation = index_generation(index_root, index_files)
+
+    vectors_path = os.path.join(index_root, VECTORS_NAME)
+    chunks_path = os.path.join(index_root, CHUNKS_NAME)
+    tmp_vectors = build_path(vectors_path)
+    tmp_chunks = build_path(chunks_path)
+
+    dim: Optional[int] = None
+    count = 0
+    skipped = 0
+    chunks = sqlite3.connect(tmp_chunks)
+    chunks.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, shard TEXT NOT NULL,"
+                   " chunk_id INTEGER NOT NULL, file_path TEXT NOT NULL)")
+
+    with open(tmp_vectors, "wb") as out:
+        for db_path in index_files:
+            shard = os.path.relpath(db_path, index_root)
+            floats: List["np.ndarray"] = []
+            rows = []
+            for chunk_id, file_path, blob in iter_shard_vectors(db_path):
+                vector = np.frombuffer(blob, dtype=np.float32)
+                if dim is None:
+                    dim = vector.size
+                if vector.size != dim:
+                    skipped += 1
+                    continue
+                floats.append(vector)
+                rows.append((count + len(rows), shard, chunk_id, file_path))
+            if not rows:
+                continue
+            out.write(pack_signs(np.vstack(floats)).tobytes())
+            chunks.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+            count += len(rows)
+
+    chunks.commit()
+    chunks.close()
+    os.replace(tmp_vectors, vectors_path)
+    os.replace(tmp_chunks, chunks_path)
+
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "dim": dim or 0,
+        "count": count,
+        "bytes_per_vector": ((dim or 0) + 7) // 8,
+        "skipped_dim_mismatch": skipped,
+        "generation": generation,
+        "built_at": time.time(),
+    }
+    write_meta(index_root, META_NAME, meta)
+    return meta
+
+
+class BinaryIndex:
+    """Read-only view over a built binary index."""
+
+    def __init__(self, index_root: str, block_rows: int = DEFAULT_BLOCK_ROWS):
+        _require_numpy()
+        self.index_root = index_root
+        self.meta = read_meta(index_root, META_NAME, SCHEMA_VERSION)
+        self._generation = GenerationWatch(index_root)
+
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        width = self.meta["bytes_per_vector"]
+        if self.count:
+            packed = np.memmap(os.path.join(index_root, VECTORS_NAME), dtype=np.uint8,
+                               mode="r", shape=(self.count, width))
+        else:
+            packed = np.zeros((0, width), dtype=np.uint8)
+        # 64-bit words cut XOR/popcount work 8x when the row width allows it;
+        # without np.bitwise_count (NumPy < 2.0) popcount is a byte lookup table
+        use_words = width % 8 == 0 and hasattr(np, "bitwise_count")
+        self._word = np.uint64 if use_words else np.uint8
+        self.packed = packed.view(self._word)
+
+        self.block_rows = max(1, min(block_rows, max(self.count, 1)))
+        self._xor = np.empty((self.block_rows, self.packed.shape[1]), dtype=self._word)
+        self._bits = np.empty(self._xor.shape, dtype=np.uint8)
+        self._distances = np.empty(self.count, dtype=np.uint16)
+        self._lock = threading.Lock()
+        self._chunks = sqlite3.connect(os.path.join(index_root, CHUNKS_NAME), check_same_thread=False)
+
+    def is_stale(self) -> bool:
+        """True if any shard changed since the index was built."""
+        return self._generation.current() != self.meta.get("generation")
+
+    def hamming(self, query_bits: "np.ndarray") -> "np.ndarray":
+        """Hamming distance from packed query bits to every row (shared buffer)."""
+        query = np.ascontiguousarray(query_bits, dtype=np.uint8).view(self._word)
+        columns = self.packed.shape[1]
+        for start in range(0, self.count, self.block_rows):
+            end = min(start + self.block_rows, self.count)
+            n = end - start
+            xor = np.bitwise_xor(self.packed[start:end], query, out=self._xor[:n])
+            if self._word is np.uint64:
+                bits = np.bitwise_count(xor, out=self._bits[:n])
+            else:
+                bits = np.take(_POPCOUNT_TABLE, xor, out=self._bits[:n])
+            # Column-wise in-place adds beat a row-wise sum over a short axis
+            distances = self._distances[start:end]
+            np.copyto(distances, bits[:, 0])
+            for column in range(1, columns):
+                np.add(distances, bits[:, column], out=distances)
+        return self._distances
+
+    def search_bits(self, query_bits: "np.ndarray", k: int) -> List[Tuple[int, int]]:
+        """Top-k (row, distance) by ascending Hamming distance, ties by row.
+
+        Rows tied with the k-th distance beyond the cut are chosen by the
+        partition (deterministic for the same index and query); re-scanning
+        all N distances for them would cost another O(N) pass per query.
+        """
+        with self._lock:
+            distances = self.hamming(query_bits)
+            k = min(k, self.count)
+            if k <= 0:
+                return []
+            candidates = np.argpartition(distances, k - 1)[:k] if k < self.count else np.arange(self.count)
+            order = np.lexsort((candidates, distances[candidates]))
+            return [(int(candidates[i]), int(distances[candidates[i]])) for i in order]
+
+    def search(self, query_vector: "np.ndarray", k: int = 200) -> List[dict]:
+        """Coarse binary retrieval for a float query embedding."""
+        hits = self.search_bits(pack_signs(query_vector), k)
+        return self.resolve(hits)
+
+    def resolve(self, hits: List[Tuple[int, int]]) -> List[dict]:
+        """Attach shard / chunk id / file path to (row, distance) hits."""
+        results = []
+        for row, distance in hits:
+            shard, chunk_id, file_path = self._chunks.execute(
+                "SELECT shard, chunk_id, file_path FROM chunks WHERE row = ?", (row,)).fetchone()
+            results.append({"row": row, "shard": shard, "chunk_id": chunk_id,
+                            "path": file_path, "hamming": distance})
+        return results
+
+    def close(self) -> None:
+        self._chunks.close()
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if np is not None else None
+
+
+def shard_scan_topk(index_root: str, query_bits: "np.ndarray", k: int) -> List[Tuple[str, int, int]]:
+    """Reference top-k: open every shard and score its chunks one shard at a time.
+
+    This is the access pattern the consolidated index replaces; results are
+    (shard, chunk id, distance) ordered by distance, then shard order, then id.
+    """
+    scored = []
+    for db_path in find_index_dbs(index_root):
+        shard = os.path.relpath(db_path, index_root)
+        for chunk_id, _, blob in iter_shard_vectors(db_path):
+            bits = pack_signs(np.frombuffer(blob, dtype=np.float32))
+            if bits.shape != query_bits.shape:
+                continue
+            distance = int(np.unpackbits(np.bitwise_xor(bits, query_bits)).sum())
+            scored.append((distance, len(scored), shard, chunk_id))
+    scored.sort()
+    return [(shard, chunk_id, distance) for distance, _, shard, chunk_id in scored[:k]]
+
+
+def same_topk(got: List[Tuple[str, int, int]], expected: List[Tuple[str, int, int]]) -> bool:
+    """Equal distances, and equal hits below the k-th distance (ties at the cut may differ)."""
+    if [hit[2] for hit in got] != [hit[2] for hit in expected]:
+        return False
+    kth = got[-1][2] if got else 0
+    return [hit for hit in got if hit[2] < kth] == [hit for hit in expected if hit[2] < kth]
+
+
+def _synthetic_index(count: int, dim: int) -> str:
+    """Random packed vectors for scale tests (no shards, no chunk paths)."""
+    root = tempfile.mkdtemp(prefix="binary-index-bench-")
+    rng = np.random.default_rng(0)
+    width = (dim + 7) // 8
+    with open(os.path.join(root, VECTORS_NAME), "wb") as out:
+        for start in range(0, count, 262144):
+            n = min(262144, count - start)
+            out.write(rng.integers(0, 256, size=(n, width), dtype=np.uint8).tobytes())
+    conn = sqlite3.connect(os.path.join(root, CHUNKS_NAME))
+    conn.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, shard TEXT, chunk_id INTEGER, file_path TEXT)")
+    conn.close()
+    write_meta(root, META_NAME, {"schema_version": SCHEMA_VERSION, "dim": dim, "count": count,
+                                 "bytes_per_vector": width, "generation": None})
+    return root
+
+
+def bench(args: argparse.Namespace) -> int:
+    _require_numpy()
+    root = _synthetic_index(args.synthetic, args.dim) if args.synthetic else args.index_root
+    index = BinaryIndex(root)
+    rng = np.random.default_rng(1)
+    width = index.meta["bytes_per_vector"]
+    queries = rng.integers(0, 256, size=(args.queries, width), dtype=np.uint8)
+
+    index.search_bits(queries[0], args.k)  # fault in the memory map
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search_bits(query, args.k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"rows={index.count} dim={index.dim} k={args.k} queries={len(queries)}")
+    print(f"binary coarse search: p50={p50:.2f}ms p95={p95:.2f}ms")
+
+    exit_code = 0
+    if args.verify and not args.synthetic:
+        mismatches = 0
+        for query in queries[:min(len(queries), 10)]:
+            got = [(r["shard"], r["chunk_id"], r["hamming"]) for r in index.resolve(index.search_bits(query, args.k))]
+            expected = shard_scan_topk(root, query, args.k)
+            if not same_topk(got, expected):
+                mismatches += 1
+        print(f"verify vs per-shard scan: {'OK' if not mismatches else f'{mismatches} mismatched queries'}")
+        exit_code = 1 if mismatches else 0
+    if not args.synthetic and index.is_stale():
+        print("warning: shards changed since the index was built; run 'build' again")
+    index.close()
+    if args.synthetic:
+        del index
+        shutil.rmtree(root, ignore_errors=True)
+    return exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Memory-mapped binary vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Pack all shard embeddings into one binary index")
+    build_parser.add_argument("index_root")
+
+    bench_parser = sub.add_parser("bench", help="Time coarse retrieval and check it against a shard scan")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--queries", type=int, default=50)
+    bench_parser.add_argument("--k", type=int, default=int(os.environ.get("CODEXLENS_BINARY_TOP_K", "200")))
+    bench_parser.add_argument("--verify", action="store_true", help="Compare top-k with a per-shard scan")
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N random vectors instead")
+    bench_parser.add_argument("--dim", type=int, default=1024, help="Dimensions for --synthetic")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        meta = build(args.index_root)
+        print(json.dumps(meta, indent=2))
+        return 0
+    if not args.index_root and not args.synthetic:
+        parser.error("bench needs INDEX_ROOT or --synthetic N")
+    return bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
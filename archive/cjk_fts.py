@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""N-gram full-text index over chunk content, so CJK keyword queries hit an inverted index.
+
+The FTS side of hybrid search tokenizes on word boundaries. Chinese,
+Japanese and Korean text has none, so a run like ``热网络计算`` becomes one
+token that only an identical run matches, and the query falls through to the
+vector path. ``build`` writes one consolidated FTS5 table next to the shards
+with the chunk text tokenized so substrings of CJK runs are searchable:
+
+* ``bigram``   CJK runs are split into overlapping character pairs before
+               indexing (``热网 网络 络计 计算``); other text goes through the
+               ``unicode61`` tokenizer unchanged. A CJK query is the phrase
+               of its pairs, i.e. an exact substring match, and two-character
+               words (the common case) work. Any SQLite with FTS5.
+* ``trigram``  SQLite's own ``trigram`` tokenizer (3.34+) over the raw text.
+               No preprocessing, but runs shorter than three characters
+               cannot be matched, so such queries are not answered here.
+
+Files, per mode:
+
+* ``_fts_<mode>.db``    contentless FTS5 table (index only, text is not
+                        stored again) plus rowid -> (shard, chunk id, path)
+* ``_fts_<mode>.json``  mode, row count, sizes, and the index generation it
+                        was built from (used for staleness checks)
+
+``bench`` reports index-size overhead against the shards and search latency
+for CJK queries next to English ones, with a LIKE scan of the shards as the
+unindexed baseline.
+
+Usage::
+
+    python cjk_fts.py build INDEX_ROOT [--mode bigram|trigram]
+    python cjk_fts.py search INDEX_ROOT "热网络计算" [--k 10] [--mode bigram]
+    python cjk_fts.py bench INDEX_ROOT [--queries queries.jsonl] [--repeat 20]
+    python cjk_fts.py bench --synthetic 20000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from bench_common import percentile, synthetic_root, write_chunk_shard
+from index_shards import (GenerationWatch, build_path, find_index_dbs, index_generation, open_readonly, read_meta,
+                          write_meta)
+
+MODES = ("bigram", "trigram")
+SCHEMA_VERSION = 1
+
+# Kana, CJK ideographs (incl. extension A and compatibility) and Hangul syllables
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+_WORD = re.compile(r"\w")
+# Sentence punctuation (full- and half-width) marks a question, not a keyword lookup
+_SENTENCE_PUNCT = re.compile(r"[？?。！!，,、：:；;]")
+MAX_KEYWORD_CHARS = 12
+MAX_KEYWORD_TERMS = 3
+
+
+def has_cjk(text: str) -> bool:
+    return _CJK_RUN.search(text) is not None
+
+
+def is_keyword_query(text: str) -> bool:
+    """A short CJK keyword query (``热网络计算``), as opposed to a natural-language question.
+
+    Only these are worth answering by keyword match alone; longer queries
+    need the semantic half of hybrid search.
+    """
+    text = text.strip()
+    return (has_cjk(text) and not _SENTENCE_PUNCT.search(text)
+            and len(text.replace(" ", "")) <= MAX_KEYWORD_CHARS and len(text.split()) <= MAX_KEYWORD_TERMS)
+
+
+def db_name(mode: str) -> str:
+    return f"_fts_{mode}.db"
+
+
+def meta_name(mode: str) -> str:
+    return f"_fts_{mode}.json"
+
+
+def _bigrams(run: str) -> List[str]:
+    return [run] if len(run) < 2 else [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def bigram_text(text: str) -> str:
+    """Text as indexed in bigram mode: every CJK run replaced by its spaced character pairs."""
+    return _CJK_RUN.sub(lambda m: " " + " ".join(_bigrams(m.group())) + " ", text)
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_expression(query: str, mode: str) -> Optional[str]:
+    """FTS5 MATCH expression requiring every query term, or None if the index cannot answer it.
+
+    Non-CJK words are quoted so punctuation in identifiers is not read as
+    FTS5 syntax; the tokenizer splits them the same way it split the text.
+    """
+    terms = []
+    position = 0
+    for match in list(_CJK_RUN.finditer(query)) + [None]:
+        end = match.start() if match else len(query)
+        terms.extend(_phrase(word) for word in query[position:end].split() if _WORD.search(word))
+        if match is None:
+            break
+        run = match.group()
+        if mode == "bigram":
+            terms.append(_phrase(" ".join(_bigrams(run))) + ("*" if len(run) == 1 else ""))
+        elif len(run) >= 3:
+            terms.append(_phrase(run))
+        else:
+            return None
+        position = match.end()
+    if mode == "trigram":
+        # Latin words shorter than three characters have no trigram either
+        terms = [t for t in terms if len(t) - 2 >= 3]
+    return " AND ".join(terms) if terms else None
+
+
+def _iter_shard_chunks(db_path: str):
+    conn = open_readonly(db_path)
+    try:
+        try:
+            cursor = conn.execute("SELECT id, file_path, content FROM semantic_chunks ORDER BY id")
+        except sqlite3.OperationalError:
+            return
+        for row in cursor:
+            yield row
+    finally:
+        conn.close()
+
+
+def build(index_root: str, mode: str = "bigram") -> dict:
+    """Build (or rebuild) the full-text index of every shard's chunk content."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}'; expected one of {', '.join(MODES)}")
+    index_files = find_index_dbs(index_root)
+    generation = index_generation(index_root, index_files)
+    path = os.path.join(index_root, db_name(mode))
+    tmp_path = build_path(path)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(tmp_path)
+    tokenizer = "trigram" if mode == "trigram" else "unicode61"
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE fts USING fts5(content, content='', tokenize='{tokenizer}')")
+    except sqlite3.OperationalError as e:
+        conn.close()
+        os.remove(tmp_path)
+        raise RuntimeError(f"SQLite {sqlite3.sqlite_version} cannot create a {mode} FTS5 table: {e}")
+    conn.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, shard TEXT NOT NULL,"
+                 " chunk_id INTEGER NOT NULL, file_path TEXT NOT NULL)")
+    count = 0
+    shard_bytes = 0
+    for db_path in index_files:
+        shard = os.path.relpath(db_path, index_root)
+        shard_bytes += os.path.getsize(db_path)
+        rows, texts = [], []
+        for chunk_id, file_path, content in _iter_shard_chunks(db_path):
+            count += 1
+            rows.append((count, shard, chunk_id, file_path))
+            texts.append((count, bigram_text(content or "") if mode == "bigram" else content or ""))
+        conn.executemany("INSERT INTO rows VALUES (?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO fts (rowid, content) VALUES (?, ?)", texts)
+    conn.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "mode": mode,
+        "sqlite_version": sqlite3.sqlite_version,
+        "count": count,
+        "bytes": os.path.getsize(path),
+        "shard_bytes": shard_bytes,
+        "build_s": time.perf_counter() - start,
+        "generation": generation,
+        "built_at": time.time(),
+    }
+    write_meta(index_root, meta_name(mode), meta)
+    return meta
+
+
+class CjkFts:
+    """Read-only view over a built full-text index."""
+
+    def __init__(self, index_root: str, mode: str = "bigram"):
+        self.index_root = index_root
+        self.mode = mode
+        self.meta = read_meta(index_root, meta_name(mode), SCHEMA_VERSION)
+        self._conn = open_readonly(os.path.join(index_root, db_name(mode)))
+        self._generation = GenerationWatch(index_root)
+
+    @classmethod
+    def open(cls, index_root: str, mode: str = "bigram") -> Optional["CjkFts"]:
+        """The index for mode, or None when it has not been built."""
+        if not os.path.exists(os.path.join(index_root, meta_name(mode))):
+            return None
+        return cls(index_root, mode)
+
+    def is_stale(self) -> bool:
+        return self._generation.current() != self.meta.get("generation")
+
+    def search(self, query: str, k: int = 10) -> Optional[List[dict]]:
+        """Best k chunks by BM25 (higher score is better), or None if the query cannot be answered here."""
+        expression = match_expression(query, self.mode)
+        if expression is None:
+            return None
+        rows = self._conn.execute(
+            "SELECT r.row, r.shard, r.chunk_id, r.file_path, -fts.rank FROM fts JOIN rows r ON r.row = fts.rowid"
+            " WHERE fts MATCH ? ORDER BY fts.rank LIMIT ?", (expression, k)).fetchall()
+        return [{"row": row, "shard": shard, "chunk_id": chunk_id, "path": path, "score": score}
+                for row, shard, chunk_id, path, score in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def like_scan(index_root: str, query: str, k: int = 10) -> List[str]:
+    """Unindexed baseline: first k paths of chunks containing every query word.
+
+    Every shard is scanned in full, as ranking the matches would require.
+    """
+    words = query.split()
+    clause = " AND ".join("content LIKE ?" for _ in words)
+    paths: List[str] = []
+    for db_path in find_index_dbs(index_root):
+        conn = open_readonly(db_path)
+        try:
+            paths.extend(p for (p,) in conn.execute(
+                f"SELECT file_path FROM semantic_chunks WHERE {clause}", [f"%{w}%" for w in words]))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+    return paths[:k]
+
+
+_SYNTH_CHARS = "热网络计算边界条件定子槽冷却温度场分布损耗析流体材料属性格划阻介质迭代求解收敛判据绕组升通风道模型参数电机转速功率矩阵节点方程"
+_SYNTH_EN = ["Thermal", "Resistance", "Boundary", "Condition", "Stator", "Slot", "Cooling", "Mesh", "Solver",
+             "Network", "Heat", "Source", "Winding", "Coolant", "Flow", "Matrix", "Node", "Loss", "Rotor", "Model"]
+
+
+def _synthetic_shards(count: int, shards: int = 16, seed: int = 0) -> str:
+    """Shards of chunks mixing English identifiers with Chinese comments and docs.
+
+    Words come from a few thousand random CJK words and camel-case
+    identifiers, with the built-in benchmark queries planted in about 1% of
+    chunks, so keyword queries are selective as they are in real code.
+    """
+    from bench_queries import TEST_QUERIES
+    root = synthetic_root("cjk-fts")
+    rng = random.Random(seed)
+    cjk_words = ["".join(rng.sample(_SYNTH_CHARS, rng.randint(2, 4))) for _ in range(3000)]
+    identifiers = ["".join(rng.sample(_SYNTH_EN, 2)) + rng.choice(["", "Impl", "Config", "s"]) for _ in range(3000)]
+    planted = [query for query, _ in TEST_QUERIES]
+    per_shard = max(1, count // shards)
+    chunk_id = 0
+    for shard in range(shards):
+        rows = []
+        for _ in range(per_shard):
+            chunk_id += 1
+            lines = []
+            for _ in range(12):
+                if rng.random() < 0.3:
+                    lines.append("# " + "，".join(rng.sample(cjk_words, 3)) + "。")
+                else:
+                    lines.append(f"    {rng.choice(identifiers).lower()} = {rng.choice(identifiers)}(x, y)")
+            if rng.random() < 0.01:
+                lines.insert(rng.randrange(len(lines)), f"# {rng.choice(planted)}")
+            rows.append((chunk_id, f"d{shard:02d}/mod_{chunk_id}.py", "\n".join(lines), b""))
+        write_chunk_shard(root, f"d{shard:02d}", rows)
+    return root
+
+
+def _time(fn, repeat: int) -> Tuple[List[float], object]:
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+def bench(args: argparse.Namespace) -> int:
+    from bench_queries import TEST_QUERIES, load_queries
+    root = _synthetic_shards(args.synthetic) if args.synthetic else args.index_root
+    queries = [q for q, _ in (load_queries(args.queries) if args.queries else TEST_QUERIES)]
+    groups: Dict[str, List[str]] = {"CJK": [q for q in queries if has_cjk(q)],
+                                    "English": [q for q in queries if not has_cjk(q)]}
+    try:
+        shard_bytes = sum(os.path.getsize(p) for p in find_index_dbs(root))
+        print(f"shards={len(find_index_dbs(root))} shard MB={shard_bytes / 1e6:.1f} "
+              f"queries: {len(groups['CJK'])} CJK, {len(groups['English'])} English, repeat={args.repeat}")
+        print(f"{'index':<10} {'build s':>8} {'MB':>8} {'overhead':>9} {'queries':<8} "
+              f"{'answered':>9} {'p50 ms':>8} {'p95 ms':>8} {'hits':>6}")
+
+        def report(label: str, build_s: str, size: str, overhead: str, group: str, fn) -> None:
+            timings, answered, hits = [], 0, 0
+            for query in groups[group]:
+                times, result = _time(lambda: fn(query), args.repeat)
+                if result is None:
+                    continue
+                answered += 1
+                timings.extend(times)
+                hits += len(result)
+            print(f"{label:<10} {build_s:>8} {size:>8} {overhead:>9} {group:<8} "
+                  f"{answered:>4}/{len(groups[group]):<4} {percentile(timings, 50):>8.2f} "
+                  f"{percentile(timings, 95):>8.2f} {hits / max(answered, 1):>6.1f}")
+
+        for group in groups:
+            report("like-scan", "-", "-", "-", group, lambda q: like_scan(root, q, args.k))
+        for mode in args.mode:
+            try:
+                meta = build(root, mode)
+            except RuntimeError as e:
+                print(f"{mode:<10} skipped: {e}")
+                continue
+            index = CjkFts(root, mode)
+            try:
+                overhead = f"{meta['bytes'] / shard_bytes:.1%}" if shard_bytes else "-"
+                for group in groups:
+                    report(mode, f"{meta['build_s']:.2f}", f"{meta['bytes'] / 1e6:.1f}", overhead, group,
+                           lambda q: index.search(q, args.k))
+            finally:
+                index.close()
+    finally:
+        if args.synthetic:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="N-gram full-text index for CJK keyword search")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Index the content of every shard's chunks")
+    build_parser.add_argument("index_root")
+    build_parser.add_argument("--mode", choices=MODES, default="bigram")
+
+    search_parser = sub.add_parser("search", help="Query a built index")
+    search_parser.add_argument("index_root")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--mode", choices=MODES, default="bigram")
+    search_parser.add_argument("--k", type=int, default=10)
+
+    bench_parser = sub.add_parser("bench", help="Index size and CJK vs English query latency per mode")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--mode", choices=MODES, action="append",
+                              help="Mode to build and measure (repeatable; default: all)")
+    bench_parser.add_argument("--queries", metavar="JSONL", help="Query set instead of the built-in TEST_QUERIES")
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--repeat", type=int, default=20, help="Timed runs per query (default: 20)")
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N synthetic mixed-language chunks")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        print(json.dumps(build(args.index_root, args.mode), indent=2))
+        return 0
+    if args.command == "search":
+        index = CjkFts.open(args.index_root, args.mode)
+        if index is None:
+            print(f"No {args.mode} index under {args.index_root}; run 'build' first", file=sys.stderr)
+            return 1
+        try:
+            if index.is_stale():
+                print("warning: shards changed since the index was built; run 'build' again", file=sys.stderr)
+            hits = index.search(args.query, args.k)
+        finally:
+            index.close()
+        if hits is None:
+            print(f"The {args.mode} index cannot answer this query (CJK run shorter than 3 characters)",
+                  file=sys.stderr)
+            return 1
+        print(json.dumps(hits, indent=2, ensure_ascii=False))
+        return 0
+    if not args.index_root and not args.synthetic:
+        parser.error("bench needs INDEX_ROOT or --synthetic N")
+    args.mode = args.mode or list(MODES)
+    return bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
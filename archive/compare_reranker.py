@@ -1,43 +1,32 @@
 #!/usr/bin/env python
-"""Compare search results with and without reranker."""
-import json
-import subprocess
-import sys
-import os
+"""Compare search results with and without reranker.
 
-os.chdir(r"D:\dongdiankaifa9\hydro_generator_module")
+``--backend mock`` (default) or ``--backend cross-encoder`` additionally
+reranks the hybrid results locally, so rerank overhead can be measured
+offline and separately from network time; ``--backend api`` calls the
+remote reranker through the same batching and cache.
+"""
+import argparse
 
-query = "热网络计算"
+from bench_queries import DEFAULT_PROJECT, TEST_QUERIES, enter_project
+from rerank import BACKENDS, Reranker, ScoreCache, create_backend
+from search_stream import run_codexlens_search
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--backend", choices=sorted(BACKENDS), default="mock", help="Rerank backend (mock and cross-encoder run locally, api calls the remote reranker)")
+parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk rerank score cache")
+parser.add_argument("--concurrency", type=int, default=4, help="Concurrent reranker calls")
+parser.add_argument("--project", default=DEFAULT_PROJECT, help=f"Indexed project to search in (default: {DEFAULT_PROJECT})")
+parser.add_argument("--query", default=TEST_QUERIES[0][0], help="Query to compare")
+args = parser.parse_args()
+
+enter_project(args.project)
+
+query = args.query
 
 def run_search(method: str) -> dict:
     """Run search and return parsed JSON result."""
-    cmd = [sys.executable, "-m", "codexlens", "search", query, "--method", method, "--limit", "10", "--json"]
-    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
-    # Find JSON in output (skip debug lines)
-    for line in result.stdout.split("\n"):
-        if line.strip().startswith("{"):
-            try:
-                return json.loads(line)
-            except:
-                pass
-    # Try to find JSON object in stderr
-    output = result.stdout + result.stderr
-    start = output.find('{"success"')
-    if start >= 0:
-        # Find matching closing brace
-        depth = 0
-        for i, c in enumerate(output[start:]):
-            if c == '{':
-                depth += 1
-            elif c == '}':
-                depth -= 1
-                if depth == 0:
-                    try:
-                        return json.loads(output[start:start+i+1])
-                    except:
-                        pass
-                    break
-    return {"success": False, "error": "Failed to parse JSON"}
+    return run_codexlens_search(query, method, limit=10)
 
 print("=" * 60)
 print("搜索对比: 有无 Reranker 效果")
@@ -70,8 +59,29 @@ if cascade_result.get("success"):
 else:
     print("搜索失败:", cascade_result.get("error"))
 
+# Rerank the hybrid candidates with the selected backend
+print(f"\n[3] Hybrid + 本地重排 (backend={args.backend})")
+print("-" * 40)
+if hybrid_result.get("success"):
+    candidates = hybrid_result.get("result", {}).get("results", [])[:10]
+    documents = [r.get("content") or r.get("excerpt") or r.get("path", "") for r in candidates]
+    reranker = Reranker(create_backend(args.backend), max_concurrency=args.concurrency,
+                        cache=None if args.no_cache else ScoreCache())
+    scores = reranker.rerank(query, documents)
+    # Documents the backend left unscored go last, in their hybrid order
+    ranked = sorted(zip(candidates, scores), key=lambda pair: (pair[1] is not None, pair[1] or 0.0), reverse=True)
+    for i, (r, score) in enumerate(ranked, 1):
+        path = r.get("path", "").split("\\")[-1]
+        print(f"{i:2}. {path[:45]:<45} score={'n/a' if score is None else f'{score:.4f}'}")
+    stats = reranker.stats
+    print(f"\n重排耗时: 总计 {stats['wall_ms']:.1f}ms, 其中 backend {stats['backend_ms']:.1f}ms "
+          f"({stats['calls']} 次调用, {stats['pairs_scored']} 对, 缓存命中 {stats['cache_hits']})")
+else:
+    print("跳过: Hybrid 搜索失败")
+
 print("\n" + "=" * 60)
 print("对比说明:")
 print("- Hybrid: FTS + Vector 融合，无二次重排序")
 print("- Cascade: Vector 粗筛 + Reranker API 精排")
+print(f"- 本地重排: Hybrid 候选 + {args.backend} backend (批量/并发/磁盘缓存)")
 print("=" * 60)
@@ -1,59 +1,22 @@
 #!/usr/bin/env python
 """Compare search results: Hybrid vs Cascade with Reranker."""
-import subprocess
-import sys
+import argparse
 import os
-import re
-import json
 
-os.chdir(r"D:\dongdiankaifa9\hydro_generator_module")
-query = "热网络计算"
+from bench_queries import DEFAULT_PROJECT, TEST_QUERIES, enter_project
+from search_stream import run_codexlens_search
 
-ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--project", default=DEFAULT_PROJECT, help=f"Indexed project to search in (default: {DEFAULT_PROJECT})")
+parser.add_argument("--query", default=TEST_QUERIES[0][0], help="Query to compare")
+args = parser.parse_args()
+
+enter_project(args.project)
+query = args.query
 
 def run_search(method: str) -> dict:
     """Run search and return parsed result dict."""
-    cmd = [sys.executable, "-m", "codexlens", "search", query,
-           "--method", method, "--limit", "10", "--json"]
-    result = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
-
-    # Strip ANSI codes
-    output = ansi_escape.sub('', result.stdout + result.stderr)
-
-    # Find and parse JSON (properly handle nested structures)
-    start = output.find('{')
-    if start < 0:
-        return {"success": False, "error": "No JSON found"}
-
-    # Count braces properly, handling strings
-    in_string = False
-    escaped = False
-    depth = 0
-    end_idx = start
-
-    for i, c in enumerate(output[start:]):
-        if escaped:
-            escaped = False
-            continue
-        if c == '\\':
-            escaped = True
-            continue
-        if c == '"' and not escaped:
-            in_string = not in_string
-            continue
-        if not in_string:
-            if c == '{':
-                depth += 1
-            elif c == '}':
-                depth -= 1
-                if depth == 0:
-                    end_idx = start + i + 1
-                    break
-
-    try:
-        return json.loads(output[start:end_idx])
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    return run_codexlens_search(query, method, limit=10)
 
 print("=" * 75)
 print(f"搜索对比: Hybrid vs Cascade")
@@ -0,0 +1,1134 @@
+#!/usr/bin/env python
+"""Incremental, content-addressed embedding of codexlens ``_index.db`` shards.
+
+Regenerating embeddings after a small edit used to re-chunk and re-embed
+whole files or directories. Here every chunk is identified by the SHA-1 of
+its text, and vectors live in one content-addressed store next to the
+shards, so a sync only embeds chunks whose text has never been embedded
+with the current model. An unchanged chunk keeps its vector even when its
+file is renamed or moved to another directory (shard).
+
+Chunks break at column-0 lines (top-level definitions) once a chunk has
+``min_lines``, and never grow past ``max_lines``. An edit therefore only
+changes the chunks around it instead of shifting every later boundary.
+
+``sync`` streams each shard through three generator stages: a paged file
+reader that chunks changed files, an embedder that pools missing chunks
+into batches sized to a memory budget (``AdaptiveBatcher``), and a writer
+that commits files in bulk transactions. Memory is bounded by one batch and
+one write buffer regardless of repo size. Every commit also advances the
+shard's checkpoint, so an interrupted run loses at most one buffer; a
+shard that finished and has not been written since is skipped outright.
+
+``semantic_chunks`` belongs to codexlens: shards it has not embedded yet
+are left alone, and rows it wrote itself (those without a ``chunk_hashes``
+entry) are never reused, replaced or deleted; their files are reported as
+``files_foreign``. ``status`` still checks them: such a file is stale when
+one of its stored chunk texts no longer occurs in its content, or when
+codexlens re-indexed it (``files.mtime``) after the rows were written, and
+rows of files that no longer exist count as deleted. Their coverage is
+reported apart from this tool's as ``foreign_coverage_percent``. A sync refuses to write vectors of a model other than
+the one already stored: for its own rows unless ``--force`` is given, for
+codexlens rows always. Without
+``--embedder``/``--model`` the model recorded in the shards is reused, and
+a sync with no recorded model refuses to guess one.
+
+Side tables written into each shard, next to ``semantic_chunks``:
+
+* ``embedding_files``       file path -> content hash and model it was embedded with
+* ``chunk_hashes``          ``semantic_chunks.id`` -> file path, chunk hash
+* ``embedding_checkpoint``  state and progress of the current or last sync
+
+Vector store: ``INDEX_ROOT/_chunk_vectors.db`` keyed on (model, chunk hash),
+plus the shard signatures recorded when each shard last finished.
+
+When an IVF index (ann_index.py) has been built under INDEX_ROOT, every
+file written or removed is applied to its lists as well, and each shard
+the index was current for stays current.
+
+``--workers N`` embeds batches in N processes that each load the model
+once (``PooledEmbedder``); vectors come back to the parent, which remains
+the only writer, so the index layout and the counts reported by
+ccw/check_embeddings.py are the same for any N.
+
+Usage::
+
+    python embed_pipeline.py status INDEX_ROOT [--json]
+    python embed_pipeline.py sync INDEX_ROOT [--embedder hash|sentence-transformers]
+                                             [--memory-budget-mb 512] [--workers N] [--force] [--json]
+    python embed_pipeline.py bench-workers INDEX_ROOT [--workers-list 1,2,4]
+    python embed_pipeline.py bench-workers --synthetic 2000
+"""
+import abc
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+from ann_index import IVFIndex, chunk_state
+from bench_common import SEMANTIC_CHUNKS_TABLE, create_shard
+from index_shards import find_index_dbs, open_readonly, shard_signature
+
+STORE_NAME = "_chunk_vectors.db"
+DEFAULT_MIN_LINES = 8
+DEFAULT_MAX_LINES = 60
+
+SIDE_TABLES = """
+CREATE TABLE IF NOT EXISTS embedding_files (
+    file_path TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunk_hashes (
+    chunk_id INTEGER PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_hashes_file ON chunk_hashes (file_path);
+CREATE TABLE IF NOT EXISTS embedding_checkpoint (
+    model TEXT NOT NULL,
+    state TEXT NOT NULL,
+    last_path TEXT NOT NULL,
+    files_done INTEGER NOT NULL,
+    chunks_done INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("embed_pipeline requires numpy: pip install numpy")
+
+
+# === Embedders ===
+
+class Embedder(abc.ABC):
+    """Turns chunk texts into float32 vectors."""
+
+    name = "base"
+    default_model = "base"
+    model = "base"
+    dim = 0
+    max_inflight = 1
+
+    @abc.abstractmethod
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """One row per text, in order."""
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        """Embed asynchronously; in-process embedders finish before returning."""
+        future: Future = Future()
+        try:
+            future.set_result(self.embed(texts))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class HashEmbedder(Embedder):
+    """Signed feature hashing of identifier tokens: deterministic, offline, no model."""
+
+    name = "hash"
+    default_model = "hash-384"
+
+    def __init__(self, model: str = default_model):
+        _require_numpy()
+        self.model = model
+        self.dim = int(model.rsplit("-", 1)[1])
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+                vectors[row, h % self.dim] += 1.0 if h >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Local sentence-transformers model, loaded once per process."""
+
+    name = "sentence-transformers"
+    default_model = "BAAI/bge-small-en-v1.5"
+
+    def __init__(self, model: str = default_model):
+        _require_numpy()
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "sentence-transformers embedder requires: pip install sentence-transformers"
+            ) from e
+        self.model = model
+        self._encoder = SentenceTransformer(model, device="cpu")
+        self.dim = self._encoder.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        return self._encoder.encode(list(texts), normalize_embeddings=True,
+                                    convert_to_numpy=True).astype(np.float32)
+
+
+EMBEDDERS = {
+    "hash": HashEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+
+def create_embedder(name: str, **kwargs) -> Embedder:
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}' (choose from {', '.join(EMBEDDERS)})")
+    return EMBEDDERS[name](**kwargs)
+
+
+def embedder_for_model(model: str) -> str:
+    """Name of the embedder that produces ``model`` vectors."""
+    if re.fullmatch(r"hash-\d+", model):
+        return "hash"
+    return "sentence-transformers"
+
+
+_worker_embedder: Optional[Embedder] = None
+
+
+def _init_worker(name: str, model: str, threads: int) -> None:
+    global _worker_embedder
+    # Keep N workers from each starting one BLAS/torch thread per core
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    _worker_embedder = create_embedder(name, model=model)
+
+
+def _worker_info() -> Tuple[str, int]:
+    return _worker_embedder.model, _worker_embedder.dim
+
+
+def _worker_embed(texts: List[str]) -> "np.ndarray":
+    return _worker_embedder.embed(texts)
+
+
+class PooledEmbedder(Embedder):
+    """Spread batches over worker processes that each load the model once.
+
+    Only vectors come back; the parent stays the single writer of the
+    shards and the vector store, so there is no SQLite lock contention.
+    """
+
+    def __init__(self, name: str, model: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.max_inflight = 2 * workers
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        # spawn: torch and BLAS thread pools do not survive fork reliably
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(name, model, threads))
+        self.model, self.dim = self._pool.submit(_worker_info).result()
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        return self.submit(texts).result()
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        return self._pool.submit(_worker_embed, list(texts))
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+
+# === Chunking ===
+
+@dataclass
+class Chunk:
+    start_line: int
+    end_line: int
+    text: str
+    hash: str = ""
+
+    def __post_init__(self) -> None:
+        self.hash = self.hash or content_hash(self.text)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def chunk_lines(content: str, min_lines: int = DEFAULT_MIN_LINES,
+                max_lines: int = DEFAULT_MAX_LINES) -> List[Chunk]:
+    """Split content at top-level lines so edits only disturb nearby chunks."""
+    lines = content.splitlines(keepends=True)
+    chunks: List[Chunk] = []
+    start = 0
+    for i, line in enumerate(lines):
+        size = i - start
+        top_level = bool(line.strip()) and line[0] not in " \t})]"
+        if size >= max_lines or (size >= min_lines and top_level):
+            chunks.append(Chunk(start + 1, i, "".join(lines[start:i])))
+            start = i
+    if start < len(lines):
+        chunks.append(Chunk(start + 1, len(lines), "".join(lines[start:])))
+    return [chunk for chunk in chunks if chunk.text.strip()]
+
+
+# === Vector store ===
+
+class VectorStore:
+    """Content-addressed (model, chunk hash) -> embedding store shared by all shards."""
+
+    def __init__(self, path: str, readonly: bool = False):
+        self._conn: Optional[sqlite3.Connection] = None
+        if readonly:
+            if os.path.exists(path):
+                self._conn = open_readonly(path)
+            return
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            " model TEXT NOT NULL, chunk_hash TEXT NOT NULL, embedding BLOB NOT NULL,"
+            " PRIMARY KEY (model, chunk_hash));"
+            "CREATE TABLE IF NOT EXISTS shard_state ("
+            " shard TEXT NOT NULL, model TEXT NOT NULL, signature TEXT NOT NULL, completed_at REAL NOT NULL,"
+            " PRIMARY KEY (shard, model));"
+        )
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        if self._conn is None:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            found.update(self._conn.execute(
+                f"SELECT chunk_hash, embedding FROM vectors WHERE model = ?"
+                f" AND chunk_hash IN ({','.join('?' * len(part))})",
+                [model] + part,
+            ).fetchall())
+        return found
+
+    def contains(self, model: str, hashes: Sequence[str]) -> set:
+        """The subset of hashes that already have a vector, without reading the vectors."""
+        found: set = set()
+        if self._conn is None:
+            return found
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), 500):
+            part = unique[i:i + 500]
+            found.update(row[0] for row in self._conn.execute(
+                f"SELECT chunk_hash FROM vectors WHERE model = ? AND chunk_hash IN ({','.join('?' * len(part))})",
+                [model] + part,
+            ))
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, bytes]) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO vectors (model, chunk_hash, embedding) VALUES (?, ?, ?)",
+            [(model, h, blob) for h, blob in vectors.items()],
+        )
+        self._conn.commit()
+
+    def shard_state(self, shard: str, model: str) -> Optional[str]:
+        """Signature of the shard file when it last finished a sync with model."""
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT signature FROM shard_state WHERE shard = ? AND model = ?",
+                                 (shard, model)).fetchone()
+        return row[0] if row else None
+
+    def set_shard_state(self, shard: str, model: str, signature: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO shard_state (shard, model, signature, completed_at)"
+                           " VALUES (?, ?, ?, ?)", (shard, model, signature, time.time()))
+        self._conn.commit()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+# === Planning ===
+
+@dataclass
+class ShardPlan:
+    """What a sync would do to one shard."""
+
+    db_path: str
+    files: int = 0
+    files_current: int = 0
+    files_foreign: int = 0     # embedded by codexlens itself; never touched here
+    files_foreign_stale: int = 0   # of those, edited since codexlens embedded them
+    changed: List[str] = field(default_factory=list)  # new or edited (or embedded with another model)
+    deleted: List[str] = field(default_factory=list)  # embedded (by either writer), but no longer in ``files``
+    chunks_total: int = 0
+    chunks_stale: int = 0      # rows of changed, stale foreign or deleted files
+    chunks_pending: int = 0    # chunks of changed files that need the embedder
+    chunks_reusable: int = 0   # chunks of changed files already in the vector store
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def stored_dim(conn: sqlite3.Connection) -> Optional[int]:
+    """Dimension of the codexlens vectors in semantic_chunks, or None if there are none."""
+    untracked = " WHERE id NOT IN (SELECT chunk_id FROM chunk_hashes)" if _has_table(conn, "chunk_hashes") else ""
+    row = conn.execute(f"SELECT length(embedding) FROM semantic_chunks{untracked} LIMIT 1").fetchone()
+    return row[0] // 4 if row and row[0] else None
+
+
+def codexlens_model(conn: sqlite3.Connection) -> Optional[str]:
+    """The model codexlens recorded in embeddings_config for its own rows, if any."""
+    if not _has_table(conn, "embeddings_config"):
+        return None
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(embeddings_config)")}
+    if "model_name" not in columns:
+        return None
+    row = conn.execute("SELECT model_name FROM embeddings_config ORDER BY rowid DESC LIMIT 1").fetchone()
+    return row[0] if row and row[0] else None
+
+
+def foreign_files(conn: sqlite3.Connection) -> Dict[str, int]:
+    """File path -> semantic_chunks rows this tool did not write (no chunk_hashes entry)."""
+    if not _has_table(conn, "semantic_chunks"):
+        return {}
+    if not _has_table(conn, "chunk_hashes"):
+        return dict(conn.execute("SELECT file_path, COUNT(*) FROM semantic_chunks GROUP BY file_path"))
+    return dict(conn.execute(
+        "SELECT c.file_path, COUNT(*) FROM semantic_chunks c LEFT JOIN chunk_hashes h ON h.chunk_id = c.id"
+        " WHERE h.chunk_id IS NULL GROUP BY c.file_path"
+    ))
+
+
+def foreign_is_current(conn: sqlite3.Connection, full_path: str, content: str, mtime: Optional[float]) -> bool:
+    """Whether codexlens's rows for a file still match it.
+
+    codexlens chunks with its own rules, so the chunks cannot be recomputed
+    here; instead every stored chunk text must still occur in the content,
+    and the file must not have been re-indexed after the newest row was
+    written (created_at has second resolution, hence the whole seconds).
+    """
+    untracked = " AND id NOT IN (SELECT chunk_id FROM chunk_hashes)" if _has_table(conn, "chunk_hashes") else ""
+    created = None
+    for text, row_created in conn.execute(
+            "SELECT content, CASE WHEN typeof(created_at) = 'text' THEN CAST(strftime('%s', created_at) AS REAL)"
+            f" ELSE created_at END FROM semantic_chunks WHERE file_path = ?{untracked}", (full_path,)):
+        if text and text not in content:
+            return False
+        if row_created is not None:
+            created = row_created if created is None else max(created, row_created)
+    return mtime is None or created is None or int(mtime) <= created
+
+
+def recorded_model(index_root: str) -> Optional[str]:
+    """The model most files were embedded with: ours from embedding_files, codexlens's from embeddings_config."""
+    files: Dict[str, int] = {}
+    for db_path in find_index_dbs(index_root):
+        conn = open_readonly(db_path)
+        try:
+            if _has_table(conn, "embedding_files"):
+                for model, count in conn.execute("SELECT model, COUNT(*) FROM embedding_files GROUP BY model"):
+                    files[model] = files.get(model, 0) + count
+            model = codexlens_model(conn)
+            if model:
+                files[model] = files.get(model, 0) + len(foreign_files(conn))
+        finally:
+            conn.close()
+    return max(files, key=files.get) if files else None
+
+
+def check_models(index_root: str, model: str, dim: int) -> Tuple[List[str], List[str]]:
+    """Shards whose stored vectors come from another model: (ours, codexlens's).
+
+    Our rows name their model in embedding_files. For codexlens rows the
+    model in embeddings_config is compared when it is recorded; otherwise
+    the vector dimension is the only evidence left.
+    """
+    ours, theirs = [], []
+    for db_path in find_index_dbs(index_root):
+        conn = open_readonly(db_path)
+        try:
+            shard = os.path.relpath(db_path, index_root)
+            if _has_table(conn, "embedding_files"):
+                others = [m for (m,) in conn.execute("SELECT DISTINCT model FROM embedding_files WHERE model != ?",
+                                                     (model,))]
+                if others:
+                    ours.append(f"{shard} ({', '.join(others)})")
+            if foreign_files(conn):
+                recorded = codexlens_model(conn)
+                existing = stored_dim(conn)
+                if recorded and recorded != model:
+                    theirs.append(f"{shard} ({recorded})")
+                elif not recorded and existing is not None and existing != dim:
+                    theirs.append(f"{shard} ({existing}d)")
+        finally:
+            conn.close()
+    return ours, theirs
+
+
+def iter_files(conn: sqlite3.Connection) -> Iterator[Tuple[str, str, Optional[float]]]:
+    """(full path, content, mtime codexlens indexed it at, if recorded) of every file."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    mtime = "mtime" if "mtime" in columns else "NULL"
+    for full_path, content, indexed_at in conn.execute(
+            f"SELECT full_path, content, {mtime} FROM files ORDER BY full_path"):
+        yield full_path, content or "", indexed_at
+
+
+def plan_shard(conn: sqlite3.Connection, db_path: str, store: VectorStore, model: str,
+               min_lines: int = DEFAULT_MIN_LINES, max_lines: int = DEFAULT_MAX_LINES) -> ShardPlan:
+    plan = ShardPlan(db_path=db_path)
+    # status opens shards read-only, so the side tables may not exist yet
+    embedded = {}
+    if _has_table(conn, "embedding_files"):
+        embedded = {path: (h, m) for path, h, m in
+                    conn.execute("SELECT file_path, content_hash, model FROM embedding_files")}
+    rows_per_file = {}
+    if _has_table(conn, "chunk_hashes"):
+        rows_per_file = dict(conn.execute("SELECT file_path, COUNT(*) FROM chunk_hashes GROUP BY file_path"))
+    foreign = foreign_files(conn)
+    plan.chunks_total = sum(rows_per_file.values()) + sum(foreign.values())
+
+    seen = set()
+    for full_path, content, mtime in iter_files(conn):
+        seen.add(full_path)
+        plan.files += 1
+        if full_path in foreign:
+            plan.files_foreign += 1
+            if not foreign_is_current(conn, full_path, content, mtime):
+                plan.files_foreign_stale += 1
+                plan.chunks_stale += foreign[full_path]
+            continue
+        if embedded.get(full_path) == (content_hash(content), model):
+            plan.files_current += 1
+            continue
+        plan.changed.append(full_path)
+        plan.chunks_stale += rows_per_file.get(full_path, 0)
+        hashes = [chunk.hash for chunk in chunk_lines(content, min_lines, max_lines)]
+        reusable = store.contains(model, hashes)
+        plan.chunks_reusable += sum(1 for h in hashes if h in reusable)
+        plan.chunks_pending += sum(1 for h in hashes if h not in reusable)
+
+    # Rows without a live file: removed files, and untracked rows of renamed ones
+    for path in sorted(set(embedded) | set(rows_per_file) | set(foreign)):
+        if path not in seen:
+            plan.deleted.append(path)
+            plan.chunks_stale += rows_per_file.get(path, 0) + foreign.get(path, 0)
+    return plan
+
+
+# === Sync ===
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> Optional[int]:
+    """High-water resident set size in bytes (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class AdaptiveBatcher:
+    """Size embedding batches to stay inside a memory budget.
+
+    A batch closes at ``size`` chunks or ``max_chars`` characters. After each
+    batch the growth of resident memory since the previous batch is compared
+    with the budget: over it halves the batch, under half of it doubles a full
+    batch again (within [min_size, max_size]). Measuring against the previous
+    batch rather than the start of the run lets the size recover once a spike
+    has passed. Where RSS cannot be read the character cap alone bounds the
+    batch.
+    """
+
+    def __init__(self, memory_budget_mb: int = 512, size: int = 32, min_size: int = 4, max_size: int = 1024):
+        self.budget = memory_budget_mb * 1024 * 1024
+        # Tokenizer and activation working set is a few hundred bytes per input character
+        self.max_chars = max(4096, self.budget // 256)
+        self.size = size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.reference = current_rss()
+        self.sizes: List[int] = []
+
+    def observe(self, count: int) -> None:
+        self.sizes.append(count)
+        rss = current_rss()
+        if rss is None or self.reference is None:
+            return
+        growth, self.reference = rss - self.reference, rss
+        if growth > self.budget:
+            self.size = max(self.min_size, self.size // 2)
+        elif growth < self.budget / 2 and count >= self.size:
+            self.size = min(self.max_size, self.size * 2)
+
+
+@dataclass
+class PendingFile:
+    """A changed file on its way from the chunker to the writer."""
+
+    full_path: str
+    file_hash: str
+    chunks: List[Chunk]
+    blobs: Dict[str, bytes]
+    missing: set
+
+
+def iter_changed_files(conn: sqlite3.Connection, store: VectorStore, model: str, seen: set,
+                       stats: Dict[str, float], min_lines: int = DEFAULT_MIN_LINES,
+                       max_lines: int = DEFAULT_MAX_LINES) -> Iterator[PendingFile]:
+    """Producer: chunk files whose content or model changed, one page of files at a time.
+
+    Paths are added to ``seen`` as they are read so the caller can find
+    deleted files once the stream is exhausted. Files codexlens embedded
+    itself are left to codexlens.
+    """
+    embedded = {path: (h, m) for path, h, m in
+                conn.execute("SELECT file_path, content_hash, model FROM embedding_files")}
+    foreign = foreign_files(conn)
+    last_path = ""
+    while True:
+        # Short paged reads: no statement stays open across the writer's commits
+        page = conn.execute("SELECT full_path, content FROM files WHERE full_path > ? ORDER BY full_path LIMIT 256",
+                            (last_path,)).fetchall()
+        if not page:
+            return
+        last_path = page[-1][0]
+        for full_path, content in page:
+            seen.add(full_path)
+            if full_path in foreign:
+                stats["files_foreign"] += 1
+                continue
+            content = content or ""
+            file_hash = content_hash(content)
+            if embedded.get(full_path) == (file_hash, model):
+                stats["files_current"] += 1
+                continue
+            chunks = chunk_lines(content, min_lines, max_lines)
+            blobs = store.get_many(model, [chunk.hash for chunk in chunks])
+            missing = {chunk.hash for chunk in chunks if chunk.hash not in blobs}
+            stats["chunks_reused"] += sum(1 for chunk in chunks if chunk.hash in blobs)
+            yield PendingFile(full_path, file_hash, chunks, blobs, missing)
+
+
+def embed_stream(files: Iterable[PendingFile], store: VectorStore, embedder: Embedder,
+                 batcher: AdaptiveBatcher, stats: Dict[str, float]) -> Iterator[PendingFile]:
+    """Consumer/producer: yield files once every chunk has a vector.
+
+    Missing chunks of consecutive files are pooled into adaptive batches and
+    handed to ``embedder.submit``; up to ``embedder.max_inflight`` batches run
+    at once (one for in-process embedders). Memory is bounded by the
+    in-flight batches plus the files waiting on them.
+    """
+    waiting: Deque[PendingFile] = deque()
+    inflight: Deque[Tuple[List[str], Future]] = deque()
+    inflight_hashes: set = set()
+    batch: Dict[str, str] = {}
+    batch_chars = 0
+
+    def flush() -> None:
+        nonlocal batch, batch_chars
+        hashes = list(batch)
+        start = time.perf_counter()
+        inflight.append((hashes, embedder.submit([batch[h] for h in hashes])))
+        stats["embed_s"] += time.perf_counter() - start
+        inflight_hashes.update(hashes)
+        batch, batch_chars = {}, 0
+
+    def harvest(wait_all: bool = False) -> None:
+        # Oldest first, so files become ready in the order they were read
+        while inflight and (wait_all or len(inflight) > embedder.max_inflight or inflight[0][1].done()):
+            hashes, future = inflight.popleft()
+            start = time.perf_counter()
+            vectors = future.result()
+            stats["embed_s"] += time.perf_counter() - start
+            fresh = {h: vectors[i].astype(np.float32).tobytes() for i, h in enumerate(hashes)}
+            store.put_many(embedder.model, fresh)
+            inflight_hashes.difference_update(hashes)
+            stats["chunks_embedded"] += len(fresh)
+            stats["batches"] += 1
+            batcher.observe(len(fresh))
+            for pending in waiting:
+                for h in pending.missing & fresh.keys():
+                    pending.blobs[h] = fresh[h]
+                pending.missing -= fresh.keys()
+
+    def ready() -> Iterator[PendingFile]:
+        while waiting and not waiting[0].missing:
+            yield waiting.popleft()
+
+    for pending in files:
+        waiting.append(pending)
+        texts = {chunk.hash: chunk.text for chunk in pending.chunks}
+        for h in pending.missing:
+            if h not in batch and h not in inflight_hashes:
+                batch[h] = texts[h]
+                batch_chars += len(texts[h])
+                if len(batch) >= batcher.size or batch_chars >= batcher.max_chars:
+                    flush()
+                    harvest()
+        harvest()
+        yield from ready()
+
+    if batch:
+        flush()
+    harvest(wait_all=True)
+    yield from ready()
+
+
+def delete_file_chunks(conn: sqlite3.Connection, full_path: str) -> None:
+    """Drop one file's rows, touching only semantic_chunks rows listed in chunk_hashes."""
+    conn.execute("DELETE FROM semantic_chunks WHERE id IN (SELECT chunk_id FROM chunk_hashes WHERE file_path = ?)",
+                 (full_path,))
+    conn.execute("DELETE FROM chunk_hashes WHERE file_path = ?", (full_path,))
+
+
+def write_file_chunks(conn: sqlite3.Connection, full_path: str, file_hash: str, model: str,
+                      chunks: List[Chunk], blobs: Dict[str, bytes]) -> List[int]:
+    """Replace the semantic_chunks rows this tool wrote for one file; return the new row ids.
+
+    The caller owns the transaction.
+    """
+    delete_file_chunks(conn, full_path)
+    ids = []
+    for chunk in chunks:
+        h = chunk.hash
+        metadata = json.dumps({"start_line": chunk.start_line, "end_line": chunk.end_line, "chunk_hash": h})
+        cursor = conn.execute(
+            "INSERT INTO semantic_chunks (file_path, content, embedding, metadata) VALUES (?, ?, ?, ?)",
+            (full_path, chunk.text, blobs[h], metadata),
+        )
+        conn.execute("INSERT INTO chunk_hashes (chunk_id, file_path, chunk_hash) VALUES (?, ?, ?)",
+                     (cursor.lastrowid, full_path, h))
+        ids.append(cursor.lastrowid)
+    conn.execute(
+        "INSERT OR REPLACE INTO embedding_files (file_path, content_hash, model, chunk_count, updated_at)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (full_path, file_hash, model, len(chunks), time.time()),
+    )
+    return ids
+
+
+def write_stream(conn: sqlite3.Connection, files: Iterable[PendingFile], model: str,
+                 stats: Dict[str, float], flush_rows: int = 2048,
+                 on_commit: Optional[Callable[[List[Tuple[PendingFile, List[int]]]], None]] = None) -> None:
+    """Writer: commit files in bulk transactions, advancing the shard checkpoint in each.
+
+    ``on_commit`` gets each committed (file, new chunk ids) pair, e.g. to
+    keep a vector index in step with the shard.
+    """
+    buffer: List[PendingFile] = []
+    rows = 0
+
+    def commit() -> None:
+        nonlocal buffer, rows
+        with conn:
+            written = [(pending, write_file_chunks(conn, pending.full_path, pending.file_hash, model,
+                                                   pending.chunks, pending.blobs)) for pending in buffer]
+            conn.execute(
+                "UPDATE embedding_checkpoint SET last_path = ?, files_done = files_done + ?,"
+                " chunks_done = chunks_done + ?, updated_at = ?",
+                (buffer[-1].full_path, len(buffer), rows, time.time()),
+            )
+        if on_commit is not None:
+            on_commit(written)
+        stats["files_changed"] += len(buffer)
+        stats["transactions"] += 1
+        buffer, rows = [], 0
+
+    for pending in files:
+        buffer.append(pending)
+        rows += len(pending.chunks)
+        if rows >= flush_rows:
+            commit()
+    if buffer:
+        commit()
+
+
+def begin_checkpoint(conn: sqlite3.Connection, model: str) -> Optional[str]:
+    """Mark the shard as running; return where an interrupted run stopped, if any.
+
+    Files an interrupted run committed already match embedding_files, so
+    the restarted run re-reads them but embeds nothing for them.
+    """
+    row = conn.execute("SELECT state, model, last_path FROM embedding_checkpoint").fetchone()
+    resumed_from = row[2] if row and row[0] == "running" and row[1] == model else None
+    with conn:
+        conn.execute("DELETE FROM embedding_checkpoint")
+        conn.execute("INSERT INTO embedding_checkpoint (model, state, last_path, files_done, chunks_done,"
+                     " started_at, updated_at) VALUES (?, 'running', '', 0, 0, ?, ?)",
+                     (model, time.time(), time.time()))
+    return resumed_from
+
+
+def sync_shard(db_path: str, shard_key: str, store: VectorStore, embedder: Embedder,
+               batcher: AdaptiveBatcher, stats: Dict[str, float], min_lines: int = DEFAULT_MIN_LINES,
+               max_lines: int = DEFAULT_MAX_LINES, flush_rows: int = 2048,
+               ann: Optional[IVFIndex] = None) -> None:
+    """Bring one shard's semantic_chunks up to date, embedding only unseen chunks.
+
+    With ``ann``, the IVF lists follow every file written or removed here.
+    """
+    if store.shard_state(shard_key, embedder.model) == shard_signature(db_path):
+        stats["shards_skipped"] += 1
+        return
+
+    ann_current = ann is not None and ann.meta["shards"].get(shard_key) == chunk_state(db_path)
+    conn = sqlite3.connect(db_path)
+    if not _has_table(conn, "semantic_chunks"):
+        # codexlens creates the table when it first embeds the shard; leave it alone until then
+        conn.close()
+        stats["shards_without_table"] += 1
+        return
+    conn.executescript(SIDE_TABLES)
+    try:
+        if begin_checkpoint(conn, embedder.model) is not None:
+            stats["shards_resumed"] += 1
+
+        def update_ann(written: List[Tuple[PendingFile, List[int]]]) -> None:
+            for pending, ids in written:
+                stats["ann_rows_deleted"] += ann.delete_file(shard_key, pending.full_path)
+                stats["ann_rows_inserted"] += ann.insert([
+                    (shard_key, chunk_id, pending.full_path, np.frombuffer(pending.blobs[chunk.hash], dtype=np.float32))
+                    for chunk, chunk_id in zip(pending.chunks, ids)])
+
+        seen: set = set()
+        changed = iter_changed_files(conn, store, embedder.model, seen, stats, min_lines, max_lines)
+        write_stream(conn, embed_stream(changed, store, embedder, batcher, stats), embedder.model, stats, flush_rows,
+                     update_ann if ann is not None else None)
+
+        # Our rows without a live file: removed files, and the old paths of renamed ones
+        stale = {path for (path,) in conn.execute("SELECT file_path FROM embedding_files")}
+        stale |= {path for (path,) in conn.execute("SELECT DISTINCT file_path FROM chunk_hashes")}
+        stale -= seen
+        with conn:
+            for path in stale:
+                delete_file_chunks(conn, path)
+                conn.execute("DELETE FROM embedding_files WHERE file_path = ?", (path,))
+            conn.execute("UPDATE embedding_checkpoint SET state = 'done', updated_at = ?", (time.time(),))
+        stats["files_deleted"] += len(stale)
+        if ann is not None:
+            for path in stale:
+                stats["ann_rows_deleted"] += ann.delete_file(shard_key, path)
+    finally:
+        conn.close()
+    store.set_shard_state(shard_key, embedder.model, shard_signature(db_path))
+    if ann_current:
+        # Only if no other writer changed semantic_chunks since the shard was indexed
+        ann.mark_current(shard_key, chunk_state(db_path))
+
+
+# === Commands ===
+
+def status(index_root: str, model: str, min_lines: int = DEFAULT_MIN_LINES,
+           max_lines: int = DEFAULT_MAX_LINES) -> Dict[str, object]:
+    """Embedding freshness per shard and in total, without writing to the shards."""
+    store = VectorStore(os.path.join(index_root, STORE_NAME), readonly=True)
+    shards: List[ShardPlan] = []
+    try:
+        for db_path in find_index_dbs(index_root):
+            conn = open_readonly(db_path)
+            try:
+                shards.append(plan_shard(conn, db_path, store, model, min_lines, max_lines))
+            finally:
+                conn.close()
+    finally:
+        store.close()
+
+    totals = {key: sum(getattr(plan, key) for plan in shards)
+              for key in ("files", "files_current", "files_foreign", "files_foreign_stale", "chunks_total",
+                          "chunks_stale", "chunks_pending", "chunks_reusable")}
+    totals["files_pending"] = sum(len(plan.changed) for plan in shards)
+    totals["files_deleted"] = sum(len(plan.deleted) for plan in shards)
+    files = totals["files"]
+    totals["coverage_percent"] = 100.0 * totals["files_current"] / files if files else 0.0
+    foreign_current = totals["files_foreign"] - totals["files_foreign_stale"]
+    totals["foreign_coverage_percent"] = 100.0 * foreign_current / files if files else 0.0
+    return {
+        "model": model,
+        "shards": len(shards),
+        **totals,
+        "per_shard": [dict(asdict(plan), changed=len(plan.changed), deleted=len(plan.deleted),
+                           db_path=os.path.relpath(plan.db_path, index_root)) for plan in shards],
+    }
+
+
+def sync(index_root: str, embedder: Embedder, min_lines: int = DEFAULT_MIN_LINES,
+         max_lines: int = DEFAULT_MAX_LINES, memory_budget_mb: int = 512, batch_size: int = 32,
+         flush_rows: int = 2048, force: bool = False) -> Dict[str, object]:
+    """Stream every shard through chunk -> embed -> bulk write; report throughput and peak RSS.
+
+    Refuses to start if any shard already holds vectors of another model,
+    since codexlens would then mix both in one table. ``force`` re-embeds
+    rows this tool wrote; rows codexlens wrote are never overwritten, so a
+    conflict with those always stops the sync.
+    """
+    ours, theirs = check_models(index_root, embedder.model, embedder.dim)
+    if theirs:
+        raise ValueError(f"codexlens embedded these shards with another model than {embedder.model}:"
+                         f" {', '.join(theirs)}. Pick the matching --embedder/--model")
+    if ours and not force:
+        raise ValueError(f"these shards were embedded with another model than {embedder.model}:"
+                         f" {', '.join(ours)}. Pick the matching --embedder/--model, or pass --force"
+                         " to re-embed them")
+    start = time.perf_counter()
+    stats: Dict[str, float] = {key: 0 for key in (
+        "files_current", "files_changed", "files_deleted", "files_foreign", "chunks_embedded",
+        "chunks_reused", "batches", "transactions", "shards_skipped", "shards_resumed",
+        "shards_without_table", "ann_rows_inserted", "ann_rows_deleted", "embed_s")}
+    # With worker processes the budget cannot be observed from here; keep
+    # batches at batch_size so there are enough of them to go round
+    batcher = AdaptiveBatcher(memory_budget_mb, size=batch_size,
+                              max_size=batch_size if embedder.max_inflight > 1 else 1024)
+    store = VectorStore(os.path.join(index_root, STORE_NAME))
+    ann = IVFIndex.open(index_root)
+    if ann is not None and ann.dim != embedder.dim:
+        # Another model's index: leave it to report itself stale until it is rebuilt
+        ann.close()
+        ann = None
+    try:
+        shards = find_index_dbs(index_root)
+        for db_path in shards:
+            sync_shard(db_path, os.path.relpath(db_path, index_root), store, embedder, batcher, stats,
+                       min_lines, max_lines, flush_rows, ann)
+    finally:
+        store.close()
+        if ann is not None:
+            ann.close()
+
+    elapsed = time.perf_counter() - start
+    peak = peak_rss()
+    return {
+        "generated": True,
+        "model": embedder.model,
+        "workers": getattr(embedder, "workers", 1),
+        "shards": len(shards),
+        "elapsed_s": elapsed,
+        **stats,
+        "chunks_per_sec": stats["chunks_embedded"] / elapsed if elapsed > 0 else 0.0,
+        "batch_size_final": batcher.size,
+        "batch_size_max": max(batcher.sizes, default=0),
+        "peak_rss_mb": peak / (1024 * 1024) if peak is not None else None,
+    }
+
+
+# === Worker scaling benchmark ===
+
+def shard_counts(index_root: str) -> List[Tuple[str, int, int]]:
+    """(shard, files, semantic chunks) per shard, as check_embeddings.py counts them."""
+    counts = []
+    for db_path in find_index_dbs(index_root):
+        conn = open_readonly(db_path)
+        try:
+            files = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            chunks = conn.execute("SELECT COUNT(*) FROM semantic_chunks").fetchone()[0] \
+                if _has_table(conn, "semantic_chunks") else 0
+        finally:
+            conn.close()
+        counts.append((os.path.relpath(db_path, index_root), files, chunks))
+    return counts
+
+
+def _synthetic_index(root: str, files: int, files_per_shard: int = 50, seed: int = 0) -> None:
+    """Shards of generated Python-like files, for benchmarking without a real index."""
+    import random
+    rng = random.Random(seed)
+    words = [f"{a}{b}" for a in ("get", "set", "load", "parse", "build", "index", "embed", "search")
+             for b in ("_path", "_chunk", "_query", "_score", "_vector", "_shard", "_cache", "_token")]
+    for shard in range((files + files_per_shard - 1) // files_per_shard):
+        conn = create_shard(root, f"pkg{shard:03d}")
+        conn.executescript(SEMANTIC_CHUNKS_TABLE)
+        conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, full_path TEXT, language TEXT,"
+                     " content TEXT, mtime REAL, line_count INTEGER)")
+        for i in range(min(files_per_shard, files - shard * files_per_shard)):
+            body = "".join(
+                f"def {rng.choice(words)}_{f}(value):\n"
+                + "".join(f"    {rng.choice(words)} = {rng.choice(words)}(value, {rng.randint(0, 99)})\n"
+                          for _ in range(rng.randint(4, 20)))
+                + "    return value\n\n"
+                for f in range(rng.randint(5, 25)))
+            conn.execute("INSERT INTO files (name, full_path, language, content, line_count) VALUES (?, ?, ?, ?, ?)",
+                         (f"m{i}.py", f"/synthetic/pkg{shard:03d}/m{i}.py", "python", body, body.count("\n")))
+        conn.commit()
+        conn.close()
+
+
+def _copy_without_embeddings(src: str, dst: str) -> None:
+    shutil.copytree(src, dst, ignore=shutil.ignore_patterns(STORE_NAME, "*-wal", "*-shm"))
+    for db_path in find_index_dbs(dst):
+        conn = sqlite3.connect(db_path)
+        conn.executescript("DELETE FROM semantic_chunks; DROP TABLE IF EXISTS chunk_hashes;"
+                           " DROP TABLE IF EXISTS embedding_files; DROP TABLE IF EXISTS embedding_checkpoint;")
+        conn.close()
+
+
+def bench_workers(args: argparse.Namespace) -> int:
+    """Embed the same shards from scratch with 1..N workers and compare chunks/sec."""
+    worker_counts = [int(n) for n in args.workers_list.split(",")]
+    base = tempfile.mkdtemp(prefix="embed-bench-")
+    try:
+        source = args.index_root
+        if args.synthetic:
+            source = os.path.join(base, "source")
+            _synthetic_index(source, args.synthetic)
+        print(f"cpus={os.cpu_count()} shards={len(find_index_dbs(source))} embedder={args.embedder}")
+        print(f"{'workers':>7} {'startup_s':>10} {'sync_s':>8} {'chunks':>8} {'chunks/s':>10} {'speedup':>8}")
+
+        baseline_rate = None
+        reference = None
+        for workers in worker_counts:
+            target = os.path.join(base, f"w{workers}")
+            _copy_without_embeddings(source, target)
+
+            start = time.perf_counter()
+            if workers > 1:
+                embedder = PooledEmbedder(args.embedder, args.model, workers)
+            else:
+                embedder = create_embedder(args.embedder, model=args.model)
+            startup = time.perf_counter() - start
+            try:
+                result = sync(target, embedder, args.min_lines, args.max_lines, batch_size=args.batch_size)
+            finally:
+                if isinstance(embedder, PooledEmbedder):
+                    embedder.close()
+
+            rate = result["chunks_per_sec"]
+            baseline_rate = baseline_rate or rate
+            print(f"{workers:>7} {startup:>10.2f} {result['elapsed_s']:>8.2f} {int(result['chunks_embedded']):>8}"
+                  f" {rate:>10.0f} {rate / baseline_rate if baseline_rate else 0:>7.2f}x")
+
+            counts = shard_counts(target)
+            if reference is None:
+                reference = counts
+            elif counts != reference:
+                print(f"  shard counts differ from the 1-worker run: {counts} != {reference}")
+                return 1
+            shutil.rmtree(target)
+        print(f"shard file/chunk counts identical across runs ({sum(c for _, _, c in reference)} chunks)")
+        return 0
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--embedder", choices=sorted(EMBEDDERS),
+                        help="Embedder (default: the one matching the model the shards were embedded with)")
+    common.add_argument("--model", help="Embedding model (default: the model the shards were embedded with,"
+                        " else hash-384, or BAAI/bge-small-en-v1.5 for sentence-transformers)")
+    common.add_argument("--min-lines", type=int, default=DEFAULT_MIN_LINES)
+    common.add_argument("--max-lines", type=int, default=DEFAULT_MAX_LINES)
+    common.add_argument("--json", action="store_true", help="Print the codexlens --json document")
+
+    parser = argparse.ArgumentParser(description="Incremental chunk-hash embedding for codexlens shards")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", parents=[common], help="Report current, pending and stale chunks").add_argument("index_root")
+    sync_parser = sub.add_parser("sync", parents=[common], help="Embed new or changed chunks, reuse the rest")
+    sync_parser.add_argument("index_root")
+    sync_parser.add_argument("--workers", type=int, default=1,
+                             help="Embedding worker processes, each loading the model once (default: 1)")
+    sync_parser.add_argument("--memory-budget-mb", type=int, default=512,
+                             help="Resident memory growth allowed for embedding batches (default: 512)")
+    sync_parser.add_argument("--batch-size", type=int, default=32, help="Initial embedding batch size")
+    sync_parser.add_argument("--flush-rows", type=int, default=2048,
+                             help="Chunk rows per write transaction and checkpoint (default: 2048)")
+    sync_parser.add_argument("--force", action="store_true",
+                             help="Re-embed rows this tool wrote with another model")
+    bench_parser = sub.add_parser("bench-workers", parents=[common],
+                                  help="Embed a copy of the shards with 1..N workers and compare chunks/sec")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--workers-list", default="1,2,4", help="Worker counts to run (default: 1,2,4)")
+    bench_parser.add_argument("--batch-size", type=int, default=32)
+    bench_parser.add_argument("--synthetic", type=int, metavar="FILES", help="Benchmark generated shards instead")
+
+    args = parser.parse_args(argv)
+    model = args.model
+    if not model and not args.embedder and args.command != "bench-workers":
+        model = recorded_model(args.index_root)
+        if not model and args.command == "sync":
+            parser.error("no embedding model is recorded in these shards; pass --embedder and --model")
+    args.embedder = args.embedder or (embedder_for_model(model) if model else "hash")
+    model = model or EMBEDDERS[args.embedder].default_model
+    if args.command == "bench-workers":
+        if not args.index_root and not args.synthetic:
+            parser.error("bench-workers needs INDEX_ROOT or --synthetic FILES")
+        args.model = model
+        return bench_workers(args)
+    try:
+        if args.command == "status":
+            # No embedder needed: only the model name decides which vectors are current
+            result = {"embeddings": status(args.index_root, model, args.min_lines, args.max_lines)}
+        else:
+            if args.workers > 1:
+                embedder = PooledEmbedder(args.embedder, model, args.workers)
+            else:
+                embedder = create_embedder(args.embedder, model=model)
+            try:
+                result = {"embeddings": sync(args.index_root, embedder, args.min_lines, args.max_lines,
+                                             args.memory_budget_mb, args.batch_size, args.flush_rows,
+                                             args.force)}
+            finally:
+                if isinstance(embedder, PooledEmbedder):
+                    embedder.close()
+    except Exception as e:
+        if args.json:
+            print(json.dumps({"success": False, "error": str(e)}))
+            return 1
+        raise
+
+    if args.json:
+        print(json.dumps({"success": True, "result": result}, indent=2))
+        return 0
+
+    embeddings = result["embeddings"]
+    if args.command == "status":
+        print(f"Model: {embeddings['model']}  Shards: {embeddings['shards']}")
+        print(f"Files: {embeddings['files_current']}/{embeddings['files']} current"
+              f" ({embeddings['coverage_percent']:.1f}%), {embeddings['files_pending']} pending,"
+              f" {embeddings['files_deleted']} deleted")
+        print(f"Embedded by codexlens: {embeddings['files_foreign']} files"
+              f" ({embeddings['foreign_coverage_percent']:.1f}% current),"
+              f" {embeddings['files_foreign_stale']} edited since")
+        print(f"Chunks: {embeddings['chunks_total']} stored, {embeddings['chunks_stale']} stale,"
+              f" {embeddings['chunks_pending']} to embed, {embeddings['chunks_reusable']} reusable")
+    else:
+        print(f"Synced {embeddings['shards']} shards in {embeddings['elapsed_s']:.2f}s"
+              f" ({embeddings['shards_skipped']} unchanged, {embeddings['shards_resumed']} resumed,"
+              f" {embeddings['shards_without_table']} not yet embedded by codexlens):"
+              f" {embeddings['files_changed']} files changed, {embeddings['files_deleted']} removed,"
+              f" {embeddings['files_foreign']} left to codexlens,"
+              f" {embeddings['chunks_embedded']} chunks embedded, {embeddings['chunks_reused']} reused")
+        peak = embeddings["peak_rss_mb"]
+        print(f"Throughput: {embeddings['chunks_per_sec']:.0f} chunks/s in {embeddings['batches']} batches"
+              f" (final batch size {embeddings['batch_size_final']}), {embeddings['transactions']} transactions,"
+              f" peak RSS {f'{peak:.0f}MB' if peak is not None else 'n/a'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
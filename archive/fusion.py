@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""Array-based reciprocal-rank fusion for the hybrid (FTS + vector) method.
+
+Hybrid search ranks each candidate by
+
+    score(d) = sum over sources s of  weight[s] / (k + rank_s(d))
+
+with 1-based ranks, the default ``k = 60``, and ties kept in the order a
+document was first seen (sources in order, then rank). ``rrf_reference``
+is that merge written with Python dictionaries, the way the codexlens
+hybrid path does it. ``rrf_fuse`` computes the same ranking on arrays:
+
+* every source's candidate keys are mapped to dense ids once (with
+  ``np.unique`` when the keys are integer row arrays, as the vector
+  indexes return, and one dict pass for path strings);
+* the per-candidate contributions are summed with one ``np.bincount``, in
+  the same order as the dictionary version, so the float sums are
+  bit-identical;
+* ``np.argpartition`` selects the top-k without sorting every candidate;
+  rows tied with the k-th score are kept so the tie-break stays exact.
+
+Weights and ``k`` are arguments of every call, so each query can use its
+own. Sources missing from ``weights`` get weight 0.
+
+Usage::
+
+    python fusion.py verify [--trials 500]
+    python fusion.py bench [--candidates 100,1000,10000,100000] [--top-k 10]
+"""
+import argparse
+import sys
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+DEFAULT_K = 60
+DEFAULT_WEIGHTS = {"exact": 0.3, "fuzzy": 0.1, "vector": 0.6}
+# Below this many candidates in total the dictionary merge is faster
+ARRAY_MIN_CANDIDATES = 256
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("fusion requires numpy: pip install numpy")
+
+
+def rrf_reference(results_map: Mapping[str, Sequence[str]], weights: Optional[Mapping[str, float]] = None,
+                  k: int = DEFAULT_K, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Dictionary RRF: (key, score) by descending score, ties in first-seen order."""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    scores: Dict[str, float] = {}
+    for source, keys in results_map.items():
+        weight = weights.get(source, 0.0)
+        for rank, key in enumerate(keys, start=1):
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return ranked if top_k is None else ranked[:top_k]
+
+
+def rrf_fuse(results_map: Mapping[str, Sequence[str]], weights: Optional[Mapping[str, float]] = None,
+             k: int = DEFAULT_K, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+    """Same ranking as rrf_reference, computed on arrays.
+
+    Keys are path strings or, per source, an integer NumPy array of rows.
+    Small inputs go straight to rrf_reference.
+    """
+    _require_numpy()
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    sources = [(weights.get(source, 0.0), keys) for source, keys in results_map.items() if len(keys)]
+    if not sources:
+        return []
+    if sum(len(source_keys) for _, source_keys in sources) < ARRAY_MIN_CANDIDATES:
+        return rrf_reference({source: keys.tolist() if isinstance(keys, np.ndarray) else keys
+                              for source, keys in results_map.items()}, weights, k, top_k)
+
+    contributions = np.concatenate([weight / (k + np.arange(1, len(source_keys) + 1, dtype=np.float64))
+                                    for weight, source_keys in sources])
+    if all(isinstance(source_keys, np.ndarray) and source_keys.dtype.kind in "iu" for _, source_keys in sources):
+        # Integer rows (chunk ids, index rows): no Python-level hashing at all
+        rows = np.concatenate([source_keys for _, source_keys in sources])
+        unique, first_seen, ids = np.unique(rows, return_index=True, return_inverse=True)
+    else:
+        keys = [key for _, source_keys in sources for key in source_keys]
+        unique = list(dict.fromkeys(keys))
+        dense = {key: i for i, key in enumerate(unique)}
+        ids = np.fromiter(map(dense.__getitem__, keys), dtype=np.intp, count=len(keys))
+        first_seen = np.arange(len(unique))
+    scores = np.bincount(ids.ravel(), weights=contributions, minlength=len(unique))
+
+    count = len(unique)
+    top_k = count if top_k is None else min(top_k, count)
+    if top_k <= 0:
+        return []
+    if top_k < count:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = np.flatnonzero(scores >= scores[candidates].min())
+    else:
+        candidates = np.arange(count)
+    picked = candidates[np.lexsort((first_seen[candidates], -scores[candidates]))[:top_k]]
+    labels = unique[picked].tolist() if isinstance(unique, np.ndarray) else [unique[i] for i in picked]
+    return list(zip(labels, scores[picked].tolist()))
+
+
+def _synthetic_results(rng: "np.random.Generator", candidates: int, sources: Sequence[str],
+                       overlap: float = 0.5, rows: bool = False) -> Dict[str, Sequence]:
+    """Ranked lists per source drawn from a shared pool, so sources overlap."""
+    pool = max(1, int(candidates * (1 + (1 - overlap) * (len(sources) - 1))))
+    picks = {source: rng.choice(pool, size=min(candidates, pool), replace=False) for source in sources}
+    if rows:
+        return picks
+    return {source: [f"src/file_{i}.py" for i in ranked] for source, ranked in picks.items()}
+
+
+def verify(args: argparse.Namespace) -> int:
+    _require_numpy()
+    rng = np.random.default_rng(0)
+    mismatches = 0
+    for trial in range(args.trials):
+        candidates = int(rng.integers(0, 2000))
+        results = _synthetic_results(rng, candidates, ("exact", "fuzzy", "vector"),
+                                     overlap=float(rng.random()), rows=trial % 2 == 1)
+        if trial % 3 == 0:
+            results["fuzzy"] = results["exact"][:]  # identical lists force exact score ties
+        weights = {source: float(w) for source, w in zip(results, rng.choice([0.0, 0.25, 0.5, 1.0], size=3))}
+        k = int(rng.choice([0, 1, 20, 60]))
+        top_k = None if trial % 4 == 0 else int(rng.integers(1, 50))
+        reference = rrf_reference({source: [int(r) if trial % 2 else r for r in ranked]
+                                   for source, ranked in results.items()}, weights, k, top_k)
+        if rrf_fuse(results, weights, k, top_k) != reference:
+            mismatches += 1
+    print(f"verify: {args.trials} trials, {'OK' if not mismatches else f'{mismatches} mismatches'}")
+    return 1 if mismatches else 0
+
+
+def bench(args: argparse.Namespace) -> int:
+    _require_numpy()
+    rng = np.random.default_rng(1)
+    print(f"{'keys':<6} {'candidates':>10} {'dict ms':>9} {'array ms':>9} {'speedup':>8}  same")
+    for kind in ("path", "row"):
+        for candidates in args.candidates:
+            results = _synthetic_results(rng, candidates, ("exact", "vector"), rows=kind == "row")
+            plain = {source: [int(r) for r in ranked] for source, ranked in results.items()} \
+                if kind == "row" else results
+            timings = {}
+            for name, fn, data in (("dict", rrf_reference, plain), ("array", rrf_fuse, results)):
+                runs = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    ranked = fn(data, DEFAULT_WEIGHTS, DEFAULT_K, args.top_k)
+                    runs.append((time.perf_counter() - start) * 1000)
+                timings[name] = (sorted(runs)[len(runs) // 2], ranked)
+            same = timings["dict"][1] == timings["array"][1]
+            print(f"{kind:<6} {candidates:>10} {timings['dict'][0]:>9.3f} {timings['array'][0]:>9.3f}"
+                  f" {timings['dict'][0] / timings['array'][0]:>7.1f}x  {'yes' if same else 'NO'}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Array-based reciprocal-rank fusion")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = sub.add_parser("verify", help="Check rrf_fuse against the dictionary merge on random lists")
+    verify_parser.add_argument("--trials", type=int, default=500)
+
+    bench_parser = sub.add_parser("bench", help="Time the dictionary and array merges")
+    bench_parser.add_argument("--candidates", type=lambda s: [int(x) for x in s.split(",")],
+                              default=[100, 1000, 10000, 100000],
+                              help="Comma-separated candidates per source (default: 100,1000,10000,100000)")
+    bench_parser.add_argument("--top-k", type=int, default=10)
+    bench_parser.add_argument("--repeat", type=int, default=9)
+
+    args = parser.parse_args(argv)
+    return verify(args) if args.command == "verify" else bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
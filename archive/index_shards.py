@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""Locate and open the per-directory ``_index.db`` shards of a codexlens index."""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_DB_NAME = "_index.db"
+
+
+def default_index_root(project_path: str) -> str:
+    """Index directory codexlens uses for project_path.
+
+    Mirrors the PathMapper in ccw/src/core/routes/graph-routes.ts:
+    ``$CODEXLENS_INDEX_DIR`` or ``~/.codexlens/indexes``, followed by the
+    project path with its drive colon / leading slash removed.
+    """
+    base = os.environ.get("CODEXLENS_INDEX_DIR") or os.path.join(Path.home(), ".codexlens", "indexes")
+    normalized = os.path.abspath(project_path).replace("\\", "/")
+    if sys.platform == "win32" and len(normalized) > 1 and normalized[1] == ":":
+        normalized = normalized[0] + normalized[2:]
+    return os.path.join(base, normalized.lstrip("/"))
+
+
+def find_index_dbs(root_dir: str) -> List[str]:
+    """Find all _index.db files under root_dir, in a stable order."""
+    index_files = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        if INDEX_DB_NAME in filenames:
+            index_files.append(os.path.join(dirpath, INDEX_DB_NAME))
+    return index_files
+
+
+def open_readonly(db_path: str) -> sqlite3.Connection:
+    """Open a shard read-only; immutable mode skips locking and change detection.
+
+    A non-empty -wal file means committed pages may not be checkpointed yet,
+    and immutable mode would not see them, so such shards use plain mode=ro.
+    """
+    wal_path = db_path + "-wal"
+    immutable = not (os.path.exists(wal_path) and os.path.getsize(wal_path) > 0)
+    uri = Path(db_path).resolve().as_uri() + ("?mode=ro&immutable=1" if immutable else "?mode=ro")
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def shard_signature(db_path: str) -> str:
+    """(mtime, size) of one shard and its -wal file; changes with every write to it."""
+    signature = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        signature.append(f"{st.st_mtime_ns}:{st.st_size}")
+    return "/".join(signature)
+
+
+def index_generation(root_dir: str, index_files: Optional[List[str]] = None) -> str:
+    """Digest of every shard's (path, mtime, size), including -wal files.
+
+    Any write to any shard, or a shard being added or removed, produces a
+    new generation, which is what result caches key on.
+    """
+    digest = hashlib.sha1()
+    for db_path in index_files if index_files is not None else find_index_dbs(root_dir):
+        for path in (db_path, db_path + "-wal"):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{os.path.relpath(path, root_dir)}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GenerationWatch:
+    """index_generation of root_dir, recomputed at most every ``ttl`` seconds.
+
+    Computing the generation stats every shard; per-request staleness
+    checks go through this so a burst of requests pays for it once.
+    """
+
+    def __init__(self, root_dir: str, ttl: float = 1.0):
+        self.root_dir = root_dir
+        self.ttl = ttl
+        self._generation: Optional[str] = None
+        self._checked_at = 0.0
+
+    def current(self) -> str:
+        now = time.monotonic()
+        if self._generation is None or now - self._checked_at >= self.ttl:
+            self._generation = index_generation(self.root_dir)
+            self._checked_at = now
+        return self._generation
+
+
+def build_path(path: str) -> str:
+    """Temporary path to build a sidecar file into before ``os.replace``-ing it over path.
+
+    Anything left there by an interrupted build is removed first.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    return tmp_path
+
+
+def write_meta(index_root: str, name: str, meta: Dict[str, Any]) -> None:
+    """Write a sidecar's JSON metadata atomically, so readers never see a partial file."""
+    path = os.path.join(index_root, name)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_meta(index_root: str, name: str, schema_version: int) -> Dict[str, Any]:
+    """A sidecar's JSON metadata; RuntimeError when it was written with another schema."""
+    with open(os.path.join(index_root, name), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("schema_version") != schema_version:
+        raise RuntimeError(f"{name} has schema {meta.get('schema_version')}; rebuild it")
+    return meta
@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+"""Quantized embedding storage (int8 / 1-bit) with full-precision rescoring.
+
+``semantic_chunks`` float32 vectors dominate ``_index.db`` size and the cost
+of the vector methods. ``build`` stores compact forms of every chunk vector
+next to the shards, row-aligned:
+
+* ``_quant_i8.bin``     N x dim int8, symmetric per-vector scale
+  ``_quant_scale.f32``  N float32 scales
+* ``_quant_rows.db``    row -> (shard, chunk id, file path)
+* 1-bit sign vectors    the binary_index.py files, built alongside
+
+No float copy is written: float32 rescoring reads the candidates' vectors
+back from the shards' ``semantic_chunks`` by chunk id. Those floats stay in
+the shards because codexlens owns them, so every mode adds to the on-disk
+index; what the compact forms shrink is the data a query scans.
+
+Storage modes, from largest to smallest resident set:
+
+* ``float32``      exact scan of the shard float vectors (reference)
+* ``int8``         int8 scan, top ``rescore`` candidates rescored in float32
+* ``int8-only``    int8 scan only: never reads the float vectors
+* ``binary``       Hamming scan, candidates rescored in float32
+* ``binary-int8``  Hamming scan, candidates rescored in int8
+
+``bench`` embeds the benchmark_search.py queries (or synthetic ones) with
+the model the shards were embedded with and reports, per mode, the
+measured size of the files it adds, the total on-disk index including the
+shards, the bytes resident per query, latency, and recall@k against the
+float32 scan.
+
+Usage::
+
+    python quant_index.py build INDEX_ROOT
+    python quant_index.py bench INDEX_ROOT [--embedder NAME --model MODEL] [--rescore 100]
+    python quant_index.py bench --synthetic 100000 --dim 384
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+import binary_index
+from ann_index import _topk, normalize, recall_at_k
+from bench_common import nearby_queries, synthetic_root, write_chunk_shard
+from binary_index import BinaryIndex, iter_shard_vectors, pack_signs
+from index_shards import (GenerationWatch, build_path, find_index_dbs, index_generation, open_readonly, read_meta,
+                          write_meta)
+
+INT8_NAME = "_quant_i8.bin"
+SCALE_NAME = "_quant_scale.f32"
+ROWS_NAME = "_quant_rows.db"
+META_NAME = "_quant.json"
+SCHEMA_VERSION = 1
+
+MODES = ("float32", "int8", "int8-only", "binary", "binary-int8")
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("quant_index requires numpy: pip install numpy")
+
+
+def quantize_int8(vectors: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Symmetric per-row int8: v ~= scale * q with q in [-127, 127]."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    q = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales
+
+
+def build(index_root: str) -> dict:
+    """Write the int8 and 1-bit forms of every shard's chunk vectors.
+
+    Shards are streamed one at a time. The 1-bit form is binary_index.py's
+    index; it walks the shards in the same order with the same dimension
+    rule, so its rows line up with these.
+    """
+    _require_numpy()
+    index_files = find_index_dbs(index_root)
+    generation = index_generation(index_root, index_files)
+
+    paths = [os.path.join(index_root, name) for name in (ROWS_NAME, INT8_NAME, SCALE_NAME)]
+    tmp_rows, tmp_i8, tmp_scales = [build_path(path) for path in paths]
+    rows_db = sqlite3.connect(tmp_rows)
+    rows_db.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, shard TEXT NOT NULL,"
+                    " chunk_id INTEGER NOT NULL, file_path TEXT NOT NULL)")
+
+    dim: Optional[int] = None
+    count = 0
+    with open(tmp_i8, "wb") as i8_out, open(tmp_scales, "wb") as scale_out:
+        for db_path in index_files:
+            shard = os.path.relpath(db_path, index_root)
+            vectors: List["np.ndarray"] = []
+            rows = []
+            for chunk_id, file_path, blob in iter_shard_vectors(db_path):
+                vector = np.frombuffer(blob, dtype=np.float32)
+                dim = dim or vector.size
+                if vector.size != dim:
+                    continue
+                vectors.append(vector)
+                rows.append((count + len(rows), shard, chunk_id, file_path))
+            if not rows:
+                continue
+            matrix = normalize(np.vstack(vectors))
+            q, scales = quantize_int8(matrix)
+            i8_out.write(q.tobytes())
+            scale_out.write(scales.tobytes())
+            rows_db.executemany("INSERT INTO rows VALUES (?, ?, ?, ?)", rows)
+            count += len(rows)
+    rows_db.commit()
+    rows_db.close()
+    for tmp_path, path in zip((tmp_rows, tmp_i8, tmp_scales), paths):
+        os.replace(tmp_path, path)
+
+    binary_meta = binary_index.build(index_root)
+    meta = {"schema_version": SCHEMA_VERSION, "dim": dim or 0, "count": count,
+            "generation": generation, "binary_count": binary_meta["count"], "built_at": time.time()}
+    write_meta(index_root, META_NAME, meta)
+    return meta
+
+
+class QuantIndex:
+    """Search the quantized forms of a built index in any storage mode."""
+
+    def __init__(self, index_root: str, block_rows: int = 8192):
+        _require_numpy()
+        self.index_root = index_root
+        self.meta = read_meta(index_root, META_NAME, SCHEMA_VERSION)
+        self._generation = GenerationWatch(index_root)
+        self.count = self.meta["count"]
+        self.dim = self.meta["dim"]
+        shape = (self.count, self.dim)
+
+        # The compact forms are what a query scans, so they are loaded into
+        # memory; float vectors are read from the shards on demand
+        self.i8 = np.fromfile(self._path(INT8_NAME), dtype=np.int8).reshape(shape)
+        self.scales = np.fromfile(self._path(SCALE_NAME), dtype=np.float32)
+        self.binary = BinaryIndex(index_root) if self.meta.get("binary_count") == self.count else None
+
+        self.block_rows = max(1, min(block_rows, max(self.count, 1)))
+        self._block = np.empty((self.block_rows, self.dim), dtype=np.float32)
+        self._rows = sqlite3.connect(self._path(ROWS_NAME), check_same_thread=False)
+        # row -> (shard number, chunk id), so rescoring does not query the rows table
+        listing = self._rows.execute("SELECT shard, chunk_id FROM rows ORDER BY row").fetchall()
+        self._shard_names = sorted({shard for shard, _ in listing})
+        number = {shard: i for i, shard in enumerate(self._shard_names)}
+        self._row_shard = np.array([number[shard] for shard, _ in listing], dtype=np.int32)
+        self._row_chunk = np.array([chunk_id for _, chunk_id in listing], dtype=np.int64)
+        self._shards: Dict[int, sqlite3.Connection] = {}
+        self._f32: Optional["np.ndarray"] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_root, name)
+
+    def is_stale(self) -> bool:
+        return self._generation.current() != self.meta.get("generation")
+
+    def _float_rows(self, rows: "np.ndarray") -> "np.ndarray":
+        """Normalized float32 vectors of the given rows, read from their shards' semantic_chunks."""
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        shards = self._row_shard[rows]
+        found = 0
+        for shard in np.unique(shards):
+            conn = self._shards.get(int(shard))
+            if conn is None:
+                conn = self._shards[int(shard)] = open_readonly(self._path(self._shard_names[shard]))
+            positions = np.flatnonzero(shards == shard)
+            position_of = {int(self._row_chunk[rows[p]]): int(p) for p in positions}
+            ids = list(position_of)
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                for chunk_id, blob in conn.execute(
+                        f"SELECT id, embedding FROM semantic_chunks WHERE id IN ({','.join('?' * len(part))})", part):
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    if vector.size == self.dim:
+                        out[position_of[chunk_id]] = vector
+                        found += 1
+        if found != len(rows):
+            raise RuntimeError("shard vectors changed since the quantized index was built; run 'build' again")
+        return normalize(out)
+
+    def _scan_float(self, query: "np.ndarray") -> "np.ndarray":
+        if self._f32 is None:
+            # The reference scan holds every float vector, as the plain vector method does
+            self._f32 = np.vstack([self._float_rows(np.arange(start, min(start + self.block_rows, self.count)))
+                                   for start in range(0, self.count, self.block_rows)])
+        return self._f32 @ query
+
+    def _scan_int8(self, query: "np.ndarray") -> "np.ndarray":
+        # Widen one block at a time into a reused buffer so BLAS does the dot
+        scores = np.empty(self.count, dtype=np.float32)
+        for start in range(0, self.count, self.block_rows):
+            end = min(start + self.block_rows, self.count)
+            block = self._block[:end - start]
+            block[...] = self.i8[start:end]
+            np.dot(block, query, out=scores[start:end])
+        return scores * self.scales
+
+    def _rescore(self, rows: "np.ndarray", query: "np.ndarray",
+                 precision: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        rows = np.sort(rows)  # ascending reads from the memory map
+        if precision == "float32":
+            scores = self._float_rows(rows) @ query
+        else:
+            scores = (self.i8[rows].astype(np.float32) @ query) * self.scales[rows]
+        return rows, scores
+
+    def search(self, query: "np.ndarray", k: int = 10, mode: str = "int8",
+               rescore: int = 100) -> List[Tuple[int, float]]:
+        """Top-k (row, cosine score) for a query embedding in the given storage mode."""
+        query = normalize(query).astype(np.float32)
+        k = min(k, self.count)
+        if k <= 0:
+            return []
+        if mode == "float32":
+            return _topk(np.arange(self.count), self._scan_float(query), k)
+        if mode == "int8-only":
+            return _topk(np.arange(self.count), self._scan_int8(query), k)
+
+        candidates = min(max(rescore, k), self.count)
+        if mode == "int8":
+            rows = np.array([row for row, _ in _topk(np.arange(self.count), self._scan_int8(query), candidates)])
+            return _topk(*self._rescore(rows, query, "float32"), k)
+        if mode in ("binary", "binary-int8"):
+            if self.binary is None:
+                raise RuntimeError("binary forms are missing or out of step; run 'build' again")
+            rows = np.array([row for row, _ in self.binary.search_bits(pack_signs(query), candidates)])
+            return _topk(*self._rescore(rows, query, "float32" if mode == "binary" else "int8"), k)
+        raise ValueError(f"Unknown mode '{mode}' (choose from {', '.join(MODES)})")
+
+    def shard_bytes(self) -> Tuple[int, int]:
+        """Measured (shard files, float vectors within them) in bytes."""
+        files = floats = 0
+        for db_path in find_index_dbs(self.index_root):
+            files += sum(os.path.getsize(p) for p in (db_path, db_path + "-wal") if os.path.exists(p))
+            conn = open_readonly(db_path)
+            try:
+                floats += conn.execute("SELECT COALESCE(SUM(length(embedding)), 0) FROM semantic_chunks").fetchone()[0]
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.close()
+        return files, floats
+
+    def footprint(self, mode: str, rescore: int = 100) -> Dict[str, float]:
+        """Measured bytes a mode adds on disk, and bytes resident per query (scanned + rescored rows)."""
+        def size(*names: str) -> int:
+            return sum(os.path.getsize(self._path(n)) for n in names if os.path.exists(self._path(n)))
+
+        own = size(ROWS_NAME, META_NAME)
+        i8 = size(INT8_NAME, SCALE_NAME)
+        bits = size(binary_index.VECTORS_NAME, binary_index.CHUNKS_NAME, binary_index.META_NAME)
+        f32 = self.count * self.dim * 4
+        float_rows = min(rescore, self.count) * self.dim * 4
+        int8_rows = min(rescore, self.count) * (self.dim + 4)
+        scanned_i8 = self.count * (self.dim + 4)
+        scanned_bits = self.count * ((self.dim + 7) // 8)
+        added, resident = {
+            "float32": (0, f32),
+            "int8": (own + i8, scanned_i8 + float_rows),
+            "int8-only": (own + i8, scanned_i8),
+            "binary": (own + bits, scanned_bits + float_rows),
+            "binary-int8": (own + bits + i8, scanned_bits + int8_rows),
+        }[mode]
+        return {"added_mb": added / 2 ** 20, "resident_mb": resident / 2 ** 20}
+
+    def resolve(self, hits: Sequence[Tuple[int, float]]) -> List[dict]:
+        results = []
+        for row, score in hits:
+            shard, chunk_id, file_path = self._rows.execute(
+                "SELECT shard, chunk_id, file_path FROM rows WHERE row = ?", (row,)).fetchone()
+            results.append({"row": row, "shard": shard, "chunk_id": chunk_id, "path": file_path, "score": score})
+        return results
+
+    def close(self) -> None:
+        self._rows.close()
+        for conn in self._shards.values():
+            conn.close()
+        if self.binary is not None:
+            self.binary.close()
+
+
+def _synthetic_shards(count: int, dim: int, shards: int = 8, clusters: int = 256) -> Tuple[str, "np.ndarray"]:
+    """Shards of clustered random embeddings, plus queries drawn near the data."""
+    root = synthetic_root("quant-index")
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    matrix = (centers[labels] + 0.6 * rng.normal(size=(count, dim))).astype(np.float32)
+    for shard, part in enumerate(np.array_split(np.arange(count), shards)):
+        write_chunk_shard(root, f"d{shard:02d}", ((int(i) + 1, f"chunk_{i}", "", matrix[i].tobytes()) for i in part))
+    return root, nearby_queries(matrix, rng)
+
+
+def _embed_queries(args: argparse.Namespace) -> "np.ndarray":
+    """Embed the benchmark queries with --embedder/--model, else the model recorded in the shards."""
+    from bench_queries import TEST_QUERIES
+    from embed_pipeline import EMBEDDERS, create_embedder, embedder_for_model, recorded_model
+    model = args.model or (None if args.embedder else recorded_model(args.index_root))
+    if not model and not args.embedder:
+        raise SystemExit("No embedding model is recorded in these shards; pass --embedder and --model")
+    name = args.embedder or embedder_for_model(model)
+    embedder = create_embedder(name, model=model or EMBEDDERS[name].default_model)
+    return embedder.embed([query for query, _ in TEST_QUERIES])
+
+
+def bench(args: argparse.Namespace) -> int:
+    _require_numpy()
+    if args.synthetic:
+        root, queries = _synthetic_shards(args.synthetic, args.dim)
+        build(root)
+    else:
+        root = args.index_root
+        queries = _embed_queries(args)
+
+    index = QuantIndex(root)
+    try:
+        if queries.shape[1] != index.dim:
+            print(f"query dim {queries.shape[1]} != index dim {index.dim}; pass the index's --embedder/--model")
+            return 1
+        exact = [index.search(q, args.k, "float32") for q in queries]
+        shard_bytes, float_bytes = index.shard_bytes()
+        print(f"rows={index.count} dim={index.dim} queries={len(queries)} k={args.k} rescore={args.rescore}")
+        print(f"shards: {shard_bytes / 2 ** 20:.1f}MB on disk, {float_bytes / 2 ** 20:.1f}MB of it float vectors"
+              " (kept in semantic_chunks for codexlens)")
+        print(f"{'mode':<13} {'added MB':>9} {'total MB':>9} {'resident MB':>12} {'p50 ms':>8} {f'recall@{args.k}':>10}")
+        for mode in MODES:
+            if mode.startswith("binary") and index.binary is None:
+                continue
+            index.search(queries[0], args.k, mode, args.rescore)  # fault in memory maps
+            timings, recalls = [], []
+            for q, truth in zip(queries, exact):
+                start = time.perf_counter()
+                got = index.search(q, args.k, mode, args.rescore)
+                timings.append((time.perf_counter() - start) * 1000)
+                recalls.append(recall_at_k(got, truth))
+            timings.sort()
+            size = index.footprint(mode, args.rescore)
+            total_mb = size["added_mb"] + shard_bytes / 2 ** 20
+            print(f"{mode:<13} {size['added_mb']:>9.1f} {total_mb:>9.1f} {size['resident_mb']:>12.1f}"
+                  f" {timings[len(timings) // 2]:>8.2f} {sum(recalls) / len(recalls):>10.3f}")
+        if not args.synthetic and index.is_stale():
+            print("warning: shards changed since the index was built; run 'build' again")
+    finally:
+        index.close()
+        if args.synthetic:
+            del index
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Quantized embedding storage with rescoring")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Write int8 and 1-bit forms of all chunk vectors")
+    build_parser.add_argument("index_root")
+
+    bench_parser = sub.add_parser("bench", help="Size, latency and recall per storage mode")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--k", type=int, default=10)
+    bench_parser.add_argument("--rescore", type=int, default=100, help="Candidates rescored after the coarse scan")
+    bench_parser.add_argument("--embedder", help="Query embedder (embed_pipeline.py; default: the one matching"
+                                                 " the model recorded in the shards)")
+    bench_parser.add_argument("--model", help="Embedding model (default: the model recorded in the shards)")
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N clustered random vectors instead")
+    bench_parser.add_argument("--dim", type=int, default=384, help="Dimensions for --synthetic")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        print(json.dumps(build(args.index_root), indent=2))
+        return 0
+    if not args.index_root and not args.synthetic:
+        parser.error("bench needs INDEX_ROOT or --synthetic N")
+    return bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Relevance metrics against labelled qrels, and the latency/quality Pareto frontier.
+
+Rankings are lists of result paths, best first. A file returned as several
+chunks counts once, at its best rank. Grades come from TREC qrels
+(bench_queries.load_qrels): 0 is not relevant, higher is more relevant.
+
+* ``ndcg_at_k``: graded DCG with gain 2^grade - 1 and a log2(rank + 1)
+  discount, over the ideal ordering of every labelled file
+* ``reciprocal_rank``: 1 / rank of the first relevant file (MRR when averaged)
+* ``recall_at_k``: share of the relevant files found in the top k
+"""
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def relative_key(path: str, root: Optional[str] = None) -> str:
+    """Qrels key for a result path: relative to root (default cwd), forward slashes."""
+    if os.path.isabs(path):
+        path = os.path.relpath(path, root or os.getcwd())
+    return path.replace("\\", "/")
+
+
+def dedupe(ranked: Sequence[str]) -> List[str]:
+    return list(dict.fromkeys(ranked))
+
+
+def ndcg_at_k(ranked: Sequence[str], grades: Dict[str, int], k: int = 10) -> float:
+    gains = sorted((g for g in grades.values() if g > 0), reverse=True)[:k]
+    ideal = sum((2 ** g - 1) / math.log2(i + 2) for i, g in enumerate(gains))
+    if ideal == 0:
+        return 0.0
+    dcg = sum((2 ** grades.get(path, 0) - 1) / math.log2(i + 2) for i, path in enumerate(dedupe(ranked)[:k]))
+    return dcg / ideal
+
+
+def reciprocal_rank(ranked: Sequence[str], grades: Dict[str, int]) -> float:
+    for i, path in enumerate(dedupe(ranked), 1):
+        if grades.get(path, 0) > 0:
+            return 1.0 / i
+    return 0.0
+
+
+def recall_at_k(ranked: Sequence[str], grades: Dict[str, int], k: int = 10) -> float:
+    relevant = {path for path, g in grades.items() if g > 0}
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(dedupe(ranked)[:k])) / len(relevant)
+
+
+def evaluate(ranked: Sequence[str], grades: Dict[str, int], k: int = 10) -> Dict[str, float]:
+    return {"ndcg@10": ndcg_at_k(ranked, grades, 10), "mrr": reciprocal_rank(ranked, grades),
+            f"recall@{k}": recall_at_k(ranked, grades, k)}
+
+
+def pareto_frontier(points: Dict[str, Tuple[float, float]]) -> List[str]:
+    """Keys of (latency, quality) points that no other point beats on both, fastest first.
+
+    A point is dominated when another is at least as fast and at least as
+    good, and strictly better on one of the two.
+    """
+    frontier = []
+    for key, (latency, quality) in points.items():
+        dominated = any(other_latency <= latency and other_quality >= quality
+                        and (other_latency < latency or other_quality > quality)
+                        for other, (other_latency, other_quality) in points.items() if other != key)
+        if not dominated:
+            frontier.append(key)
+    return sorted(frontier, key=lambda key: points[key][0])
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""Batched, cached cross-encoder reranking with pluggable backends.
+
+Backends:
+
+* ``api``: a SiliconFlow-compatible ``/v1/rerank`` endpoint (what cascade
+  uses for Qwen3-Reranker-8B). Configured with ``CODEXLENS_RERANKER_API_URL``,
+  ``CODEXLENS_RERANKER_API_KEY`` and ``CODEXLENS_RERANKER_MODEL``.
+* ``cross-encoder``: a small local CPU cross-encoder through
+  sentence-transformers (optional dependency).
+* ``mock``: deterministic character-bigram overlap; no model, no network.
+
+``Reranker`` wraps a backend. It dedupes documents, answers repeated
+(model, query, chunk-hash) pairs from an on-disk SQLite cache, splits the
+rest into ``batch_size`` calls, and runs those calls on a bounded thread
+pool. Its stats separate time spent inside backend calls from the total.
+"""
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".codexlens", "rerank_cache.db")
+
+
+class RerankBackend(abc.ABC):
+    """Scores (query, document) pairs; higher is more relevant."""
+
+    name = "base"
+    model = "base"
+
+    @abc.abstractmethod
+    def score_batch(self, query: str, documents: Sequence[str]) -> List[Optional[float]]:
+        """One score per document, in order; None where the backend returned no score."""
+
+
+class MockReranker(RerankBackend):
+    """Character-bigram overlap: deterministic, language-agnostic, offline."""
+
+    name = "mock"
+    model = "mock-bigram"
+
+    @staticmethod
+    def _bigrams(text: str) -> set:
+        text = text.lower()
+        return {text[i:i + 2] for i in range(len(text) - 1) if not text[i:i + 2].isspace()}
+
+    def score_batch(self, query: str, documents: Sequence[str]) -> List[float]:
+        query_grams = self._bigrams(query)
+        if not query_grams:
+            return [0.0] * len(documents)
+        return [len(query_grams & self._bigrams(doc)) / len(query_grams) for doc in documents]
+
+
+class CrossEncoderReranker(RerankBackend):
+    """Local sentence-transformers cross-encoder, loaded once per process."""
+
+    name = "cross-encoder"
+
+    def __init__(self, model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise RuntimeError(
+                "cross-encoder backend requires sentence-transformers: pip install sentence-transformers"
+            ) from e
+        self.model = model
+        self._encoder = CrossEncoder(model, device="cpu")
+        # CrossEncoder.predict is not documented as thread-safe
+        self._lock = threading.Lock()
+
+    def score_batch(self, query: str, documents: Sequence[str]) -> List[float]:
+        with self._lock:
+            scores = self._encoder.predict([(query, doc) for doc in documents])
+        return [float(score) for score in scores]
+
+
+class ApiReranker(RerankBackend):
+    """Remote ``/v1/rerank`` endpoint (SiliconFlow/Jina/Cohere request shape)."""
+
+    name = "api"
+
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None,
+                 model: Optional[str] = None, timeout: float = 60.0):
+        self.url = url or os.environ.get("CODEXLENS_RERANKER_API_URL", "https://api.siliconflow.cn/v1/rerank")
+        self.api_key = api_key or os.environ.get("CODEXLENS_RERANKER_API_KEY", "")
+        self.model = model or os.environ.get("CODEXLENS_RERANKER_MODEL", "Qwen/Qwen3-Reranker-8B")
+        self.timeout = timeout
+
+    def score_batch(self, query: str, documents: Sequence[str]) -> List[Optional[float]]:
+        body = json.dumps({
+            "model": self.model,
+            "query": query,
+            "documents": list(documents),
+            "return_documents": False,
+        }).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        })
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            payload = json.loads(response.read().decode("utf-8"))
+
+        # A partial reply (e.g. top_n applied server-side) leaves the rest unscored
+        scores: List[Optional[float]] = [None] * len(documents)
+        for item in payload.get("results", []):
+            scores[item["index"]] = float(item.get("relevance_score", item.get("score", 0.0)))
+        return scores
+
+
+BACKENDS = {
+    "mock": MockReranker,
+    "cross-encoder": CrossEncoderReranker,
+    "api": ApiReranker,
+}
+
+
+def create_backend(name: str, **kwargs) -> RerankBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown reranker backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+
+class ScoreCache:
+    """On-disk (model, query, chunk hash) -> score cache."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rerank_scores ("
+                " model TEXT NOT NULL, query TEXT NOT NULL, chunk_hash TEXT NOT NULL, score REAL NOT NULL,"
+                " PRIMARY KEY (model, query, chunk_hash))"
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, query: str, hashes: Sequence[str]) -> Dict[str, float]:
+        found: Dict[str, float] = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                part = list(hashes[i:i + 500])
+                rows = self._conn.execute(
+                    f"SELECT chunk_hash, score FROM rerank_scores WHERE model = ? AND query = ?"
+                    f" AND chunk_hash IN ({','.join('?' * len(part))})",
+                    [model, query] + part,
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, model: str, query: str, scores: Dict[str, float]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO rerank_scores (model, query, chunk_hash, score) VALUES (?, ?, ?, ?)",
+                [(model, query, chunk_hash, score) for chunk_hash, score in scores.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """Batch, parallelise and cache calls to a RerankBackend."""
+
+    def __init__(self, backend: RerankBackend, batch_size: Optional[int] = None,
+                 max_concurrency: int = 4, cache: Optional[ScoreCache] = None):
+        self.backend = backend
+        self.batch_size = batch_size or int(os.environ.get("CODEXLENS_RERANKER_BATCH_SIZE", "32"))
+        self.max_concurrency = max(1, max_concurrency)
+        self.cache = cache
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {"calls": 0, "pairs_scored": 0, "cache_hits": 0, "backend_ms": 0.0, "wall_ms": 0.0}
+
+    def _score(self, query: str, documents: List[str]) -> List[Optional[float]]:
+        start = time.perf_counter()
+        scores = self.backend.score_batch(query, documents)
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self.stats["calls"] += 1
+            self.stats["pairs_scored"] += len(documents)
+            self.stats["backend_ms"] += elapsed
+        return scores
+
+    def rerank(self, query: str, documents: Sequence[str]) -> List[Optional[float]]:
+        """Return one score per document, in input order; None where the backend gave none.
+
+        Unscored documents are not cached, so a later call asks for them again.
+        """
+        start = time.perf_counter()
+        hashes = [chunk_hash(doc) for doc in documents]
+        unique: Dict[str, str] = {}
+        for h, doc in zip(hashes, documents):
+            unique.setdefault(h, doc)
+
+        scores: Dict[str, Optional[float]] = {}
+        if self.cache is not None:
+            scores.update(self.cache.get_many(self.backend.model, query, list(unique)))
+            self.stats["cache_hits"] += len(scores)
+
+        pending = [h for h in unique if h not in scores]
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        if batches:
+            workers = min(self.max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(lambda batch: self._score(query, [unique[h] for h in batch]), batches)
+                fresh: Dict[str, Optional[float]] = {}
+                for batch, batch_scores in zip(batches, results):
+                    fresh.update(zip(batch, batch_scores))
+            scores.update(fresh)
+            if self.cache is not None:
+                self.cache.put_many(self.backend.model, query,
+                                    {h: score for h, score in fresh.items() if score is not None})
+
+        self.stats["wall_ms"] += (time.perf_counter() - start) * 1000
+        return [scores[h] for h in hashes]
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+"""Bounded LRU caches for repeated searches.
+
+* ``EmbeddingCache`` keeps query embeddings keyed on (model, text).
+  ``cache_codexlens_embeddings()`` puts one in front of the codexlens
+  embedder methods, so hybrid, vector and cascade searches for the same
+  query embed it once per process (in-process benchmark and daemon).
+* ``ResultCache`` keeps search results keyed on
+  (query, method, cascade strategy, limit, index generation); a write to
+  any ``_index.db`` shard changes the generation. The generation is
+  re-read at most every ``generation_ttl`` seconds (1 s by default), so a
+  stale entry can be returned for up to that long after a write.
+
+Both expose hit/miss counters through ``stats()`` in the shape that is
+merged into the ``--json`` stats block.
+"""
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from index_shards import index_generation
+from search_trace import resolve_target
+
+# Embedder methods of codexlens.semantic wrapped by cache_codexlens_embeddings()
+EMBED_TARGETS = (
+    "codexlens.semantic.embedder:Embedder.embed_single",
+    "codexlens.semantic.embedder:Embedder.embed_to_numpy",
+)
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._data), "maxsize": self.maxsize}
+
+
+class EmbeddingCache:
+    """Wrap a batch embedding function so repeated query texts are embedded once."""
+
+    def __init__(self, embed_fn: Callable[[List[str]], Sequence[Any]], model: str = "default",
+                 maxsize: int = 4096, cache: Optional[LRUCache] = None):
+        self.embed_fn = embed_fn
+        self.model = model
+        self.cache = cache if cache is not None else LRUCache(maxsize)
+
+    def embed(self, texts: List[str]) -> List[Any]:
+        """Embed texts, calling embed_fn only for the ones not cached, in one batch."""
+        vectors: List[Any] = [None] * len(texts)
+        missing: List[int] = []
+        for i, text in enumerate(texts):
+            vector = self.cache.get((self.model, text))
+            if vector is None:
+                missing.append(i)
+            else:
+                vectors[i] = vector
+
+        if missing:
+            computed = self.embed_fn([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                self.cache.put((self.model, texts[i]), vector)
+                vectors[i] = vector
+        return vectors
+
+    def embed_one(self, text: str) -> Any:
+        return self.embed([text])[0]
+
+
+def embed_targets() -> List[str]:
+    """``module:Class.method`` embedder targets: ``CODEXLENS_EMBED_TARGETS``, else ``EMBED_TARGETS``."""
+    configured = [t.strip() for t in os.environ.get("CODEXLENS_EMBED_TARGETS", "").split(",") if t.strip()]
+    return configured or list(EMBED_TARGETS)
+
+
+def cache_codexlens_embeddings(cache: LRUCache, targets: Optional[Sequence[str]] = None) -> Dict[str, Optional[str]]:
+    """Serve repeated query texts from cache in front of embedder methods.
+
+    Only calls of the form ``method(text)`` or ``method([texts])`` are
+    cached; calls with further arguments go straight through. Keys include
+    the instance's model name, so two embedders never share vectors.
+    Returns target -> None when wrapped, or the reason it was skipped.
+    """
+    outcome: Dict[str, Optional[str]] = {}
+    for target in embed_targets() if targets is None else targets:
+        try:
+            owner, attr, original = resolve_target(target)
+        except (ImportError, AttributeError, ValueError) as e:
+            outcome[target] = f"{type(e).__name__}: {e}"
+            continue
+        if not getattr(original, "__embedding_cache__", False):
+            setattr(owner, attr, _cached_embed(original, cache, target))
+        outcome[target] = None
+    return outcome
+
+
+def _cached_embed(fn: Callable, cache: LRUCache, target: str) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(self, texts, *args, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        if args or kwargs or not isinstance(batch, (list, tuple)) or not all(isinstance(t, str) for t in batch):
+            return fn(self, texts, *args, **kwargs)
+        model = str(getattr(self, "model_name", None) or getattr(self, "model", None) or type(self).__name__)
+        if single:
+            key = (target, model, "single", texts)
+            vector = cache.get(key)
+            if vector is None:
+                vector = fn(self, texts)
+                cache.put(key, vector)
+            return vector.copy() if hasattr(vector, "copy") else vector
+        vectors = EmbeddingCache(lambda missing: list(fn(self, missing)), f"{target}\0{model}",
+                                 cache=cache).embed(list(batch))
+        if vectors and hasattr(vectors[0], "shape"):
+            import numpy as np  # the embedder returned an array, so numpy is present
+            return np.stack(vectors)
+        return vectors
+
+    wrapper.__embedding_cache__ = True
+    return wrapper
+
+
+class ResultCache:
+    """Search-result cache invalidated by the index generation.
+
+    Computing the generation stats every shard, so it is re-checked at most
+    every ``generation_ttl`` seconds; within that window a cache hit costs
+    only a dictionary lookup.
+    """
+
+    def __init__(self, index_root: str, maxsize: int = 256, generation_ttl: float = 1.0):
+        self.index_root = index_root
+        self.generation_ttl = generation_ttl
+        self.cache = LRUCache(maxsize)
+        self.invalidations = 0
+        self._generation: Optional[str] = None
+        self._checked_at = 0.0
+
+    def generation(self) -> str:
+        now = time.monotonic()
+        if self._generation is None or now - self._checked_at >= self.generation_ttl:
+            current = index_generation(self.index_root)
+            if self._generation is not None and current != self._generation:
+                # Old-generation keys can never hit again; free them now
+                self.cache.clear()
+                self.invalidations += 1
+            self._generation = current
+            self._checked_at = now
+        return self._generation
+
+    def key(self, query: str, method: str, strategy: Optional[str], limit: int) -> Tuple:
+        return (query, method, strategy, limit, self.generation())
+
+    def get(self, query: str, method: str, strategy: Optional[str], limit: int) -> Any:
+        return self.cache.get(self.key(query, method, strategy, limit))
+
+    def put(self, query: str, method: str, strategy: Optional[str], limit: int, value: Any) -> None:
+        self.cache.put(self.key(query, method, strategy, limit), value)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.cache.stats(), invalidations=self.invalidations, generation=self._generation)
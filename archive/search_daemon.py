@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+"""Resident codexlens search server on a Unix domain socket.
+
+Every ``codexlens search`` subprocess pays interpreter startup, embedder and
+reranker load, and shard open before it answers. The daemon imports
+codexlens once and runs the CLI entry point in-process, so its module-level
+caches stay warm across requests from any number of clients.
+
+Protocol: one JSON object per line in each direction.
+
+* ``{"op": "search", "query": q, "method": m, "strategy": s, "limit": n}``
+  returns the ``search --json`` document, with ``result.stats.daemon``
+  holding queue and run time and ``result.stats.stages`` the daemon-side
+  stages, including the codexlens stages wrapped at startup by
+  ``search_trace.instrument_codexlens()``.
+* ``{"op": "batch", "queries": [...], "method": ..., ...}`` returns
+  ``{"success": true, "results": [<one --json document per query>]}``;
+  with a CLI that has no ``search --batch``, every query goes through
+  ``search`` (and its caches) in turn.
+* ``{"op": "status"}`` and ``{"op": "shutdown"}``.
+
+The CLI searches the project of the daemon's working directory, which
+``status`` reports as ``project``. Search and batch requests carry the
+client's ``cwd``; one from another project gets ``{"success": false,
+"project_mismatch": true, ...}``, on which search_stream falls back to a
+subprocess in the client's directory.
+
+Connections are served concurrently. The codexlens CLI writes to the
+process-wide stdout, so searches run one at a time; identical requests that
+arrive while one is running share its result instead of queueing again.
+
+With ``--cjk-fts``, hybrid searches for short CJK keyword queries
+(``cjk_fts.is_keyword_query``) are answered from the cjk_fts.py n-gram
+index when it is built, current, and has a match; the word-based FTS side
+of hybrid cannot match unsegmented CJK text, so those queries would
+otherwise fall through to the vector path. Such documents are keyword
+matches only, with no vector half, and say so in ``result.stats.route``
+and ``result.stats.fts_cjk``. Longer CJK queries and questions still run
+the full hybrid search. With ``--symbol-index``, identifier and
+definition-pattern queries to hybrid and cascade are answered from the
+symbol_index.py name index first, skipping query embedding. Every document
+answered without the CLI names its path in ``result.stats.route``.
+
+search_stream.run_codexlens_search / run_codexlens_batch use the daemon
+whenever its socket answers and fall back to a subprocess otherwise.
+
+Usage::
+
+    python search_daemon.py serve [--socket PATH] [--warm hybrid,vector] [--cache] [--cjk-fts bigram] [--symbol-index]
+    python search_daemon.py status [--socket PATH]
+    python search_daemon.py stop [--socket PATH]
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from cjk_fts import MODES as FTS_MODES, CjkFts, is_keyword_query
+from index_shards import default_index_root
+from search_cache import LRUCache, ResultCache, cache_codexlens_embeddings
+from symbol_index import FAST_PATH_METHODS, SymbolIndex, answer as symbol_answer
+from search_trace import Tracer, instrument_codexlens, span, tracing
+from search_stream import (
+    DEFAULT_SOCKET,
+    build_batch_command,
+    build_search_command,
+    collect_batch,
+    daemon_request,
+    iter_records,
+    parse_output,
+    run_codexlens_inprocess,
+    supports_batch,
+    write_batch_file,
+)
+
+SearchKey = Tuple[str, str, Optional[str], int]
+
+
+class SearchDaemon:
+    """Serialize in-process searches, coalescing identical in-flight requests."""
+
+    def __init__(self, cache: Optional[ResultCache] = None, fts: Optional[CjkFts] = None,
+                 symbols: Optional[SymbolIndex] = None, embeddings: Optional[LRUCache] = None):
+        start = time.perf_counter()
+        import codexlens  # noqa: F401
+        self.import_ms = (time.perf_counter() - start) * 1000
+        # Before the first search, so result.stats.stages includes the codexlens stages
+        self.instrumented = instrument_codexlens()
+        self.embeddings = embeddings
+        if embeddings is not None:
+            cache_codexlens_embeddings(embeddings)
+        self.cache = cache
+        self.fts = fts
+        self.symbols = symbols
+        self._fts_lock = threading.Lock()
+        self._symbols_lock = threading.Lock()
+        self.started_at = time.time()
+        self.project = os.path.realpath(os.getcwd())
+        self._run_lock = threading.Lock()
+        self._inflight_lock = threading.Lock()
+        self._inflight: Dict[SearchKey, Future] = {}
+        self.stats = {"requests": 0, "searches": 0, "coalesced": 0, "batches": 0, "errors": 0,
+                      "fts_cjk": 0, "symbol": 0}
+
+    def search(self, query: str, method: str, strategy: Optional[str], limit: int) -> Dict[str, Any]:
+        received = time.perf_counter()
+        key: SearchKey = (query, method, strategy, limit)
+
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.stats["coalesced"] += 1
+
+        if owner:
+            try:
+                future.set_result(self._search(key))
+            except Exception as e:  # keep waiters from hanging on an unexpected failure
+                future.set_result(({"success": False, "error": str(e)}, 0.0))
+            finally:
+                with self._inflight_lock:
+                    del self._inflight[key]
+
+        data, run_ms = future.result()
+        data = json.loads(json.dumps(data))  # waiters must not share one mutable document
+        if data.get("success"):
+            data.setdefault("result", {}).setdefault("stats", {})["daemon"] = {
+                "pid": os.getpid(),
+                "coalesced": not owner,
+                "run_ms": run_ms,
+                "queue_ms": max(0.0, (time.perf_counter() - received) * 1000 - run_ms),
+            }
+        return data
+
+    def _search(self, key: SearchKey) -> Tuple[Dict[str, Any], float]:
+        query, method, strategy, limit = key
+        tracer = Tracer()
+        if self.cache is not None:
+            with tracing(tracer), span("cache.lookup"):
+                data = self.cache.get(query, method, strategy, limit)
+            if data is not None:
+                data = json.loads(json.dumps(data))
+                data["result"]["stats"].update(stages={}, spans=[])
+                return tracer.attach(data), 0.0
+
+        if self.symbols is not None and method in FAST_PATH_METHODS:
+            start = time.perf_counter()
+            data = self._search_symbols(query, limit, tracer)
+            if data is not None:
+                if self.cache is not None:
+                    self.cache.put(query, method, strategy, limit, data)
+                return data, (time.perf_counter() - start) * 1000
+
+        if self.fts is not None and method == "hybrid" and is_keyword_query(query):
+            start = time.perf_counter()
+            data = self._search_fts(query, limit, tracer)
+            if data is not None:
+                if self.cache is not None:
+                    self.cache.put(query, method, strategy, limit, data)
+                return data, (time.perf_counter() - start) * 1000
+
+        with tracing(tracer):
+            with span("daemon.queue"):
+                self._run_lock.acquire()
+            try:
+                with span("cli.run"):
+                    output, elapsed, error = run_codexlens_inprocess(
+                        build_search_command(query, method, strategy, limit))
+                self.stats["searches"] += 1
+            finally:
+                self._run_lock.release()
+            with span("cli.parse"):
+                data = {"success": False, "error": error} if error else parse_output(output)
+        tracer.attach(data)
+        if self.cache is not None and data.get("success"):
+            self.cache.put(query, method, strategy, limit, data)
+        return data, elapsed
+
+    def _search_symbols(self, query: str, limit: int, tracer: Tracer) -> Optional[Dict[str, Any]]:
+        """Definition sites for identifier queries, or None for natural language / no exact hits."""
+        with tracing(tracer), span("symbol.lookup"):
+            with self._symbols_lock:
+                data = None if self.symbols.is_stale() else symbol_answer(self.symbols, query, limit)
+        if data is None:
+            return None
+        self.stats["symbol"] += 1
+        return tracer.attach(data)
+
+    def _search_fts(self, query: str, limit: int, tracer: Tracer) -> Optional[Dict[str, Any]]:
+        """Hybrid-shaped document from the CJK n-gram index, or None to run the CLI instead."""
+        start = time.perf_counter()
+        with tracing(tracer), span("fts.cjk"):
+            # One connection shared by the handler threads
+            with self._fts_lock:
+                hits = None if self.fts.is_stale() else self.fts.search(query, limit)
+        if not hits:
+            return None
+        self.stats["fts_cjk"] += 1
+        results = [{"path": hit["path"], "score": hit["score"], "chunk_id": hit["chunk_id"]} for hit in hits]
+        return tracer.attach({"success": True, "result": {"results": results, "stats": {
+            "time_ms": (time.perf_counter() - start) * 1000,
+            "route": "fts_cjk",
+            "fts_cjk": {"mode": self.fts.mode, "rows": self.fts.meta["count"], "semantic": False},
+        }}})
+
+    def batch(self, queries: List[str], method: str, strategy: Optional[str], limit: int) -> Dict[str, Any]:
+        if not supports_batch():
+            self.stats["batches"] += 1
+            return {"success": True, "results": [self.search(query, method, strategy, limit) for query in queries]}
+        fd, queries_path = tempfile.mkstemp(prefix="codexlens-batch-", suffix=".jsonl")
+        os.close(fd)
+        try:
+            write_batch_file(queries, queries_path)
+            with self._run_lock:
+                output, _, error = run_codexlens_inprocess(build_batch_command(queries_path, method, strategy, limit))
+                self.stats["batches"] += 1
+        finally:
+            os.remove(queries_path)
+        if error:
+            return {"success": False, "error": error}
+        return {"success": True, "results": collect_batch(iter_records(output.splitlines(keepends=True)), len(queries))}
+
+    def status(self) -> Dict[str, Any]:
+        status = {"success": True, "pid": os.getpid(), "project": self.project,
+                  "uptime_s": time.time() - self.started_at,
+                  "import_ms": self.import_ms, "inflight": len(self._inflight),
+                  "instrumented": sorted(target for target, reason in self.instrumented.items() if reason is None)}
+        status.update(self.stats)
+        if self.cache is not None:
+            status["cache"] = self.cache.stats()
+        if self.embeddings is not None:
+            status["embedding_cache"] = self.embeddings.stats()
+        return status
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.stats["requests"] += 1
+        op = request.get("op", "search")
+        cwd = request.get("cwd")
+        if op in ("search", "batch") and cwd and os.path.realpath(cwd) != self.project:
+            return {"success": False, "project_mismatch": True, "project": self.project,
+                    "error": f"This daemon serves {self.project}, not {cwd}"}
+        if op == "search":
+            return self.search(request["query"], request.get("method", "hybrid"),
+                               request.get("strategy"), int(request.get("limit", 10)))
+        if op == "batch":
+            return self.batch(list(request["queries"]), request.get("method", "hybrid"),
+                              request.get("strategy"), int(request.get("limit", 10)))
+        if op == "status":
+            return self.status()
+        return {"success": False, "error": f"Unknown op '{op}'"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon: SearchDaemon = self.server.search_daemon
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if request.get("op") == "shutdown":
+                    self._reply({"success": True})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                response = daemon.handle(request)
+            except Exception as e:
+                daemon.stats["errors"] += 1
+                response = {"success": False, "error": f"{type(e).__name__}: {e}"}
+            self._reply(response)
+
+    def _reply(self, response: Dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str, daemon: SearchDaemon) -> None:
+    if os.path.exists(socket_path):
+        if daemon_request({"op": "status"}, socket_path, timeout=2.0) is not None:
+            raise RuntimeError(f"A search daemon is already listening on {socket_path}")
+        os.remove(socket_path)  # left behind by a daemon that did not exit cleanly
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+
+    server = _Server(socket_path, _Handler)
+    server.search_daemon = daemon
+    os.chmod(socket_path, 0o600)
+    print(f"codexlens search daemon pid {os.getpid()} listening on {socket_path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resident codexlens search daemon")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Socket path (default: {DEFAULT_SOCKET})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = sub.add_parser("serve", help="Load codexlens once and answer searches on the socket")
+    serve_parser.add_argument("--warm", default="hybrid",
+                              help="Comma-separated methods to run once at startup (default: hybrid)")
+    serve_parser.add_argument("--warm-query", default="search", help="Query used for warm-up searches")
+    serve_parser.add_argument("--cache", action="store_true",
+                              help="Serve repeated searches from an LRU cache keyed on the index generation,"
+                                   " and repeated query texts from a query-embedding cache")
+    serve_parser.add_argument("--cache-size", type=int, default=256)
+    serve_parser.add_argument("--index-root", metavar="DIR",
+                              help="Index directory whose shards invalidate the cache and hold the --cjk-fts index"
+                                   " (default: codexlens path for cwd)")
+    serve_parser.add_argument("--cjk-fts", nargs="?", const="bigram", choices=FTS_MODES, metavar="MODE",
+                              help="Answer CJK hybrid searches from the cjk_fts.py index built in this mode"
+                                   " (default mode: bigram)")
+    serve_parser.add_argument("--symbol-index", action="store_true",
+                              help="Answer identifier queries to hybrid/cascade from the symbol_index.py index")
+
+    sub.add_parser("status", help="Print the running daemon's counters")
+    sub.add_parser("stop", help="Ask the running daemon to exit")
+
+    args = parser.parse_args(argv)
+    if not hasattr(socket, "AF_UNIX"):
+        print("Unix domain sockets are not available on this platform", file=sys.stderr)
+        return 1
+
+    if args.command in ("status", "stop"):
+        op = "shutdown" if args.command == "stop" else "status"
+        response = daemon_request({"op": op}, args.socket, timeout=5.0)
+        if response is None:
+            print(f"No search daemon on {args.socket}", file=sys.stderr)
+            return 1
+        print(json.dumps(response, indent=2, ensure_ascii=False))
+        return 0 if response.get("success") else 1
+
+    index_root = args.index_root or default_index_root(os.getcwd())
+    cache = None
+    if args.cache:
+        cache = ResultCache(index_root, maxsize=args.cache_size)
+    fts = None
+    if args.cjk_fts:
+        fts = CjkFts.open(index_root, args.cjk_fts)
+        if fts is None:
+            print(f"No {args.cjk_fts} CJK index under {index_root}; run "
+                  f"'python cjk_fts.py build {index_root} --mode {args.cjk_fts}'", file=sys.stderr)
+            return 1
+    symbols = None
+    if args.symbol_index:
+        symbols = SymbolIndex.open(index_root)
+        if symbols is None:
+            print(f"No symbol index under {index_root}; run 'python symbol_index.py build {index_root}'",
+                  file=sys.stderr)
+            return 1
+    daemon = SearchDaemon(cache, fts, symbols, LRUCache(4096) if args.cache else None)
+    for method in filter(None, (m.strip() for m in args.warm.split(","))):
+        start = time.perf_counter()
+        daemon.search(args.warm_query, method, None, 10)
+        print(f"warmed {method} in {(time.perf_counter() - start) * 1000:.0f}ms", flush=True)
+    serve(args.socket, daemon)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+"""Shared reader for ``codexlens search`` output.
+
+Two output shapes are understood:
+
+* ``--ndjson``: one JSON object per line on stdout, logs on stderr only::
+
+      {"type": "result", "path": "...", "score": 0.91, ...}
+      {"type": "result", ...}
+      {"type": "stats", "success": true, "time_ms": 42.0, ...}
+
+  An ``{"type": "error", "error": "..."}`` line replaces the stats line on
+  failure.
+
+* ``--json``: a single (possibly pretty-printed) document
+  ``{"success": ..., "result": {"results": [...], "stats": {...}}}`` that may
+  be preceded by log lines and ANSI colour codes.
+
+Both are folded into the ``--json`` document shape so callers do not care
+which one the CLI produced. Parsing uses ``json.JSONDecoder.raw_decode``
+instead of scanning characters in Python.
+
+``--ndjson`` and ``search --batch`` are not options of every codexlens
+release. ``search_options()`` reads the installed CLI's ``search --help``
+once; ``run_codexlens_search`` asks for ``--json`` when ``--ndjson`` is
+missing, and ``run_codexlens_batch`` runs the queries one at a time when
+``--batch`` is.
+
+When a search daemon (archive/search_daemon.py) is listening on
+``$CODEXLENS_SEARCH_SOCKET`` (default ``~/.codexlens/search.sock``),
+``run_codexlens_search`` and ``run_codexlens_batch`` send the request there
+and only start a subprocess if the daemon is not reachable or serves
+another project than the caller's working directory.
+"""
+import contextlib
+import functools
+import io
+import json
+import os
+import re
+import runpy
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+ansi_escape = re.compile(r'\x1b\[[0-9;]*m')
+_decoder = json.JSONDecoder()
+
+DEFAULT_SOCKET = os.environ.get("CODEXLENS_SEARCH_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".codexlens", "search.sock")
+
+
+@functools.lru_cache(maxsize=None)
+def search_options(python: str = sys.executable) -> FrozenSet[str]:
+    """Long options listed by ``python -m codexlens search --help``; empty if the CLI cannot run."""
+    try:
+        proc = subprocess.run([python, "-m", "codexlens", "search", "--help"], capture_output=True,
+                              text=True, encoding="utf-8", errors="replace", timeout=120)
+    except (OSError, subprocess.SubprocessError):
+        return frozenset()
+    return frozenset(re.findall(r"--[a-z][a-z0-9-]*", ansi_escape.sub("", proc.stdout)))
+
+
+def supports_batch(python: str = sys.executable) -> bool:
+    """True if the CLI has ``search --batch`` and the NDJSON output it writes."""
+    return {"--batch", "--ndjson"} <= search_options(python)
+
+
+def build_search_command(query: str, method: str, strategy: Optional[str] = None,
+                         limit: int = 10, ndjson: bool = False) -> List[str]:
+    """Build ``codexlens search`` arguments (without the interpreter prefix)."""
+    args = ["search", query, "--method", method, "--limit", str(limit),
+            "--ndjson" if ndjson else "--json"]
+
+    if strategy and method == "cascade":
+        args.extend(["--cascade-strategy", strategy])
+
+    return args
+
+
+def build_batch_command(queries_path: str, method: str, strategy: Optional[str] = None,
+                        limit: int = 10) -> List[str]:
+    """Build ``codexlens search --batch`` arguments; batch output is always NDJSON."""
+    args = ["search", "--batch", queries_path, "--method", method, "--limit", str(limit), "--ndjson"]
+
+    if strategy and method == "cascade":
+        args.extend(["--cascade-strategy", strategy])
+
+    return args
+
+
+def write_batch_file(queries: List[str], path: str) -> None:
+    """Write queries as ``{"id": i, "query": q}`` lines for ``--batch``."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i, query in enumerate(queries):
+            f.write(json.dumps({"id": i, "query": query}, ensure_ascii=False) + "\n")
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield JSON objects from a line stream, skipping logs and ANSI codes.
+
+    Single-line objects (NDJSON) are yielded as soon as their line arrives.
+    A line that opens an object but does not parse on its own begins a
+    multi-line document, which is decoded when a column-0 ``}`` (or the end
+    of the stream) may have closed it. A line
+    starting with ``{`` in column 0 always starts a new document, so a log
+    line that merely contains ``{`` cannot swallow what follows it.
+    """
+    pending: List[str] = []
+
+    for raw_line in lines:
+        line = ansi_escape.sub('', raw_line)
+
+        if line.startswith('{'):
+            pending = [line]
+        elif pending:
+            pending.append(line)
+            # Only a column-0 '}' can close a pretty-printed document; skip
+            # the decode attempt on every other continuation line
+            if not line.startswith('}'):
+                continue
+        else:
+            start = line.find('{')
+            if start < 0:
+                continue
+            pending = [line[start:]]
+
+        try:
+            obj, _ = _decoder.raw_decode(''.join(pending))
+        except ValueError:
+            continue
+        pending = []
+        if isinstance(obj, dict):
+            yield obj
+
+    if pending:
+        # Document closed in an unexpected layout: one last attempt
+        try:
+            obj, _ = _decoder.raw_decode(''.join(pending))
+        except ValueError:
+            return
+        if isinstance(obj, dict):
+            yield obj
+
+
+def collect(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold NDJSON records (or a single ``--json`` document) into the ``--json`` shape."""
+    results: List[Dict[str, Any]] = []
+
+    for record in records:
+        record_type = record.get("type")
+        if record_type is None and "success" in record:
+            # Legacy --json document: already in final shape
+            return record
+        if record_type == "result":
+            results.append({k: v for k, v in record.items() if k != "type"})
+        elif record_type == "stats":
+            stats = {k: v for k, v in record.items() if k not in ("type", "success")}
+            return {"success": record.get("success", True),
+                    "result": {"results": results, "stats": stats}}
+        elif record_type == "error":
+            return {"success": False, "error": record.get("error", "Unknown error")}
+
+    if results:
+        # Stream ended without a stats line (e.g. the process was killed)
+        return {"success": False, "error": "Stream ended before stats record",
+                "result": {"results": results, "stats": {}}}
+    return {"success": False, "error": "No JSON found"}
+
+
+def collect_batch(records: Iterable[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    """Split a batch stream into one ``--json``-shaped document per query.
+
+    Every record carries the ``query_id`` of its input line; a query's
+    stats (or error) line closes its document. Queries that never got a
+    closing line are reported as failures.
+    """
+    grouped: Dict[int, List[Dict[str, Any]]] = {i: [] for i in range(count)}
+    docs: Dict[int, Dict[str, Any]] = {}
+
+    for record in records:
+        query_id = record.get("query_id")
+        if query_id not in grouped:
+            continue
+        grouped[query_id].append({k: v for k, v in record.items() if k != "query_id"})
+        if record.get("type") in ("stats", "error"):
+            docs[query_id] = collect(grouped[query_id])
+
+    return [docs.get(i) or collect(grouped[i]) for i in range(count)]
+
+
+def parse_output(stdout: str, stderr: str = "") -> Dict[str, Any]:
+    """Parse already-captured output; stderr is only consulted if stdout has no JSON."""
+    data = collect(iter_records(stdout.splitlines(keepends=True)))
+    if data.get("error") == "No JSON found" and stderr:
+        data = collect(iter_records(stderr.splitlines(keepends=True)))
+    return data
+
+
+def run_codexlens_inprocess(args: List[str]) -> Tuple[str, float, Optional[str]]:
+    """Run the codexlens CLI entry point in this interpreter.
+
+    Returns (stdout, elapsed_ms, error). stdout and sys.argv are process
+    globals, so callers running this from several threads must serialize.
+    """
+    buffer = io.StringIO()
+    saved_argv = sys.argv
+    sys.argv = ["codexlens"] + args
+    error = None
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            runpy.run_module("codexlens", run_name="__main__", alter_sys=False)
+    except SystemExit:
+        pass
+    except Exception as e:
+        error = str(e)
+    finally:
+        sys.argv = saved_argv
+    elapsed = (time.perf_counter() - start) * 1000
+
+    return buffer.getvalue(), elapsed, error
+
+
+def daemon_request(request: Dict[str, Any], socket_path: str = DEFAULT_SOCKET,
+                   timeout: Optional[float] = 300.0) -> Optional[Dict[str, Any]]:
+    """Send one request to the search daemon; None if the daemon is unavailable.
+
+    The protocol is one JSON object per line in each direction. A missing
+    or stale socket, a transport error or timeout, a closed connection and
+    a truncated or malformed reply all count as unavailable, so callers
+    fall back to a subprocess instead of failing the search.
+    """
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("r", encoding="utf-8") as reader:
+                line = reader.readline()
+    except (OSError, ValueError):
+        # OSError covers a refused/stale socket and timeouts; ValueError a reply that is not UTF-8
+        return None
+    if not line.endswith("\n"):
+        # Closed before the reply was complete
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def project_request(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Tag a search request with the caller's project, which the daemon checks against its own."""
+    return dict(request, cwd=os.getcwd())
+
+
+def run_codexlens_search(query: str, method: str, strategy: Optional[str] = None,
+                         limit: int = 10, ndjson: bool = False,
+                         python: str = sys.executable, use_daemon: bool = True) -> Dict[str, Any]:
+    """Run a search through the daemon if one is up, else ``python -m codexlens search``.
+
+    The subprocess's stdout is read as it streams; stderr is drained on a
+    background thread so a chatty logger cannot block the child on a full
+    pipe.
+    """
+    if use_daemon:
+        data = daemon_request(project_request({"op": "search", "query": query, "method": method,
+                                               "strategy": strategy, "limit": limit}))
+        if data is not None and not data.get("project_mismatch"):
+            return data
+
+    ndjson = ndjson and "--ndjson" in search_options(python)
+    cmd = [python, "-m", "codexlens"] + build_search_command(query, method, strategy, limit, ndjson)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, encoding="utf-8", errors="replace")
+
+    stderr_lines: List[str] = []
+    drain = threading.Thread(target=lambda: stderr_lines.extend(proc.stderr), daemon=True)
+    drain.start()
+
+    data = collect(iter_records(proc.stdout))
+    proc.stdout.close()
+    proc.wait()
+    drain.join()
+
+    if data.get("error") == "No JSON found":
+        data = collect(iter_records(stderr_lines))
+    return data
+
+
+def run_codexlens_batch(queries: List[str], method: str, strategy: Optional[str] = None,
+                        limit: int = 10, python: str = sys.executable,
+                        use_daemon: bool = True) -> List[Dict[str, Any]]:
+    """Run one ``codexlens search --batch`` over all queries; results follow input order.
+
+    Without ``--batch`` in the CLI, each query is a separate search.
+    """
+    if use_daemon:
+        data = daemon_request(project_request({"op": "batch", "queries": queries, "method": method,
+                                               "strategy": strategy, "limit": limit}))
+        if data is not None and not data.get("project_mismatch"):
+            return data.get("results") or [{"success": False, "error": data.get("error")} for _ in queries]
+    if not supports_batch(python):
+        return [run_codexlens_search(query, method, strategy, limit, python=python, use_daemon=False)
+                for query in queries]
+
+    fd, queries_path = tempfile.mkstemp(prefix="codexlens-batch-", suffix=".jsonl")
+    os.close(fd)
+    try:
+        write_batch_file(queries, queries_path)
+        cmd = [python, "-m", "codexlens"] + build_batch_command(queries_path, method, strategy, limit)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, encoding="utf-8", errors="replace")
+        docs = collect_batch(iter_records(proc.stdout), len(queries))
+        proc.stdout.close()
+        proc.wait()
+        return docs
+    finally:
+        os.remove(queries_path)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""Per-stage latency spans for searches, with Chrome trace export.
+
+A ``Tracer`` records named, nested spans (start, duration, depth, thread,
+attributes). ``tracing(tracer)`` makes it current for the block, and
+``span(name)`` anywhere below records into it, or does nothing when no
+tracer is active, so instrumented code costs nothing outside a trace.
+
+``Tracer.attach(data)`` merges the spans into a ``search --json`` document:
+
+* ``result.stats.stages``  total ms per span name (a span nested in a
+  span of the same name, e.g. a recursive call, is counted once)
+* ``result.stats.spans``   the spans themselves
+
+Stages and spans the codexlens CLI itself reports in its stats are kept;
+client-side spans are added next to them (its spans are shifted to start
+at the ``cli.run`` span that produced them).
+
+The codexlens stage functions can be wrapped in spans without editing
+codexlens: ``instrument(["codexlens.module:Class.method", ...])`` or the
+comma-separated ``CODEXLENS_TRACE_TARGETS`` environment variable (targets
+that do not import are skipped and reported). ``instrument_codexlens()``
+adds ``DEFAULT_TARGETS``, a fixed list of the codexlens search stages
+(embedding, FTS, vector, fusion, rerank), so their time shows up next to
+the client-side ``cli.*``, ``cache.*`` and ``daemon.*`` spans. A target
+names the attribute its caller looks up: a function imported with ``from
+... import`` is wrapped in the importing module. ``codexlens_stages()``
+picks those stages out of a stage table.
+
+Usage (one in-process search, written as a Chrome / Perfetto trace)::
+
+    python search_trace.py "query" [--method hybrid] [--strategy binary]
+        [--instrument codexlens.module:Class.method] [--out trace.json]
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# The codexlens search stages wrapped by instrument_codexlens(); targets missing
+# from the installed codexlens version are skipped and reported
+DEFAULT_TARGETS = (
+    "codexlens.search.chain_search:ChainSearchEngine.search",
+    "codexlens.search.chain_search:ChainSearchEngine.cascade_search",
+    "codexlens.search.hybrid_search:HybridSearchEngine.search",
+    "codexlens.search.hybrid_search:HybridSearchEngine._search_exact",
+    "codexlens.search.hybrid_search:HybridSearchEngine._search_fuzzy",
+    "codexlens.search.hybrid_search:HybridSearchEngine._search_vector",
+    "codexlens.search.hybrid_search:reciprocal_rank_fusion",
+    "codexlens.search.hybrid_search:cross_encoder_rerank",
+    "codexlens.semantic.embedder:Embedder.embed_single",
+    "codexlens.semantic.embedder:Embedder.embed_to_numpy",
+    "codexlens.semantic.vector_store:VectorStore.search_similar",
+)
+# Spans recorded by the archive scripts themselves rather than by codexlens
+CLIENT_SPANS = ("import", "search")
+CLIENT_SPAN_PREFIXES = ("cli.", "cache.", "daemon.", "symbol.", "fts.cjk", "shard_topk.")
+
+_current: "contextvars.ContextVar[Optional[Tracer]]" = contextvars.ContextVar("search_trace", default=None)
+
+
+class Tracer:
+    """Collect nested spans relative to the tracer's creation time."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._depth = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        depth = getattr(self._depth, "value", 0)
+        record = {"name": name, "start_ms": (time.perf_counter() - self.origin) * 1000, "dur_ms": 0.0,
+                  "depth": depth, "thread": threading.get_ident()}
+        if attrs:
+            record["args"] = attrs
+        self._depth.value = depth + 1
+        try:
+            yield record
+        finally:
+            self._depth.value = depth
+            record["dur_ms"] = (time.perf_counter() - self.origin) * 1000 - record["start_ms"]
+            self.spans.append(record)
+
+    def stages(self) -> Dict[str, float]:
+        return stage_totals(self.spans)
+
+    def attach(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge this tracer's spans into a search document's stats."""
+        if not data.get("success"):
+            return data
+        stats = data.setdefault("result", {}).setdefault("stats", {})
+        reported = stats.get("spans") or []
+        run = next((s for s in self.spans if s["name"] == "cli.run"), None)
+        if reported and run is not None:
+            # Spans from the CLI are relative to its own clock; place them under cli.run
+            offset = run["start_ms"] - min(s.get("start_ms", 0.0) for s in reported)
+            reported = [dict(s, start_ms=s.get("start_ms", 0.0) + offset, thread=s.get("thread", run["thread"]),
+                             depth=s.get("depth", 0) + run["depth"] + 1) for s in reported]
+        stages = dict(stats.get("stages") or {})
+        for name, ms in self.stages().items():
+            stages[name] = stages.get(name, 0.0) + ms
+        stats["stages"] = stages
+        stats["spans"] = sorted(reported + self.spans, key=lambda s: s["start_ms"])
+        return data
+
+
+@contextlib.contextmanager
+def tracing(tracer: Optional[Tracer] = None) -> Iterator[Tracer]:
+    """Make a tracer current for the block (a new one unless given)."""
+    tracer = tracer or Tracer()
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+
+
+def span(name: str, **attrs: Any):
+    """Record a span into the current tracer, if any."""
+    tracer = _current.get()
+    return tracer.span(name, **attrs) if tracer is not None else contextlib.nullcontext()
+
+
+def stage_totals(spans: Sequence[Dict[str, Any]]) -> Dict[str, float]:
+    """Total ms per span name, counting only the outermost of nested same-name spans."""
+    totals: Dict[str, float] = {}
+    open_until: Dict[Tuple[Any, str], float] = {}  # (thread, name) -> end of the outermost span
+    for record in sorted(spans, key=lambda s: (s.get("start_ms", 0.0), -s["dur_ms"])):
+        start = record.get("start_ms", 0.0)
+        key = (record.get("thread"), record["name"])
+        if start < open_until.get(key, -1.0):
+            continue  # inside a span of the same name on the same thread
+        open_until[key] = start + record["dur_ms"]
+        totals[record["name"]] = totals.get(record["name"], 0.0) + record["dur_ms"]
+    return totals
+
+
+def instrument(targets: Sequence[str]) -> Dict[str, Optional[str]]:
+    """Wrap ``module:attr.path`` callables in spans named after the attribute path.
+
+    Returns target -> None when wrapped, or the reason it was skipped.
+    """
+    outcome: Dict[str, Optional[str]] = {}
+    for target in targets:
+        try:
+            owner, attr, original = resolve_target(target)
+        except (ImportError, AttributeError, ValueError) as e:
+            outcome[target] = f"{type(e).__name__}: {e}"
+            continue
+        if not getattr(original, "__search_trace__", False):
+            setattr(owner, attr, _traced(original, target.partition(":")[2]))
+        outcome[target] = None
+    return outcome
+
+
+def resolve_target(target: str) -> Tuple[Any, str, Callable]:
+    """(owner, attribute name, current value) for a ``module:attr.path`` target."""
+    module_name, _, attr_path = target.partition(":")
+    owner: Any = importlib.import_module(module_name)
+    parts = attr_path.split(".")
+    for part in parts[:-1]:
+        owner = getattr(owner, part)
+    return owner, parts[-1], getattr(owner, parts[-1])
+
+
+def _traced(fn: Callable, name: str) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name):
+            return fn(*args, **kwargs)
+    wrapper.__search_trace__ = True
+    return wrapper
+
+
+def env_targets() -> List[str]:
+    return [t.strip() for t in os.environ.get("CODEXLENS_TRACE_TARGETS", "").split(",") if t.strip()]
+
+
+def instrument_codexlens(extra: Sequence[str] = ()) -> Dict[str, Optional[str]]:
+    """Wrap the default codexlens stages, ``CODEXLENS_TRACE_TARGETS`` and extra targets in spans."""
+    return instrument(list(DEFAULT_TARGETS) + env_targets() + list(extra))
+
+
+def codexlens_stages(stages: Dict[str, float]) -> List[str]:
+    """Names in a stage table that come from codexlens rather than from the client."""
+    return [name for name in stages
+            if name not in CLIENT_SPANS and not name.startswith(CLIENT_SPAN_PREFIXES)]
+
+
+def to_chrome_trace(spans: Sequence[Dict[str, Any]], process_name: str = "codexlens search") -> Dict[str, Any]:
+    """Chrome trace-event JSON (complete "X" events, microseconds)."""
+    pid = os.getpid()
+    events: List[Dict[str, Any]] = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                                     "args": {"name": process_name}}]
+    for record in spans:
+        event = {"name": record["name"], "cat": "search", "ph": "X", "pid": pid,
+                 "tid": record.get("thread", 0), "ts": record["start_ms"] * 1000, "dur": record["dur_ms"] * 1000}
+        if record.get("args"):
+            event["args"] = record["args"]
+        events.append(event)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path: str, spans: Sequence[Dict[str, Any]], process_name: str = "codexlens search") -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(spans, process_name), f, ensure_ascii=False)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from search_stream import build_search_command, parse_output, run_codexlens_inprocess
+
+    parser = argparse.ArgumentParser(description="Trace one in-process codexlens search")
+    parser.add_argument("query")
+    parser.add_argument("--method", default="hybrid")
+    parser.add_argument("--strategy", help="Cascade strategy (with --method cascade)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--instrument", action="append", default=[], metavar="MODULE:ATTR",
+                        help="Wrap a codexlens function in a span (repeatable; adds to CODEXLENS_TRACE_TARGETS)")
+    parser.add_argument("--no-warm", action="store_true",
+                        help="Trace the first (cold) search instead of a second, warm one")
+    parser.add_argument("--out", default="search_trace.json", help="Chrome trace output path")
+    args = parser.parse_args(argv)
+
+    tracer = Tracer()
+    with tracing(tracer):
+        with span("import"):
+            import codexlens  # noqa: F401
+        for target, reason in instrument_codexlens(args.instrument).items():
+            if reason:
+                print(f"skipped {target}: {reason}", file=sys.stderr)
+    command = build_search_command(args.query, args.method, args.strategy, args.limit)
+    if not args.no_warm:
+        run_codexlens_inprocess(command)
+        tracer = Tracer()
+
+    with tracing(tracer):
+        with span("search", query=args.query, method=args.method, strategy=args.strategy):
+            with span("cli.run"):
+                output, _, error = run_codexlens_inprocess(command)
+            with span("cli.parse"):
+                data = {"success": False, "error": error} if error else parse_output(output)
+    if not data.get("success"):
+        print(f"search failed: {data.get('error')}", file=sys.stderr)
+        return 1
+    stats = tracer.attach(data)["result"]["stats"]
+    write_chrome_trace(args.out, stats["spans"])
+    for name, ms in sorted(stats["stages"].items(), key=lambda item: -item[1]):
+        print(f"{name:<40} {ms:>10.2f} ms")
+    print(f"trace written to {args.out} (open in chrome://tracing or ui.perfetto.dev)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,505 @@
+#!/usr/bin/env python
+"""Exact cross-shard vector top-k with per-shard score bounds and early termination.
+
+A vector search fans out over every per-directory ``_index.db``, scores all
+of its ``semantic_chunks`` and only then keeps the top ``--limit``, so its
+latency grows with the shard count even for ``--limit 10``. ``build``
+records score upper bounds per shard so that a query can skip shards that
+cannot reach the current top-k:
+
+* each shard's normalized embeddings are split into a few k-means blocks;
+  a block stores its centroid direction and the largest angle between the
+  centroid and any of its vectors (a cone around the centroid)
+* for a query ``q`` at angle ``phi`` from a block's centroid, no vector in
+  a cone of half-angle ``theta`` scores above ``cos(max(0, phi - theta))``;
+  a shard's bound is the largest bound of its blocks
+
+``TopKSearch.search`` visits shards in descending bound order (most likely
+relevant first), scores the blocks whose bound can still beat the k-th
+best score so far, keeps the k best in a min-heap, and stops as soon as the
+next shard's bound falls below the k-th score. Blocks and shards are only
+skipped on a strict ``<``, and scores are computed per row in float64, so
+the hits, their scores and their tie order are identical to the
+exhaustive scan (``verify`` checks this). Shards written since ``build``
+(or added) have no valid bound and are always scanned in full.
+
+Only the vector half is bounded: there are no per-term BM25 upper bounds,
+so keyword and hybrid searches still fan out over every shard's FTS index.
+
+Files next to the shards:
+
+* ``_shard_bounds.db``    per shard signature; per block centroid, angle, chunk ids
+* ``_shard_bounds.json``  dim, block and row counts, index generation
+
+Usage::
+
+    python shard_topk.py build INDEX_ROOT [--blocks 8]
+    python shard_topk.py search INDEX_ROOT "query" [--limit 10] [--embedder hash] [--json]
+    python shard_topk.py verify INDEX_ROOT [--k 10] [--embedder hash]
+    python shard_topk.py bench --synthetic 100000 --shards 16,64,256
+"""
+import argparse
+import heapq
+import json
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is required by codexlens vector search
+    np = None
+
+from ann_index import kmeans, normalize
+from bench_common import nearby_queries, percentile, synthetic_root, write_chunk_shard
+from index_shards import (GenerationWatch, build_path, find_index_dbs, index_generation, open_readonly, read_meta,
+                          shard_signature, write_meta)
+
+DB_NAME = "_shard_bounds.db"
+META_NAME = "_shard_bounds.json"
+SCHEMA_VERSION = 1
+
+# Added to every bound so float rounding in the bound can never skip a block that
+# holds a qualifying row; a looser bound only costs an extra block read
+BOUND_SLACK = 1e-6
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("shard_topk requires numpy: pip install numpy")
+
+
+def _read_rows(conn: sqlite3.Connection, chunk_ids: Optional[Sequence[int]] = None) -> List[tuple]:
+    """(chunk id, file path, embedding blob) of a whole shard, or of the given chunks, by id."""
+    if chunk_ids is None:
+        return conn.execute("SELECT id, file_path, embedding FROM semantic_chunks ORDER BY id").fetchall()
+    return conn.execute("SELECT id, file_path, embedding FROM semantic_chunks"
+                        " WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+                        (json.dumps([int(i) for i in chunk_ids]),)).fetchall()
+
+
+def _unit64(vectors: "np.ndarray") -> "np.ndarray":
+    vectors = np.asarray(vectors, dtype=np.float64)
+    return vectors / np.maximum(np.sqrt((vectors * vectors).sum(axis=-1, keepdims=True)), 1e-12)
+
+
+def _score(rows: Sequence[tuple], query: "np.ndarray", dim: int) -> Tuple[List[tuple], "np.ndarray"]:
+    """Cosine scores of rows against a unit float64 query.
+
+    Every score depends only on its own row (row-wise float64 normalize and
+    sum, no BLAS blocking), so a row scores the same whether it is read with
+    its whole shard or with one block of it.
+    """
+    rows = [row for row in rows if row[2] is not None and len(row[2]) == dim * 4]
+    if not rows:
+        return rows, np.zeros(0)
+    matrix = _unit64(np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), dim))
+    return rows, (matrix * query).sum(axis=1)
+
+
+def _candidates(scores: "np.ndarray", k: int, floor: float = -math.inf) -> "np.ndarray":
+    """Positions that can still enter a top-k: at least the k-th best score here and the floor, ties kept."""
+    if len(scores) > k:
+        floor = max(floor, float(np.partition(scores, len(scores) - k)[len(scores) - k]))
+    return np.flatnonzero(scores >= floor)
+
+
+def _shard_blocks(blobs: bytes, count: int, dim: int, blocks: int) -> List[Tuple["np.ndarray", "np.ndarray", float]]:
+    """(float32 centroid, member row positions, cone half-angle) per block of a shard's vectors.
+
+    Angles are measured in float64 against the float32 centroid as stored,
+    the same way ``block_bounds`` sees it, so the bound holds exactly
+    (up to ``BOUND_SLACK``) for the float64 scores of ``_score``.
+    """
+    raw = np.frombuffer(blobs, dtype=np.float32).reshape(count, dim)
+    nblocks = max(1, min(blocks, count // 32 or 1))
+    matrix = normalize(raw)
+    centroids = kmeans(matrix, nblocks, iterations=10) if nblocks > 1 else normalize(matrix.mean(axis=0))[None, :]
+    assignment = np.argmax(matrix @ centroids.T, axis=1)
+    exact = _unit64(raw)
+    result = []
+    for b, centroid in enumerate(centroids.astype(np.float32)):
+        members = np.flatnonzero(assignment == b)
+        if members.size == 0:
+            continue
+        cosines = np.clip(exact[members] @ _unit64(centroid), -1.0, 1.0)
+        result.append((centroid, members, float(np.arccos(cosines.min()))))
+    return result
+
+
+def build(index_root: str, blocks: int = 8) -> dict:
+    """Compute score bounds for every shard under index_root."""
+    _require_numpy()
+    index_files = find_index_dbs(index_root)
+    generation = index_generation(index_root, index_files)
+    path = os.path.join(index_root, DB_NAME)
+    tmp_path = build_path(path)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE shards (shard TEXT PRIMARY KEY, signature TEXT NOT NULL, rows INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE blocks (shard TEXT NOT NULL, centroid BLOB NOT NULL, angle REAL NOT NULL,"
+                 " chunk_ids BLOB NOT NULL)")
+    dim: Optional[int] = None
+    count = 0
+    block_count = 0
+    for db_path in index_files:
+        shard = os.path.relpath(db_path, index_root)
+        signature = shard_signature(db_path)
+        source = open_readonly(db_path)
+        try:
+            rows = _read_rows(source)
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            source.close()
+        rows = [row for row in rows if row[2]]
+        dim = dim or (len(rows[0][2]) // 4 if rows else None)
+        rows = [row for row in rows if len(row[2]) == (dim or 0) * 4]
+        conn.execute("INSERT INTO shards VALUES (?, ?, ?)", (shard, signature, len(rows)))
+        if not rows:
+            continue
+        chunk_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        for centroid, members, angle in _shard_blocks(b"".join(row[2] for row in rows), len(rows), dim, blocks):
+            conn.execute("INSERT INTO blocks VALUES (?, ?, ?, ?)",
+                         (shard, centroid.tobytes(), angle, chunk_ids[members].tobytes()))
+            block_count += 1
+        count += len(rows)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "dim": dim,
+        "shards": len(index_files),
+        "blocks": block_count,
+        "count": count,
+        "build_s": time.perf_counter() - start,
+        "generation": generation,
+        "built_at": time.time(),
+    }
+    write_meta(index_root, META_NAME, meta)
+    return meta
+
+
+class TopKSearch:
+    """Exact cosine top-k over all shards, skipping shards and blocks by their bounds."""
+
+    def __init__(self, index_root: str):
+        _require_numpy()
+        self.index_root = index_root
+        self.meta = read_meta(index_root, META_NAME, SCHEMA_VERSION)
+        self._generation = GenerationWatch(index_root)
+        self.dim = self.meta["dim"] or 0
+        conn = open_readonly(os.path.join(index_root, DB_NAME))
+        try:
+            self._signatures = dict(conn.execute("SELECT shard, signature FROM shards").fetchall())
+            blocks = conn.execute("SELECT shard, centroid, angle, chunk_ids FROM blocks ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+        self._block_shard = [shard for shard, _, _, _ in blocks]
+        self._block_ids = [np.frombuffer(ids, dtype=np.int64) for _, _, _, ids in blocks]
+        self._angles = np.array([angle for _, _, angle, _ in blocks], dtype=np.float64)
+        self._centroids = _unit64(np.frombuffer(b"".join(c for _, c, _, _ in blocks), dtype=np.float32)
+                                  .reshape(len(blocks), self.dim))
+        self._connections: Dict[str, Tuple[str, sqlite3.Connection]] = {}
+
+    @classmethod
+    def open(cls, index_root: str) -> Optional["TopKSearch"]:
+        """The bounds under index_root, or None when they have not been built."""
+        if not os.path.exists(os.path.join(index_root, META_NAME)):
+            return None
+        return cls(index_root)
+
+    def is_stale(self) -> bool:
+        return self._generation.current() != self.meta.get("generation")
+
+    def _conn(self, shard: str) -> sqlite3.Connection:
+        """Cached read-only connection, reopened once the shard has been written (immutable mode caches pages)."""
+        path = os.path.join(self.index_root, shard)
+        signature = shard_signature(path)
+        cached = self._connections.get(shard)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+        conn = open_readonly(path)
+        self._connections[shard] = (signature, conn)
+        return conn
+
+    def _shards(self) -> List[str]:
+        return [os.path.relpath(p, self.index_root) for p in find_index_dbs(self.index_root)]
+
+    def block_bounds(self, query: "np.ndarray") -> "np.ndarray":
+        """Upper bound of the cosine score of any vector in each block."""
+        if not len(self._angles):
+            return np.zeros(0)
+        phi = np.arccos(np.clip(self._centroids @ query, -1.0, 1.0))
+        return np.cos(np.maximum(phi - self._angles, 0.0)) + BOUND_SLACK
+
+    def check_query(self, query: "np.ndarray") -> None:
+        """Raise ValueError when the query was embedded with another dimension than the index."""
+        if query.shape[-1] != self.dim:
+            raise ValueError(f"query dim {query.shape[-1]} != index dim {self.dim}; "
+                             "pass the index's --embedder/--model")
+
+    def search(self, query: "np.ndarray", k: int = 10) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Top-k hits (descending score, ties by shard order then chunk id) and visit stats."""
+        self.check_query(query)
+        query = _unit64(query)
+        shards = self._shards()
+        rank = {shard: i for i, shard in enumerate(shards)}
+
+        block_bounds = self.block_bounds(query)
+        by_shard: Dict[str, List[int]] = {}
+        for b, shard in enumerate(self._block_shard):
+            by_shard.setdefault(shard, []).append(b)
+        plan = []
+        unbounded = 0
+        for shard in shards:
+            if self._signatures.get(shard) != shard_signature(os.path.join(self.index_root, shard)):
+                # Written or added since build: no valid bound, scan it all (first)
+                plan.append((math.inf, shard, None))
+                unbounded += 1
+            elif by_shard.get(shard):
+                blocks = sorted(by_shard[shard], key=lambda b: -block_bounds[b])
+                plan.append((float(block_bounds[blocks[0]]), shard, blocks))
+        plan.sort(key=lambda p: (-p[0], rank[p[1]]))
+
+        # Min-heap of the k best as (score, -shard rank, -chunk id): heap[0] is the worst kept hit
+        heap: List[Tuple[float, int, int, str, str]] = []
+        stats = {"shards_total": len(shards), "shards_visited": 0, "shards_skipped": 0,
+                 "shards_unbounded": unbounded, "blocks_visited": 0, "blocks_skipped": 0, "rows_scored": 0}
+        for position, (bound, shard, blocks) in enumerate(plan):
+            if len(heap) == k and bound < heap[0][0]:
+                # Shards are in descending bound order: none of the rest can qualify
+                stats["shards_skipped"] += len(plan) - position
+                stats["blocks_skipped"] += sum(len(b) for _, _, b in plan[position:] if b)
+                break
+            if blocks is None:
+                chunk_ids = None
+            else:
+                keep = [b for b in blocks if len(heap) < k or block_bounds[b] >= heap[0][0]]
+                stats["blocks_visited"] += len(keep)
+                stats["blocks_skipped"] += len(blocks) - len(keep)
+                chunk_ids = None if len(keep) == len(blocks) else np.concatenate([self._block_ids[b] for b in keep])
+            try:
+                rows, scores = _score(_read_rows(self._conn(shard), chunk_ids), query, self.dim)
+            except sqlite3.OperationalError:
+                rows, scores = [], np.zeros(0)
+            stats["shards_visited"] += 1
+            stats["rows_scored"] += len(rows)
+            for i in _candidates(scores, k, heap[0][0] if len(heap) == k else -math.inf):
+                chunk_id, file_path, _ = rows[i]
+                item = (float(scores[i]), -rank[shard], -chunk_id, shard, file_path)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[:3] > heap[0][:3]:
+                    heapq.heapreplace(heap, item)
+        stats["shards_skipped"] += len(shards) - len(plan)  # shards without embeddings
+        return _hits(heap), stats
+
+    def exhaustive(self, query: "np.ndarray", k: int = 10) -> List[Dict[str, Any]]:
+        """Score every row of every shard, then keep the top k (the reference fan-out)."""
+        self.check_query(query)
+        query = _unit64(query)
+        candidates = []
+        for rank, shard in enumerate(self._shards()):
+            try:
+                rows, scores = _score(_read_rows(self._conn(shard)), query, self.dim)
+            except sqlite3.OperationalError:
+                continue
+            candidates.extend((float(scores[i]), -rank, -rows[i][0], shard, rows[i][1]) for i in _candidates(scores, k))
+        return _hits(heapq.nlargest(k, candidates, key=lambda item: item[:3]))
+
+    def close(self) -> None:
+        for _, conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+
+def _hits(items: Sequence[tuple]) -> List[Dict[str, Any]]:
+    ordered = sorted(items, key=lambda item: item[:3], reverse=True)
+    return [{"path": path, "score": score, "shard": shard, "chunk_id": -neg_id}
+            for score, _, neg_id, shard, path in ordered]
+
+
+def search_document(index: TopKSearch, query: "np.ndarray", limit: int = 10) -> Dict[str, Any]:
+    """A ``search --json``-shaped document with the shard visit stats."""
+    start = time.perf_counter()
+    hits, stats = index.search(query, limit)
+    stats = {"time_ms": (time.perf_counter() - start) * 1000, "route": "shard_topk", **stats}
+    return {"success": True, "result": {"results": hits, "stats": stats}}
+
+
+def _embedder(args: argparse.Namespace):
+    from embed_pipeline import EMBEDDERS, create_embedder
+    return create_embedder(args.embedder, model=args.model or EMBEDDERS[args.embedder].default_model)
+
+
+def _synthetic_shards(count: int, shards: int, dim: int, topics_per_shard: int = 3,
+                      seed: int = 0) -> Tuple[str, "np.ndarray"]:
+    """Per-directory shards drawing from a few topics each, plus queries near the data.
+
+    Real shards are directories, and a directory's chunks share vocabulary,
+    so each synthetic shard mixes a handful of the topic centres.
+    """
+    root = synthetic_root("shard-topk")
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(16, shards), dim)).astype(np.float32)
+    matrix = np.empty((count, dim), dtype=np.float32)
+    for shard, part in enumerate(np.array_split(np.arange(count), shards)):
+        topics = rng.choice(len(centers), size=topics_per_shard, replace=False)
+        matrix[part] = centers[rng.choice(topics, size=len(part))] + 0.6 * rng.normal(size=(len(part), dim))
+        write_chunk_shard(root, f"d{shard:03d}",
+                          ((int(i) + 1, f"d{shard:03d}/chunk_{i}", "", matrix[i].tobytes()) for i in part))
+    return root, nearby_queries(matrix, rng)
+
+
+def _same(a: List[Dict[str, Any]], b: List[Dict[str, Any]]) -> bool:
+    return [(h["shard"], h["chunk_id"], h["score"]) for h in a] == [(h["shard"], h["chunk_id"], h["score"]) for h in b]
+
+
+def verify(index: TopKSearch, queries: "np.ndarray", k: int) -> int:
+    """Count queries whose bounded search differs from the exhaustive scan."""
+    mismatches = 0
+    for i, query in enumerate(queries):
+        hits, _ = index.search(query, k)
+        if not _same(hits, index.exhaustive(query, k)):
+            mismatches += 1
+            print(f"query {i}: bounded search differs from the exhaustive scan", file=sys.stderr)
+    return mismatches
+
+
+def bench(args: argparse.Namespace) -> int:
+    _require_numpy()
+    shard_counts = args.shards if args.synthetic else [None]
+    print(f"{'shards':>6} {'rows':>8} {'exhaustive p50':>15} {'bounded p50':>12} {'speedup':>8} "
+          f"{'visited':>8} {'skipped':>8} {'rows scored':>12} {'identical':>10}")
+    for shards in shard_counts:
+        if args.synthetic:
+            root, queries = _synthetic_shards(args.synthetic, shards, args.dim)
+            build(root, args.blocks)
+        else:
+            root = args.index_root
+            embedder = _embedder(args)
+            from bench_queries import TEST_QUERIES
+            queries = embedder.embed([query for query, _ in TEST_QUERIES])
+        index = TopKSearch(root)
+        try:
+            try:
+                index.check_query(queries)
+            except ValueError as exc:
+                print(exc)
+                return 1
+            index.exhaustive(queries[0], args.k)  # open every shard connection up front
+            exhaustive_ms, bounded_ms, visited, skipped, scored = [], [], [], [], []
+            identical = 0
+            for query in queries:
+                start = time.perf_counter()
+                truth = index.exhaustive(query, args.k)
+                exhaustive_ms.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                hits, stats = index.search(query, args.k)
+                bounded_ms.append((time.perf_counter() - start) * 1000)
+                visited.append(stats["shards_visited"])
+                skipped.append(stats["shards_skipped"])
+                scored.append(stats["rows_scored"])
+                identical += _same(hits, truth)
+            rows = index.meta["count"]
+            print(f"{index.meta['shards']:>6} {rows:>8} {percentile(exhaustive_ms, 50):>12.2f} ms "
+                  f"{percentile(bounded_ms, 50):>9.2f} ms "
+                  f"{percentile(exhaustive_ms, 50) / max(percentile(bounded_ms, 50), 1e-9):>7.1f}x "
+                  f"{sum(visited) / len(queries):>8.1f} {sum(skipped) / len(queries):>8.1f} "
+                  f"{sum(scored) / len(queries) / max(rows, 1):>11.1%} {identical:>5}/{len(queries):<4}")
+            if not args.synthetic and index.is_stale():
+                print("warning: shards changed since the bounds were built; run 'build' again")
+        finally:
+            index.close()
+            if args.synthetic:
+                del index
+                shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Exact cross-shard vector top-k with shard score bounds")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Record per-shard score bounds")
+    build_parser.add_argument("index_root")
+    build_parser.add_argument("--blocks", type=int, default=8, help="k-means blocks per shard (default: 8)")
+
+    for name, help_text in (("search", "Bounded top-k for one query"),
+                            ("verify", "Compare bounded and exhaustive top-k for the benchmark queries"),
+                            ("bench", "Latency and shards visited against the exhaustive fan-out")):
+        sub_parser = sub.add_parser(name, help=help_text)
+        sub_parser.add_argument("index_root", nargs="?" if name == "bench" else None)
+        if name == "search":
+            sub_parser.add_argument("query")
+            sub_parser.add_argument("--limit", type=int, default=10)
+            sub_parser.add_argument("--json", action="store_true", help="Print a search --json document")
+        else:
+            sub_parser.add_argument("--k", type=int, default=10)
+        sub_parser.add_argument("--embedder", default="hash", help="Query embedder matching the index (embed_pipeline.py)")
+        sub_parser.add_argument("--model", help="Embedding model for --embedder")
+    bench_parser = sub.choices["bench"]
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N clustered random vectors instead")
+    bench_parser.add_argument("--shards", type=lambda s: [int(x) for x in s.split(",")], default=[16, 64, 256],
+                              help="Comma-separated shard counts for --synthetic (default: 16,64,256)")
+    bench_parser.add_argument("--blocks", type=int, default=8)
+    bench_parser.add_argument("--dim", type=int, default=384, help="Dimensions for --synthetic")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        print(json.dumps(build(args.index_root, args.blocks), indent=2))
+        return 0
+    if args.command == "bench":
+        if not args.index_root and not args.synthetic:
+            parser.error("bench needs INDEX_ROOT or --synthetic N")
+        return bench(args)
+
+    index = TopKSearch.open(args.index_root)
+    if index is None:
+        print(f"No shard bounds under {args.index_root}; run 'build' first", file=sys.stderr)
+        return 1
+    try:
+        if index.is_stale():
+            print("warning: shards changed since the bounds were built; changed shards are scanned in full",
+                  file=sys.stderr)
+        embedder = _embedder(args)
+        if args.command == "verify":
+            from bench_queries import TEST_QUERIES
+            queries = embedder.embed([query for query, _ in TEST_QUERIES])
+        else:
+            queries = embedder.embed([args.query])
+        try:
+            index.check_query(queries)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        if args.command == "verify":
+            mismatches = verify(index, queries, args.k)
+            print(f"{len(TEST_QUERIES) - mismatches}/{len(TEST_QUERIES)} queries identical to the exhaustive scan")
+            return 1 if mismatches else 0
+        doc = search_document(index, queries[0], args.limit)
+    finally:
+        index.close()
+    if args.json:
+        print(json.dumps(doc, indent=2, ensure_ascii=False))
+    else:
+        stats = doc["result"]["stats"]
+        for hit in doc["result"]["results"]:
+            print(f"{hit['score']:.4f}  {hit['path']}")
+        print(f"shards visited {stats['shards_visited']}/{stats['shards_total']}, skipped {stats['shards_skipped']}, "
+              f"rows scored {stats['rows_scored']}, {stats['time_ms']:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
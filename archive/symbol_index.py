@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""Exact-identifier fast path: query classifier plus a cross-shard symbol-name index.
+
+Queries such as ``ThermalResistance`` or ``def build`` ask where a symbol is
+defined. Hybrid and cascade still embed them and score vectors. ``classify``
+sorts a query into one of three classes:
+
+* ``identifier``  one code-shaped token: camel case, or containing ``_``,
+                  ``.``, ``::`` or ``()`` (``ThermalResistance``,
+                  ``load_config``, ``pkg.mod.run``, ``build()``)
+* ``word``        one plain word (``database``, ``Solver``); only an exact,
+                  case-sensitive name match is taken, so English words that
+                  merely prefix a symbol still go to semantic search
+* ``pattern``     a definition keyword plus a name (``def build``,
+                  ``class Solver``, ``fn main``), which also fixes the kind
+* ``natural``     anything else, including CJK text; always goes to
+                  semantic search
+
+``build`` copies the ``symbols`` rows of every shard (joined with
+``files``) into one table next to the shards, with indexes on the name and
+its lower-cased form, so exact, case-insensitive and prefix lookups are
+B-tree probes:
+
+* ``_symbols.db``    name, kind, path, lines, shard
+* ``_symbols.json``  row count and the index generation it was built from
+
+``answer`` returns a ``search --json``-shaped document of definition sites,
+with ``result.stats.route == "symbol"``, or None when the query is natural
+language or nothing matches; callers then run the semantic search.
+
+Usage::
+
+    python symbol_index.py build INDEX_ROOT
+    python symbol_index.py lookup INDEX_ROOT "def build" [--limit 10]
+    python symbol_index.py bench INDEX_ROOT [--repeat 200]
+    python symbol_index.py bench --synthetic 20000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bench_common import create_shard, percentile, synthetic_root
+from index_shards import (GenerationWatch, build_path, find_index_dbs, index_generation, open_readonly, read_meta,
+                          write_meta)
+
+DB_NAME = "_symbols.db"
+META_NAME = "_symbols.json"
+SCHEMA_VERSION = 1
+
+# Methods whose embedding work the fast path can skip
+FAST_PATH_METHODS = ("hybrid", "cascade")
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_$][\w$]*(?:(?:\.|::)[A-Za-z_$][\w$]*)*(?:\(\))?$")
+# Camel case (including acronyms like HTTPServer), or a code separator
+_CODE_SHAPED = re.compile(r"[a-z0-9][A-Z]|[A-Z]{2}[a-z]|[_.$]|::|\(\)$")
+_PATTERN = re.compile(r"^(def|class|function|func|fn|interface|struct|enum|trait|type|impl)\s+([A-Za-z_$][\w$]*)\s*(?:\(\))?:?$")
+# Definition keyword -> symbol kinds it can name
+_KEYWORD_KINDS = {
+    "def": ("function", "method"),
+    "function": ("function", "method"),
+    "func": ("function", "method"),
+    "fn": ("function", "method"),
+    "class": ("class",),
+    "interface": ("interface", "class"),
+    "struct": ("class", "struct"),
+    "enum": ("class", "enum"),
+    "trait": ("interface", "trait", "class"),
+    "type": ("type", "class", "interface"),
+    "impl": ("class", "struct"),
+}
+# Definitions before references to them, when several kinds share a name
+_KIND_ORDER = {"class": 0, "interface": 0, "struct": 0, "enum": 0, "trait": 0, "type": 1,
+               "function": 1, "method": 2}
+# Score per match type, so fused or compared results order like relevance
+_MATCH_SCORES = {"exact": 1.0, "nocase": 0.9, "prefix": 0.8}
+
+
+def classify(query: str) -> Tuple[str, Optional[str], Optional[Tuple[str, ...]]]:
+    """(query class, symbol name to look up, kinds allowed or None)."""
+    text = query.strip()
+    pattern = _PATTERN.match(text)
+    if pattern:
+        return "pattern", pattern.group(2), _KEYWORD_KINDS[pattern.group(1)]
+    if _IDENTIFIER.match(text):
+        name = re.split(r"\.|::", text.rstrip("()"))[-1]
+        return ("identifier" if _CODE_SHAPED.search(text) else "word"), name, None
+    return "natural", None, None
+
+
+def build(index_root: str) -> dict:
+    """Build (or rebuild) the symbol-name index of every shard under index_root."""
+    index_files = find_index_dbs(index_root)
+    generation = index_generation(index_root, index_files)
+    path = os.path.join(index_root, DB_NAME)
+    tmp_path = build_path(path)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("CREATE TABLE symbols (name TEXT NOT NULL, name_lower TEXT NOT NULL, kind TEXT,"
+                 " path TEXT NOT NULL, start_line INTEGER, end_line INTEGER, shard TEXT NOT NULL)")
+    count = 0
+    skipped = 0
+    for db_path in index_files:
+        shard = os.path.relpath(db_path, index_root)
+        source = open_readonly(db_path)
+        try:
+            rows = source.execute("SELECT s.name, s.kind, f.full_path, s.start_line, s.end_line"
+                                  " FROM symbols s JOIN files f ON s.file_id = f.id").fetchall()
+        except sqlite3.OperationalError:
+            skipped += 1
+            continue
+        finally:
+            source.close()
+        conn.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         ((name, name.lower(), (kind or "").lower(), full_path, start_line, end_line, shard)
+                          for name, kind, full_path, start_line, end_line in rows if name))
+        count += len(rows)
+    # Built after the inserts: one sort instead of per-row B-tree updates
+    conn.execute("CREATE INDEX idx_symbols_name ON symbols (name)")
+    conn.execute("CREATE INDEX idx_symbols_name_lower ON symbols (name_lower)")
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "count": count,
+        "shards_without_symbols": skipped,
+        "bytes": os.path.getsize(path),
+        "build_s": time.perf_counter() - start,
+        "generation": generation,
+        "built_at": time.time(),
+    }
+    write_meta(index_root, META_NAME, meta)
+    return meta
+
+
+class SymbolIndex:
+    """Read-only view over a built symbol-name index."""
+
+    def __init__(self, index_root: str):
+        self.index_root = index_root
+        self.meta = read_meta(index_root, META_NAME, SCHEMA_VERSION)
+        self._conn = open_readonly(os.path.join(index_root, DB_NAME))
+        self._generation = GenerationWatch(index_root)
+
+    @classmethod
+    def open(cls, index_root: str) -> Optional["SymbolIndex"]:
+        """The index under index_root, or None when it has not been built."""
+        if not os.path.exists(os.path.join(index_root, META_NAME)):
+            return None
+        return cls(index_root)
+
+    def is_stale(self) -> bool:
+        return self._generation.current() != self.meta.get("generation")
+
+    def _select(self, where: str, params: Sequence[Any], kinds: Optional[Sequence[str]], limit: int) -> List[tuple]:
+        if kinds:
+            where += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params = list(params) + list(kinds)
+        return self._conn.execute(f"SELECT name, kind, path, start_line, end_line, shard FROM symbols WHERE {where}"
+                                  " LIMIT ?", list(params) + [limit]).fetchall()
+
+    def lookup(self, name: str, kinds: Optional[Sequence[str]] = None, limit: int = 10,
+               prefix: bool = True, nocase: bool = True) -> Tuple[str, List[dict]]:
+        """(match type, definition sites) for name: exact, else case-insensitive, else prefix."""
+        lower = name.lower()
+        # Over-fetch so the kind ordering below is not decided by the LIMIT
+        fetch = max(limit * 4, 50)
+        match, rows = "exact", self._select("name = ?", (name,), kinds, fetch)
+        if not rows and nocase:
+            match, rows = "nocase", self._select("name_lower = ?", (lower,), kinds, fetch)
+        if not rows and prefix:
+            # Range scan on the index; U+FFFF sorts after every code character
+            match, rows = "prefix", self._select("name_lower >= ? AND name_lower < ?", (lower, lower + "\uffff"),
+                                                 kinds, fetch)
+        rows.sort(key=lambda r: (len(r[0]) if match == "prefix" else 0, _KIND_ORDER.get(r[1], 3), r[2], r[3] or 0))
+        return match, [{"name": n, "kind": kind, "path": path, "start_line": start, "end_line": end, "shard": shard}
+                       for n, kind, path, start, end, shard in rows[:limit]]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def answer(index: SymbolIndex, query: str, limit: int = 10) -> Optional[Dict[str, Any]]:
+    """A ``--json`` search document of definition sites, or None to fall back to semantic search."""
+    start = time.perf_counter()
+    query_class, name, kinds = classify(query)
+    if query_class == "natural":
+        return None
+    fuzzy = query_class != "word"
+    match, hits = index.lookup(name, kinds, limit, prefix=fuzzy, nocase=fuzzy)
+    if not hits:
+        return None
+    score = _MATCH_SCORES[match]
+    results = [{"path": hit["path"], "score": score, "line": hit["start_line"], "symbol": hit["name"],
+                "kind": hit["kind"], "excerpt": f"{hit['kind']} {hit['name']}"} for hit in hits]
+    return {"success": True, "result": {"results": results, "stats": {
+        "time_ms": (time.perf_counter() - start) * 1000,
+        "route": "symbol",
+        "query_class": query_class,
+        "match": match,
+    }}}
+
+
+_SYNTH_PARTS = ["Thermal", "Resistance", "Boundary", "Condition", "Stator", "Slot", "Cooling", "Mesh", "Solver",
+                "Network", "Heat", "Source", "Winding", "Coolant", "Flow", "Matrix", "Node", "Loss", "Rotor", "Model"]
+
+
+def _synthetic_shards(count: int, shards: int = 32, seed: int = 0) -> Tuple[str, List[str]]:
+    """Shards with files and symbols tables of camel-case classes and snake-case functions."""
+    root = synthetic_root("symbol-index")
+    rng = random.Random(seed)
+    names = []
+    per_shard = max(1, count // shards)
+    for shard in range(shards):
+        conn = create_shard(root, f"pkg{shard:02d}")
+        conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, full_path TEXT)")
+        conn.execute("CREATE TABLE symbols (id INTEGER PRIMARY KEY, file_id INTEGER, name TEXT, kind TEXT,"
+                     " start_line INTEGER, end_line INTEGER)")
+        for i in range(per_shard):
+            parts = rng.sample(_SYNTH_PARTS, 2)
+            if rng.random() < 0.3:
+                name, kind = "".join(parts) + rng.choice(["", "Impl", "Config"]), "class"
+            else:
+                name, kind = "_".join(p.lower() for p in parts) + f"_{rng.randrange(100)}", "function"
+            file_id = i // 20 + 1
+            if i % 20 == 0:
+                conn.execute("INSERT INTO files (id, name, full_path) VALUES (?, ?, ?)",
+                             (file_id, f"m{file_id}.py", f"/synthetic/pkg{shard:02d}/m{file_id}.py"))
+            line = (i % 20) * 10 + 1
+            conn.execute("INSERT INTO symbols (file_id, name, kind, start_line, end_line) VALUES (?, ?, ?, ?, ?)",
+                         (file_id, name, kind, line, line + 8))
+            names.append(name)
+        conn.commit()
+        conn.close()
+    return root, names
+
+
+def _code_prefix(name: str) -> str:
+    """Prefix that ends two characters into the second part, so it stays code-shaped."""
+    for i in range(1, len(name)):
+        if name[i] == "_" or name[i].isupper():
+            return name[:i + 3]
+    return name
+
+
+def bench(args: argparse.Namespace) -> int:
+    from bench_queries import TEST_QUERIES
+    if args.synthetic:
+        root, names = _synthetic_shards(args.synthetic)
+    else:
+        root, names = args.index_root, []
+    try:
+        meta = build(root)
+        print(f"symbols={meta['count']} shards={len(find_index_dbs(root))} build={meta['build_s']:.2f}s "
+              f"size={meta['bytes'] / 1e6:.1f}MB")
+        index = SymbolIndex(root)
+        rng = random.Random(1)
+        sample = rng.sample(names, min(len(names), 50)) if names else []
+        cases = [(query, query) for query, _ in TEST_QUERIES]
+        # Plain words that prefix many symbols must still go to semantic search
+        cases += [(f"word {word}", word) for word in ("cooling", "database")]
+        cases += [(f"exact {n}", n) for n in sample[:20]]
+        cases += [(f"nocase {n.lower()}", n.swapcase()) for n in sample[20:35]]
+        cases += [(f"prefix {_code_prefix(n)}", _code_prefix(n)) for n in sample[35:]]
+        print(f"{'query':<40} {'class':<11} {'route':<9} {'match':<7} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        try:
+            for label, query in cases:
+                timings, doc = [], None
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    doc = answer(index, query, args.limit)
+                    timings.append((time.perf_counter() - start) * 1000)
+                stats = doc["result"]["stats"] if doc else {}
+                print(f"{label[:40]:<40} {classify(query)[0]:<11} {stats.get('route', 'semantic'):<9} "
+                      f"{stats.get('match', '-'):<7} {len(doc['result']['results']) if doc else 0:>5} "
+                      f"{percentile(timings, 50):>8.3f} {percentile(timings, 95):>8.3f}")
+        finally:
+            index.close()
+    finally:
+        if args.synthetic:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cross-shard symbol-name index for identifier queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="Copy every shard's symbols into one indexed table")
+    build_parser.add_argument("index_root")
+
+    lookup_parser = sub.add_parser("lookup", help="Classify a query and answer it from the index")
+    lookup_parser.add_argument("index_root")
+    lookup_parser.add_argument("query")
+    lookup_parser.add_argument("--limit", type=int, default=10)
+
+    bench_parser = sub.add_parser("bench", help="Lookup latency per query class and match type")
+    bench_parser.add_argument("index_root", nargs="?")
+    bench_parser.add_argument("--limit", type=int, default=10)
+    bench_parser.add_argument("--repeat", type=int, default=200, help="Timed lookups per query (default: 200)")
+    bench_parser.add_argument("--synthetic", type=int, metavar="N", help="Benchmark N synthetic symbols instead")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        print(json.dumps(build(args.index_root), indent=2))
+        return 0
+    if args.command == "lookup":
+        index = SymbolIndex.open(args.index_root)
+        if index is None:
+            print(f"No symbol index under {args.index_root}; run 'build' first", file=sys.stderr)
+            return 1
+        try:
+            if index.is_stale():
+                print("warning: shards changed since the index was built; run 'build' again", file=sys.stderr)
+            doc = answer(index, args.query, args.limit)
+        finally:
+            index.close()
+        if doc is None:
+            print(f"{classify(args.query)[0]} query without symbol hits: use semantic search", file=sys.stderr)
+            return 1
+        print(json.dumps(doc, indent=2, ensure_ascii=False))
+        return 0
+    if not args.index_root and not args.synthetic:
+        parser.error("bench needs INDEX_ROOT or --synthetic N")
+    return bench(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Seeded synthetic code repositories with labelled queries, for offline benchmarks.
+
+``generate`` writes a repository of ``--files`` source files in several
+languages (Python, TypeScript, Go, Java, Rust) plus a query set whose
+relevant files are known by construction:
+
+* every file has one primary topic (two domain words, e.g. "thermal
+  resistance") that names its main class and functions and appears in a
+  docstring together with the Chinese terms, and mentions up to two other
+  topics in helper code;
+* each query targets one topic, phrased as a code identifier, natural
+  language, a code pattern or Chinese, like bench_queries.TEST_QUERIES;
+* relevance is graded: 2 for files whose primary topic it is, 1 for files
+  that only mention it.
+
+Output (under OUT)::
+
+    repo/            the source tree (about 50 files per directory)
+    queries.jsonl    {"id", "query", "kind", "description", "topic"} per line
+    qrels.txt        TREC qrels: "<query id> 0 <repo-relative path> <grade>"
+    corpus.json      seed, scale, languages and a content digest
+
+The same seed and scale always give byte-identical files; ``corpus.json``
+carries the digest to check that.
+
+``curves`` generates each scale, indexes it with ``codexlens init``, and
+records indexing time, index size on disk and per-method search latency
+(p50 / p95 over the query set) in a table and a JSON file.
+
+Usage::
+
+    python synth_corpus.py generate OUT [--files 1000] [--seed 0] [--languages python,go]
+    python synth_corpus.py curves OUT_DIR [--scales 1000,10000,100000] [--methods hybrid,vector,cascade:binary]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+GENERATOR_VERSION = 1
+SCHEMA_VERSION = 1
+FILES_PER_DIR = 50
+DEFAULT_SCALES = (1000, 10000, 100000)
+
+# Domain words with Chinese terms, so every topic can also be queried in Chinese
+VOCABULARY = {
+    "thermal": "热", "network": "网络", "resistance": "阻抗", "boundary": "边界", "condition": "条件",
+    "stator": "定子", "rotor": "转子", "slot": "槽", "cooling": "冷却", "winding": "绕组",
+    "flux": "磁通", "magnet": "磁体", "torque": "转矩", "speed": "转速", "voltage": "电压",
+    "current": "电流", "loss": "损耗", "efficiency": "效率", "pressure": "压力", "flow": "流量",
+    "turbine": "水轮机", "generator": "发电机", "bearing": "轴承", "shaft": "轴", "vibration": "振动",
+    "sensor": "传感器", "signal": "信号", "filter": "滤波", "sample": "采样", "schedule": "调度",
+    "cache": "缓存", "index": "索引", "query": "查询", "token": "令牌", "session": "会话",
+    "user": "用户", "account": "账户", "payment": "支付", "order": "订单", "invoice": "发票",
+    "report": "报表", "export": "导出", "import": "导入", "config": "配置", "plugin": "插件",
+    "mesh": "网格", "solver": "求解器", "matrix": "矩阵", "vector": "向量", "gradient": "梯度",
+    "material": "材料", "density": "密度", "temperature": "温度", "heat": "热量", "fluid": "流体",
+    "queue": "队列", "worker": "工作线程", "retry": "重试", "timeout": "超时", "log": "日志",
+}
+VERBS = ("compute", "build", "load", "update", "validate", "apply", "resolve", "merge", "parse", "render")
+VERB_PHRASES = {"compute": "is computed", "build": "is built", "load": "is loaded", "update": "is updated",
+                "validate": "is validated", "apply": "is applied", "resolve": "is resolved",
+                "merge": "is merged", "parse": "is parsed", "render": "is rendered"}
+LANGUAGES = {"python": ".py", "typescript": ".ts", "go": ".go", "java": ".java", "rust": ".rs"}
+QUERY_KINDS = ("identifier", "natural", "pattern", "chinese")
+
+Topic = Tuple[str, str]
+
+
+def _pascal(words: Sequence[str]) -> str:
+    return "".join(w.capitalize() for w in words)
+
+
+def _camel(words: Sequence[str]) -> str:
+    return words[0] + _pascal(words[1:])
+
+
+def _snake(words: Sequence[str]) -> str:
+    return "_".join(words)
+
+
+def _function_name(language: str, words: Sequence[str]) -> str:
+    if language in ("python", "rust"):
+        return _snake(words)
+    if language == "go":
+        return _pascal(words)
+    return _camel(words)
+
+
+def render_file(language: str, topic: Topic, mentions: Sequence[Topic], verbs: Sequence[str],
+                rng: random.Random) -> str:
+    """Source text for one file whose main class and functions are about topic."""
+    cls = _pascal(topic)
+    chinese = "".join(VOCABULARY[w] for w in topic)
+    doc = f"{' '.join(topic).capitalize()} handling. {chinese}{'计算' if verbs[0] == 'compute' else '处理'}"
+    functions = [(verb, _function_name(language, (verb,) + topic)) for verb in verbs]
+    helpers = [(_function_name(language, (rng.choice(VERBS),) + other), _pascal(other)) for other in mentions]
+    constant = rng.randint(1, 9999)
+
+    if language == "python":
+        lines = [f'"""{doc}."""', "", "", f"class {cls}:", f'    """{cls} state."""', "",
+                 "    def __init__(self, value=None):", "        self.value = value", ""]
+        for verb, name in functions:
+            lines += [f"    def {name}(self, data):", f'        """{verb.capitalize()} the {" ".join(topic)}."""',
+                      f"        return [item * {constant} for item in data]", ""]
+        for name, other in helpers:
+            lines += ["", f"def {name}(value):", f"    # uses {other}", f"    return {other}(value)", ""]
+    elif language == "typescript":
+        lines = [f"/** {doc}. */", f"export class {cls} {{", "  constructor(private value?: number) {}", ""]
+        for verb, name in functions:
+            lines += [f"  /** {verb.capitalize()} the {' '.join(topic)}. */",
+                      f"  {name}(data: number[]): number[] {{", f"    return data.map((item) => item * {constant});",
+                      "  }", ""]
+        lines.append("}")
+        for name, other in helpers:
+            lines += ["", f"export function {name}(value: number): {other} {{",
+                      f"  return new {other}(value);", "}"]
+    elif language == "go":
+        lines = [f"// Package {topic[0]} implements {doc}.", f"package {topic[0]}", "",
+                 f"// {cls} holds the {' '.join(topic)} state.", f"type {cls} struct {{", "\tValue int", "}", ""]
+        for verb, name in functions:
+            lines += [f"// {name} does {verb} on the {' '.join(topic)}.",
+                      f"func (s *{cls}) {name}(data []int) []int {{", "\tout := make([]int, len(data))",
+                      "\tfor i, item := range data {", f"\t\tout[i] = item * {constant}", "\t}", "\treturn out", "}", ""]
+        for name, other in helpers:
+            lines += [f"func {name}(value int) *{other} {{", f"\treturn &{other}{{Value: value}}", "}", ""]
+    elif language == "java":
+        lines = [f"package synth.{topic[0]};", "", f"/** {doc}. */", f"public class {cls} {{",
+                 "    private int value;", ""]
+        for verb, name in functions:
+            lines += [f"    /** {verb.capitalize()} the {' '.join(topic)}. */",
+                      f"    public int[] {name}(int[] data) {{",
+                      f"        return java.util.Arrays.stream(data).map(item -> item * {constant}).toArray();",
+                      "    }", ""]
+        for name, other in helpers:
+            lines += [f"    static {other} {name}(int value) {{", f"        return new {other}(value);", "    }", ""]
+        lines.append("}")
+    else:
+        lines = [f"//! {doc}.", "", f"pub struct {cls} {{", "    pub value: i64,", "}", "", f"impl {cls} {{"]
+        for verb, name in functions:
+            lines += [f"    /// {verb.capitalize()} the {' '.join(topic)}.",
+                      f"    pub fn {name}(&self, data: &[i64]) -> Vec<i64> {{",
+                      f"        data.iter().map(|item| item * {constant}).collect()", "    }", ""]
+        lines.append("}")
+        for name, other in helpers:
+            lines += ["", f"pub fn {name}(value: i64) -> {other} {{", f"    {other} {{ value }}", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def phrase_query(kind: str, topic: Topic, verb: str) -> Tuple[str, str]:
+    """(query, description) for one topic, in the style of TEST_QUERIES."""
+    if kind == "identifier":
+        return _pascal(topic), "Code identifier"
+    if kind == "natural":
+        return f"how the {' '.join(topic)} {VERB_PHRASES[verb]}", "Natural language"
+    if kind == "pattern":
+        return f"def {verb}_{_snake(topic)}", "Code pattern"
+    return "".join(VOCABULARY[w] for w in topic) + ("计算" if verb == "compute" else "处理"), "Chinese"
+
+
+def generate(out_dir: str, files: int = 1000, seed: int = 0, languages: Sequence[str] = tuple(LANGUAGES),
+             queries: int = 50) -> dict:
+    """Write the repository, queries and qrels; returns the corpus.json manifest."""
+    rng = random.Random(f"{seed}:{files}")
+    words = sorted(VOCABULARY)
+    all_topics = [(a, b) for a in words for b in words if a != b]
+    rng.shuffle(all_topics)
+    topics = all_topics[:max(1, min(len(all_topics), files // 20))]
+
+    repo = os.path.join(out_dir, "repo")
+    if os.path.exists(repo):
+        shutil.rmtree(repo)
+    primary: Dict[Topic, List[str]] = {topic: [] for topic in topics}
+    mentioned: Dict[Topic, List[str]] = {topic: [] for topic in topics}
+    topic_verbs: Dict[Topic, str] = {}
+    digest = hashlib.sha1()
+
+    for i in range(files):
+        language = languages[i % len(languages)]
+        topic = topics[i % len(topics)] if i < len(topics) else rng.choice(topics)
+        verb = topic_verbs.setdefault(topic, rng.choice(VERBS))
+        verbs = [verb] + rng.sample([v for v in VERBS if v != verb], rng.randint(0, 2))
+        mentions = [t for t in rng.sample(topics, min(len(topics), rng.randint(0, 2))) if t != topic]
+        directory = os.path.join(f"pkg{i // (FILES_PER_DIR * FILES_PER_DIR):03d}",
+                                 f"mod{(i // FILES_PER_DIR) % FILES_PER_DIR:02d}")
+        relpath = f"{directory}/{_snake(topic)}_{i}{LANGUAGES[language]}"
+        content = render_file(language, topic, mentions, verbs, rng)
+
+        os.makedirs(os.path.join(repo, directory), exist_ok=True)
+        with open(os.path.join(repo, relpath), "w", encoding="utf-8", newline="\n") as f:
+            f.write(content)
+        digest.update(relpath.encode("utf-8") + b"\0" + content.encode("utf-8"))
+        primary[topic].append(relpath)
+        for other in mentions:
+            mentioned[other].append(relpath)
+
+    query_topics = rng.sample(topics, min(queries, len(topics)))
+    with open(os.path.join(out_dir, "queries.jsonl"), "w", encoding="utf-8", newline="\n") as qf, \
+            open(os.path.join(out_dir, "qrels.txt"), "w", encoding="utf-8", newline="\n") as rf:
+        for n, topic in enumerate(query_topics):
+            query_id = f"q{n:04d}"
+            kind = QUERY_KINDS[n % len(QUERY_KINDS)]
+            query, description = phrase_query(kind, topic, topic_verbs[topic])
+            qf.write(json.dumps({"id": query_id, "query": query, "kind": kind, "description": description,
+                                 "topic": " ".join(topic)}, ensure_ascii=False) + "\n")
+            grades = dict.fromkeys(mentioned[topic], 1)
+            grades.update(dict.fromkeys(primary[topic], 2))
+            for relpath in sorted(grades):
+                rf.write(f"{query_id} 0 {relpath} {grades[relpath]}\n")
+
+    manifest = {"schema_version": SCHEMA_VERSION, "generator_version": GENERATOR_VERSION, "seed": seed,
+                "files": files, "languages": list(languages), "topics": len(topics),
+                "queries": len(query_topics), "digest": digest.hexdigest()}
+    with open(os.path.join(out_dir, "corpus.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _load_manifest(out_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(out_dir, "corpus.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tree_bytes(root: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _parse_methods(text: str) -> List[Tuple[str, Optional[str]]]:
+    methods = []
+    for item in filter(None, (m.strip() for m in text.split(","))):
+        method, _, strategy = item.partition(":")
+        methods.append((method, strategy or None))
+    return methods
+
+
+def measure_scale(out_dir: str, files: int, args: argparse.Namespace) -> dict:
+    """Generate (or reuse) one scale, index it, and time searches over its queries."""
+    from bench_common import percentile
+    from bench_queries import load_queries
+    from index_shards import default_index_root
+    from search_stream import run_codexlens_search
+
+    languages = args.languages
+    manifest = _load_manifest(out_dir)
+    if not (manifest and manifest.get("files") == files and manifest.get("seed") == args.seed
+            and manifest.get("languages") == list(languages)
+            and manifest.get("generator_version") == GENERATOR_VERSION):
+        start = time.perf_counter()
+        manifest = generate(out_dir, files, args.seed, languages, args.queries)
+        print(f"  generated {files} files in {time.perf_counter() - start:.1f}s", flush=True)
+
+    repo = os.path.abspath(os.path.join(out_dir, "repo"))
+    index_root = default_index_root(repo)
+    row = {"files": files, "corpus_bytes": _tree_bytes(repo), "digest": manifest["digest"]}
+
+    if os.path.exists(index_root):
+        shutil.rmtree(index_root)
+    start = time.perf_counter()
+    proc = subprocess.run([args.python, "-m", "codexlens", "init", repo], capture_output=True, text=True,
+                          encoding="utf-8", errors="replace")
+    row["index_s"] = time.perf_counter() - start
+    if proc.returncode != 0:
+        output = (proc.stderr or proc.stdout).strip().splitlines()
+        row["error"] = output[-1] if output else f"codexlens init exited with {proc.returncode}"
+        return row
+    row["index_bytes"] = _tree_bytes(index_root)
+
+    queries = load_queries(os.path.join(out_dir, "queries.jsonl"))
+    row["search"] = {}
+    cwd = os.getcwd()
+    os.chdir(repo)
+    try:
+        for method, strategy in _parse_methods(args.methods):
+            key = f"{method}_{strategy}" if strategy else method
+            latencies, failed = [], 0
+            for query, _ in queries:
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    data = run_codexlens_search(query, method, strategy, args.limit, use_daemon=False)
+                    wall = (time.perf_counter() - start) * 1000
+                    if data.get("success"):
+                        latencies.append(data.get("result", {}).get("stats", {}).get("time_ms", wall))
+                    else:
+                        failed += 1
+            row["search"][key] = {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95),
+                                  "samples": len(latencies), "failed": failed}
+    finally:
+        os.chdir(cwd)
+    return row
+
+
+def curves(args: argparse.Namespace) -> int:
+    rows = []
+    for files in args.scales:
+        print(f"⏳ {files} files", flush=True)
+        rows.append(measure_scale(os.path.join(args.out_dir, f"scale_{files}"), files, args))
+
+    methods = [f"{m}_{s}" if s else m for m, s in _parse_methods(args.methods)]
+    print(f"\n{'files':>8} {'corpus MB':>10} {'index s':>9} {'index MB':>9}"
+          + "".join(f" {m + ' p50':>16}" for m in methods))
+    for row in rows:
+        if "error" in row:
+            print(f"{row['files']:>8} {row['corpus_bytes'] / 2 ** 20:>10.1f}  ✗ {row['error']}")
+            continue
+        cells = "".join(f" {row['search'][m]['p50_ms']:>16.1f}" for m in methods)
+        print(f"{row['files']:>8} {row['corpus_bytes'] / 2 ** 20:>10.1f} {row['index_s']:>9.1f}"
+              f" {row['index_bytes'] / 2 ** 20:>9.1f}{cells}")
+
+    payload = {"schema_version": SCHEMA_VERSION, "seed": args.seed, "languages": list(args.languages),
+               "methods": methods, "repeat": args.repeat, "scales": rows}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 {args.output}")
+    return 1 if any("error" in row for row in rows) else 0
+
+
+def _split_list(text: str) -> List[str]:
+    return [item for item in (x.strip() for x in text.split(",")) if item]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Corpus options belong after the subcommand, as in the usage lines
+    corpus = argparse.ArgumentParser(add_help=False)
+    corpus.add_argument("--seed", type=int, default=0)
+    corpus.add_argument("--languages", type=_split_list, default=list(LANGUAGES),
+                        help=f"Comma-separated languages (default: {','.join(LANGUAGES)})")
+    corpus.add_argument("--queries", type=int, default=50, help="Labelled queries per corpus (default: 50)")
+
+    parser = argparse.ArgumentParser(description="Seeded synthetic corpora for offline search benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = sub.add_parser("generate", parents=[corpus],
+                                     help="Write one synthetic repository with queries and qrels")
+    generate_parser.add_argument("out")
+    generate_parser.add_argument("--files", type=int, default=1000)
+
+    curves_parser = sub.add_parser("curves", parents=[corpus],
+                                   help="Index time, index size and search latency per scale")
+    curves_parser.add_argument("out_dir")
+    curves_parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")],
+                               default=list(DEFAULT_SCALES), help="Comma-separated file counts (default: 1000,10000,100000)")
+    curves_parser.add_argument("--methods", default="hybrid,vector,cascade:binary",
+                               help="Comma-separated METHOD[:STRATEGY] (default: hybrid,vector,cascade:binary)")
+    curves_parser.add_argument("--repeat", type=int, default=1)
+    curves_parser.add_argument("--limit", type=int, default=10)
+    curves_parser.add_argument("--python", default=sys.executable, help="Interpreter with codexlens installed")
+    curves_parser.add_argument("--output", default="scale_curves.json")
+
+    args = parser.parse_args(argv)
+    unknown = [lang for lang in args.languages if lang not in LANGUAGES]
+    if unknown or not args.languages:
+        parser.error(f"--languages must be from {', '.join(LANGUAGES)}")
+    if args.command == "generate":
+        print(json.dumps(generate(args.out, args.files, args.seed, args.languages, args.queries), indent=2))
+        return 0
+    return curves(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Tests for the consolidated binary index against a per-shard exhaustive scan."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bench_common import write_chunk_shard  # noqa: E402
+from binary_index import BinaryIndex, build, pack_signs, same_topk, shard_scan_topk  # noqa: E402
+
+DIM = 64
+
+
+@pytest.fixture
+def index_root(tmp_path):
+    rng = np.random.default_rng(0)
+    chunk_id = 0
+    for shard in range(4):
+        rows = []
+        for _ in range(150):
+            chunk_id += 1
+            rows.append((chunk_id, f"d{shard}/f{chunk_id}.py", "", rng.normal(size=DIM).astype(np.float32).tobytes()))
+        write_chunk_shard(str(tmp_path), f"d{shard}", rows)
+    # A chunk from another model: skipped by the index and by the scan
+    write_chunk_shard(str(tmp_path), "other", [(1, "other/x.py", "", np.ones(DIM // 2, np.float32).tobytes())])
+    return str(tmp_path)
+
+
+def test_build_counts_rows_and_skips_other_dimensions(index_root):
+    meta = build(index_root)
+    assert meta["count"] == 600
+    assert meta["dim"] == DIM
+    assert meta["skipped_dim_mismatch"] == 1
+
+
+@pytest.mark.parametrize("block_rows", [7, 4096])
+def test_search_matches_shard_scan(index_root, block_rows):
+    build(index_root)
+    index = BinaryIndex(index_root, block_rows=block_rows)
+    try:
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            query_bits = pack_signs(rng.normal(size=DIM).astype(np.float32))
+            hits = index.resolve(index.search_bits(query_bits, 25))
+            got = [(hit["shard"], hit["chunk_id"], hit["hamming"]) for hit in hits]
+            assert same_topk(got, shard_scan_topk(index_root, query_bits, 25))
+    finally:
+        index.close()
+
+
+def test_is_stale_after_a_shard_changes(index_root):
+    build(index_root)
+    index = BinaryIndex(index_root)
+    try:
+        assert not index.is_stale()
+        write_chunk_shard(index_root, "new", [(1, "new/y.py", "", np.ones(DIM, np.float32).tobytes())])
+        index._generation.ttl = 0
+        assert index.is_stale()
+    finally:
+        index.close()
@@ -0,0 +1,106 @@
+"""Tests for embed_pipeline status accounting and batch sizing."""
+
+import sqlite3
+
+import pytest
+
+import embed_pipeline
+from bench_common import SEMANTIC_CHUNKS_TABLE, create_shard
+from embed_pipeline import AdaptiveBatcher, status
+
+FILE_A = "def alpha():\n    return 1\n\n\ndef beta():\n    return 2\n"
+FILE_B = "class Gamma:\n    pass\n"
+
+
+@pytest.fixture
+def index_root(tmp_path):
+    """One shard whose semantic_chunks rows were all written by codexlens (no chunk_hashes)."""
+    conn = create_shard(str(tmp_path), "pkg")
+    conn.executescript(SEMANTIC_CHUNKS_TABLE)
+    conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, full_path TEXT, language TEXT,"
+                 " content TEXT, mtime REAL, line_count INTEGER)")
+    for path, content in (("/p/a.py", FILE_A), ("/p/b.py", FILE_B)):
+        conn.execute("INSERT INTO files (name, full_path, content, mtime) VALUES (?, ?, ?, 1000000000.0)",
+                     (path.rsplit("/", 1)[1], path, content))
+    rows = [("/p/a.py", "def alpha():\n    return 1\n"), ("/p/a.py", "def beta():\n    return 2\n"),
+            ("/p/b.py", FILE_B)]
+    conn.executemany("INSERT INTO semantic_chunks (file_path, content, embedding, created_at)"
+                     " VALUES (?, ?, x'00000000', '2020-01-01 00:00:00')", rows)
+    conn.commit()
+    conn.close()
+    return str(tmp_path)
+
+
+def _update(index_root, sql, params=()):
+    conn = sqlite3.connect(f"{index_root}/pkg/_index.db")
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_foreign_files_are_checked_and_reported_apart(index_root):
+    result = status(index_root, "hash-384")
+    assert result["files_foreign"] == 2
+    assert result["files_foreign_stale"] == 0
+    assert result["chunks_stale"] == 0
+    assert result["coverage_percent"] == 0.0
+    assert result["foreign_coverage_percent"] == 100.0
+
+
+def test_edited_foreign_file_is_stale(index_root):
+    _update(index_root, "UPDATE files SET content = ? WHERE full_path = '/p/a.py'",
+            (FILE_A.replace("return 2", "return 3"),))
+    result = status(index_root, "hash-384")
+    assert result["files_foreign_stale"] == 1
+    assert result["chunks_stale"] == 2
+    assert result["foreign_coverage_percent"] == 50.0
+
+
+def test_foreign_file_reindexed_after_embedding_is_stale(index_root):
+    _update(index_root, "UPDATE files SET mtime = 1800000000.0 WHERE full_path = '/p/b.py'")
+    result = status(index_root, "hash-384")
+    assert result["files_foreign_stale"] == 1
+    assert result["chunks_stale"] == 1
+
+
+def test_removed_foreign_file_is_deleted(index_root):
+    _update(index_root, "DELETE FROM files WHERE full_path = '/p/b.py'")
+    result = status(index_root, "hash-384")
+    assert result["files_deleted"] == 1
+    assert result["chunks_stale"] == 1
+    assert result["files_foreign"] == 1
+
+
+def _batcher_with_rss(monkeypatch, readings, **kwargs):
+    """An AdaptiveBatcher whose RSS readings (in MiB) come from ``readings``: the first at construction."""
+    samples = iter(mib * 1024 * 1024 for mib in readings)
+    monkeypatch.setattr(embed_pipeline, "current_rss", lambda: next(samples))
+    return AdaptiveBatcher(memory_budget_mb=100, **kwargs)
+
+
+def test_batcher_halves_on_a_spike_and_grows_back(monkeypatch):
+    batcher = _batcher_with_rss(monkeypatch, [500, 650, 650, 660], size=32)
+    batcher.observe(32)  # +150 MiB: over budget
+    assert batcher.size == 16
+    batcher.observe(16)  # RSS stays high but has stopped growing
+    assert batcher.size == 32
+    batcher.observe(32)
+    assert batcher.size == 64
+
+
+def test_batcher_keeps_size_for_partial_batches_and_bounds(monkeypatch):
+    batcher = _batcher_with_rss(monkeypatch, [500, 500, 500, 900], size=8, min_size=8, max_size=16)
+    batcher.observe(3)  # a short final batch says nothing about a full one
+    assert batcher.size == 8
+    batcher.observe(8)
+    assert batcher.size == 16
+    batcher.observe(16)
+    assert batcher.size == 8
+    assert batcher.sizes == [3, 8, 16]
+
+
+def test_batcher_without_rss_keeps_its_size(monkeypatch):
+    monkeypatch.setattr(embed_pipeline, "current_rss", lambda: None)
+    batcher = AdaptiveBatcher(size=32)
+    batcher.observe(32)
+    assert batcher.size == 32
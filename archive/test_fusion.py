@@ -0,0 +1,38 @@
+"""Tests for the array-based reciprocal-rank fusion against the dictionary merge."""
+
+import argparse
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fusion import ARRAY_MIN_CANDIDATES, rrf_fuse, rrf_reference, verify  # noqa: E402
+
+
+def test_verify_finds_no_mismatches():
+    assert verify(argparse.Namespace(trials=120)) == 0
+
+
+def test_reference_scores_and_first_seen_ties():
+    fused = rrf_reference({"exact": ["a", "b"], "vector": ["b", "c"]}, {"exact": 1.0, "vector": 1.0}, k=0)
+    assert fused == [("b", pytest.approx(1.5)), ("a", 1.0), ("c", 0.5)]
+    tied = rrf_reference({"exact": ["x", "y"], "vector": ["y", "x"]}, {"exact": 1.0, "vector": 1.0}, k=1)
+    assert [key for key, _ in tied] == ["x", "y"]
+
+
+@pytest.mark.parametrize("rows", [False, True])
+def test_array_merge_matches_reference_above_the_cutover(rows):
+    rng = np.random.default_rng(3)
+    size = ARRAY_MIN_CANDIDATES * 2
+    results = {source: rng.choice(size * 2, size=size, replace=False) for source in ("exact", "fuzzy", "vector")}
+    results["fuzzy"] = results["exact"].copy()  # exact score ties
+    if not rows:
+        results = {source: [f"src/file_{i}.py" for i in ranked] for source, ranked in results.items()}
+    plain = {source: [int(r) for r in ranked] if rows else ranked for source, ranked in results.items()}
+    for top_k in (None, 1, 10, size):
+        assert rrf_fuse(results, top_k=top_k) == rrf_reference(plain, top_k=top_k)
+
+
+def test_missing_weights_and_empty_sources():
+    assert rrf_fuse({"exact": [], "vector": []}) == []
+    assert rrf_fuse({"other": ["a"]}) == [("a", 0.0)]
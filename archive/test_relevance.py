@@ -0,0 +1,51 @@
+"""Tests for the relevance metrics and the latency/quality Pareto frontier."""
+
+import math
+
+import pytest
+
+from relevance import evaluate, ndcg_at_k, pareto_frontier, recall_at_k, reciprocal_rank, relative_key
+
+GRADES = {"a.py": 3, "b.py": 1, "c.py": 0, "d.py": 2}
+
+
+def test_ndcg_is_one_for_the_ideal_ranking():
+    assert ndcg_at_k(["a.py", "d.py", "b.py"], GRADES) == pytest.approx(1.0)
+
+
+def test_ndcg_discounts_by_rank():
+    ideal = 7 + 3 / math.log2(3) + 1 / math.log2(4)
+    got = 1 + 7 / math.log2(3)  # b.py first, a.py second
+    assert ndcg_at_k(["b.py", "a.py"], GRADES) == pytest.approx(got / ideal)
+
+
+def test_duplicate_chunks_count_once_at_their_best_rank():
+    assert ndcg_at_k(["a.py", "a.py", "d.py", "b.py"], GRADES) == pytest.approx(1.0)
+    assert recall_at_k(["c.py", "c.py", "a.py"], GRADES, k=2) == pytest.approx(1 / 3)
+
+
+def test_reciprocal_rank_skips_unjudged_and_irrelevant():
+    assert reciprocal_rank(["x.py", "c.py", "b.py"], GRADES) == pytest.approx(1 / 3)
+    assert reciprocal_rank(["x.py", "c.py"], GRADES) == 0.0
+
+
+def test_metrics_without_relevant_files_are_zero():
+    assert ndcg_at_k(["a.py"], {"a.py": 0}) == 0.0
+    assert recall_at_k(["a.py"], {}) == 0.0
+
+
+def test_evaluate_reports_recall_at_k():
+    scores = evaluate(["a.py", "b.py"], GRADES, k=1)
+    assert set(scores) == {"ndcg@10", "mrr", "recall@1"}
+    assert scores["mrr"] == 1.0
+    assert scores["recall@1"] == pytest.approx(1 / 3)
+
+
+def test_relative_key_uses_forward_slashes(tmp_path):
+    assert relative_key(str(tmp_path / "src" / "a.py"), str(tmp_path)) == "src/a.py"
+    assert relative_key("src\\a.py") == "src/a.py"
+
+
+def test_pareto_frontier_drops_dominated_points():
+    points = {"slow_good": (10.0, 0.9), "fast_bad": (1.0, 0.5), "dominated": (12.0, 0.8), "tie": (10.0, 0.9)}
+    assert pareto_frontier(points) == ["fast_bad", "slow_good", "tie"]
@@ -0,0 +1,42 @@
+"""Tests for Reranker caching around partial API replies."""
+
+import io
+import json
+
+import pytest
+
+import rerank
+from rerank import ApiReranker, Reranker, ScoreCache
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """ApiReranker whose endpoint only scores the first document of each request."""
+    requests = []
+
+    def urlopen(request, timeout):
+        documents = json.loads(request.data)["documents"]
+        requests.append(documents)
+        return io.BytesIO(json.dumps({"results": [{"index": 0, "relevance_score": 0.9}]}).encode("utf-8"))
+
+    monkeypatch.setattr(rerank.urllib.request, "urlopen", urlopen)
+    backend = ApiReranker(url="http://rerank.invalid/v1/rerank", api_key="k", model="m")
+    return backend, requests
+
+
+def test_partial_reply_leaves_missing_documents_unscored(api):
+    backend, _ = api
+    assert backend.score_batch("q", ["a", "b", "c"]) == [0.9, None, None]
+
+
+def test_unscored_documents_are_not_cached(api, tmp_path):
+    backend, requests = api
+    cache = ScoreCache(str(tmp_path / "cache.db"))
+    try:
+        reranker = Reranker(backend, batch_size=8, cache=cache)
+        assert reranker.rerank("q", ["a", "b"]) == [0.9, None]
+        assert reranker.rerank("q", ["a", "b"]) == [0.9, 0.9]
+        assert requests == [["a", "b"], ["b"]]
+        assert reranker.stats["cache_hits"] == 1
+    finally:
+        cache.close()
@@ -0,0 +1,75 @@
+"""Tests for the bounded cross-shard top-k against the exhaustive fan-out."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bench_common import nearby_queries, write_chunk_shard  # noqa: E402
+from shard_topk import TopKSearch, build  # noqa: E402
+
+DIM = 32
+
+
+def _write_shards(root, rng, shards=12, per_shard=120):
+    """Shards drawing on a few topics each, so bounds can actually skip shards."""
+    centers = rng.normal(size=(16, DIM)).astype(np.float32)
+    vectors = []
+    for shard in range(shards):
+        topics = rng.choice(len(centers), size=2, replace=False)
+        noise = 0.5 * rng.normal(size=(per_shard, DIM))
+        matrix = (centers[rng.choice(topics, size=per_shard)] + noise).astype(np.float32)
+        write_chunk_shard(root, f"d{shard:02d}", [(i + 1, f"d{shard:02d}/c{i}.py", "", matrix[i].tobytes())
+                                                   for i in range(per_shard)])
+        vectors.append(matrix)
+    return np.vstack(vectors)
+
+
+def _brute_force(matrix, query, k):
+    """Top-k (shard number, chunk id) straight from the matrix; ties are not expected with random data."""
+    unit = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = unit.astype(np.float64) @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores, kind="stable")[:k]
+    return [(int(i) // 120, int(i) % 120 + 1) for i in order]
+
+
+@pytest.fixture
+def searcher(tmp_path):
+    rng = np.random.default_rng(0)
+    matrix = _write_shards(str(tmp_path), rng)
+    build(str(tmp_path), blocks=4)
+    index = TopKSearch(str(tmp_path))
+    yield index, matrix, nearby_queries(matrix, rng, count=25)
+    index.close()
+
+
+@pytest.mark.parametrize("k", [1, 10, 50])
+def test_bounded_search_is_identical_to_exhaustive(searcher, k):
+    index, _, queries = searcher
+    skipped = 0
+    for query in queries:
+        hits, stats = index.search(query, k)
+        assert hits == index.exhaustive(query, k)
+        skipped += stats["shards_skipped"]
+    assert skipped > 0
+
+
+def test_exhaustive_matches_a_brute_force_scan(searcher):
+    index, matrix, queries = searcher
+    for query in queries[:5]:
+        hits = index.exhaustive(query, 10)
+        assert [(int(hit["shard"][1:3]), hit["chunk_id"]) for hit in hits] == _brute_force(matrix, query, 10)
+
+
+def test_changed_shards_are_scanned_in_full(searcher, tmp_path):
+    index, matrix, queries = searcher
+    write_chunk_shard(str(tmp_path), "zz", [(1, "zz/best.py", "", queries[0].astype(np.float32).tobytes())])
+    hits, stats = index.search(queries[0], 5)
+    assert stats["shards_unbounded"] == 1
+    assert hits[0]["path"] == "zz/best.py"
+    assert hits == index.exhaustive(queries[0], 5)
+
+
+def test_query_dimension_must_match_the_index(searcher):
+    index, _, _ = searcher
+    with pytest.raises(ValueError, match="query dim 8 != index dim 32"):
+        index.search(np.ones(8, dtype=np.float32), 10)
@@ -1,47 +1,239 @@
-import sqlite3
+import argparse
+import json
 import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_ROOT = r'C:\Users\dyw\.codexlens\indexes\D\Claude_dms3\ccw'
+INDEX_DB_NAME = '_index.db'
+MANIFEST_NAME = '_coverage_manifest.json'
+MANIFEST_SCHEMA_VERSION = 1
+
+
+@dataclass
+class ShardCounts:
+    db_path: str
+    file_count: int = 0
+    chunk_count: Optional[int] = None  # None: no semantic_chunks table
+    error: Optional[str] = None
+    cached: bool = False
+
 
-# Find all _index.db files
-root_dir = r'C:\Users\dyw\.codexlens\indexes\D\Claude_dms3\ccw'
-index_files = []
-for dirpath, dirnames, filenames in os.walk(root_dir):
-    if '_index.db' in filenames:
-        index_files.append(os.path.join(dirpath, '_index.db'))
+def find_index_dbs(root_dir: str) -> List[str]:
+    """Find all _index.db files under root_dir, in a stable order."""
+    index_files = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        if INDEX_DB_NAME in filenames:
+            index_files.append(os.path.join(dirpath, INDEX_DB_NAME))
+    return index_files
 
-print(f'Found {len(index_files)} index databases\n')
 
-total_files = 0
-total_chunks = 0
-dirs_with_chunks = 0
+def open_readonly(db_path: str) -> sqlite3.Connection:
+    """Open a shard read-only; immutable mode skips locking and change detection.
+
+    A non-empty -wal file means committed pages may not be checkpointed yet,
+    and immutable mode would not see them, so such shards use plain mode=ro.
+    """
+    wal_path = db_path + '-wal'
+    immutable = not (os.path.exists(wal_path) and os.path.getsize(wal_path) > 0)
+    uri = Path(db_path).resolve().as_uri() + ('?mode=ro&immutable=1' if immutable else '?mode=ro')
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+
+def shard_signature(db_path: str) -> List[int]:
+    """mtime/size of the shard and its -wal file; any write changes one of them."""
+    signature = []
+    for path in (db_path, db_path + '-wal'):
+        try:
+            st = os.stat(path)
+            signature.extend([st.st_mtime_ns, st.st_size])
+        except OSError:
+            signature.extend([0, 0])
+    return signature
+
+
+def load_manifest(root_dir: str) -> Dict[str, dict]:
+    """Load cached shard counts keyed by path relative to root_dir.
+
+    A missing, unreadable or older-schema manifest yields an empty cache.
+    """
+    try:
+        with open(os.path.join(root_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('schema_version') != MANIFEST_SCHEMA_VERSION:
+        return {}
+    return data.get('shards', {})
+
+
+def save_manifest(root_dir: str, shards: Dict[str, dict]) -> None:
+    """Write the manifest atomically so concurrent readers never see a partial file."""
+    path = os.path.join(root_dir, MANIFEST_NAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'schema_version': MANIFEST_SCHEMA_VERSION, 'shards': shards}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only index roots still get a correct (just uncached) report
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def count_shard(db_path: str) -> ShardCounts:
+    """Count files and semantic chunks in one shard."""
+    counts = ShardCounts(db_path=db_path)
+    try:
+        conn = open_readonly(db_path)
+    except sqlite3.Error as e:
+        counts.error = str(e)
+        return counts
 
-for db_path in sorted(index_files):
-    rel_path = db_path.replace(r'C:\Users\dyw\.codexlens\indexes\D\Claude_dms3\ccw\\', '')
-    conn = sqlite3.connect(db_path)
-    
     try:
-        cursor = conn.execute('SELECT COUNT(*) FROM files')
-        file_count = cursor.fetchone()[0]
-        total_files += file_count
-        
+        counts.file_count = conn.execute('SELECT COUNT(*) FROM files').fetchone()[0]
         try:
-            cursor = conn.execute('SELECT COUNT(*) FROM semantic_chunks')
-            chunk_count = cursor.fetchone()[0]
-            total_chunks += chunk_count
-            
-            if chunk_count > 0:
-                dirs_with_chunks += 1
-                print(f'[+] {rel_path:<40} Files: {file_count:3d}  Chunks: {chunk_count:3d}')
-            else:
-                print(f'[ ] {rel_path:<40} Files: {file_count:3d}  (no chunks)')
+            counts.chunk_count = conn.execute('SELECT COUNT(*) FROM semantic_chunks').fetchone()[0]
         except sqlite3.OperationalError:
-            print(f'[ ] {rel_path:<40} Files: {file_count:3d}  (no semantic_chunks table)')
+            counts.chunk_count = None
     except Exception as e:
-        print(f'[!] {rel_path:<40} Error: {e}')
+        counts.error = str(e)
     finally:
         conn.close()
+    return counts
+
+
+def scan_shards(index_files: List[str], workers: int) -> Iterator[ShardCounts]:
+    """Count shards on a thread pool, yielding each result as soon as it finishes.
+
+    sqlite3 releases the GIL while a query runs, so threads overlap the
+    per-shard open and COUNT(*) I/O.
+    """
+    if workers <= 1:
+        for db_path in index_files:
+            yield count_shard(db_path)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(count_shard, db_path) for db_path in index_files]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def scan_with_manifest(root_dir: str, index_files: List[str], workers: int) -> Iterator[ShardCounts]:
+    """Like scan_shards, but only re-query shards whose signature changed.
+
+    Unchanged shards are answered from the manifest at the index root; the
+    manifest is rewritten (dropping deleted shards) once the scan finishes.
+    """
+    manifest = load_manifest(root_dir)
+    updated: Dict[str, dict] = {}
+    signatures: Dict[str, List[int]] = {}
+    stale: List[str] = []
+
+    for db_path in index_files:
+        rel_path = os.path.relpath(db_path, root_dir)
+        signature = shard_signature(db_path)
+        entry = manifest.get(rel_path)
+        if entry is not None and entry.get('signature') == signature:
+            updated[rel_path] = entry
+            yield ShardCounts(db_path=db_path, file_count=entry['file_count'],
+                              chunk_count=entry['chunk_count'], cached=True)
+        else:
+            signatures[db_path] = signature
+            stale.append(db_path)
+
+    for counts in scan_shards(stale, workers):
+        if counts.error is None:
+            updated[os.path.relpath(counts.db_path, root_dir)] = {
+                'signature': signatures[counts.db_path],
+                'file_count': counts.file_count,
+                'chunk_count': counts.chunk_count,
+            }
+        yield counts
+
+    if updated != manifest:
+        save_manifest(root_dir, updated)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Report embedding coverage across _index.db shards')
+    parser.add_argument('root_dir', nargs='?', default=DEFAULT_ROOT, help='Index root directory')
+    parser.add_argument('--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+                        help='Parallel shard queries (1 = serial)')
+    parser.add_argument('--no-manifest', action='store_true',
+                        help=f'Recount every shard instead of reusing {MANIFEST_NAME}')
+    parser.add_argument('--json', action='store_true', help='Print only a JSON summary')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index_files = find_index_dbs(args.root_dir)
+    if not args.json:
+        print(f'Found {len(index_files)} index databases\n')
+
+    if args.no_manifest:
+        results = scan_shards(index_files, args.workers)
+    else:
+        results = scan_with_manifest(args.root_dir, index_files, args.workers)
+
+    total_files = 0
+    total_chunks = 0
+    dirs_with_chunks = 0
+    shards_cached = 0
+    shards_failed = 0
+
+    for counts in results:
+        rel_path = os.path.relpath(counts.db_path, args.root_dir)
+        if counts.error is not None:
+            shards_failed += 1
+            if not args.json:
+                print(f'[!] {rel_path:<40} Error: {counts.error}')
+            continue
+
+        shards_cached += counts.cached
+        total_files += counts.file_count
+        if counts.chunk_count is None:
+            if not args.json:
+                print(f'[ ] {rel_path:<40} Files: {counts.file_count:3d}  (no semantic_chunks table)')
+            continue
+
+        total_chunks += counts.chunk_count
+        if counts.chunk_count > 0:
+            dirs_with_chunks += 1
+            if not args.json:
+                print(f'[+] {rel_path:<40} Files: {counts.file_count:3d}  Chunks: {counts.chunk_count:3d}')
+        elif not args.json:
+            print(f'[ ] {rel_path:<40} Files: {counts.file_count:3d}  (no chunks)')
+
+    if args.json:
+        print(json.dumps({
+            'total_index_dbs': len(index_files),
+            'dirs_with_embeddings': dirs_with_chunks,
+            'total_files': total_files,
+            'total_chunks': total_chunks,
+            'shards_cached': shards_cached,
+            'shards_requeried': len(index_files) - shards_cached,
+            'shards_failed': shards_failed,
+            'time_ms': round((time.perf_counter() - start) * 1000, 2),
+        }))
+        return 0
+
+    print(f'\n=== Summary ===')
+    print(f'Total index databases: {len(index_files)}')
+    print(f'Directories with embeddings: {dirs_with_chunks}')
+    print(f'Total files indexed: {total_files}')
+    print(f'Total semantic chunks: {total_chunks}')
+    if not args.no_manifest:
+        print(f'Shards re-queried: {len(index_files) - shards_cached} (cached: {shards_cached})')
+    return 0
+
 
-print(f'\n=== Summary ===')
-print(f'Total index databases: {len(index_files)}')
-print(f'Directories with embeddings: {dirs_with_chunks}')
-print(f'Total files indexed: {total_files}')
-print(f'Total semantic chunks: {total_chunks}')
+if __name__ == '__main__':
+    raise SystemExit(main())
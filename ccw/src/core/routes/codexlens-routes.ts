@@ -1,6 +1,6 @@
 /**
  * CodexLens v2 Routes Module
- * Handles CodexLens model management, index operations, env config, and MCP config API endpoints
+ * Handles CodexLens model management, index operations, index watchers, env config, and MCP config API endpoints
  */
 
 import { homedir } from 'os';
@@ -9,6 +9,7 @@ import { join } from 'path';
 import { spawn } from 'child_process';
 
 import type { RouteContext } from './types.js';
+import { CodexLensWatcher, type CodexLensWatcherStatus, type WatchBatch } from '../services/codexlens-watcher.js';
 
 // ========== HELPERS ==========
 
@@ -184,6 +185,75 @@ function normalizeIndexStatus(status: unknown): Record<string, unknown> {
   };
 }
 
+// ========== INDEX WATCHERS ==========
+
+const watchers = new Map<string, CodexLensWatcher>();
+const projectLocks = new Map<string, Promise<unknown>>();
+
+/**
+ * Run index writes for one project one at a time (watcher batches, sync, rebuild)
+ */
+function withProjectLock<T>(projectPath: string, fn: () => Promise<T>): Promise<T> {
+  const previous = projectLocks.get(projectPath) ?? Promise.resolve();
+  const next = previous.then(fn, fn);
+  const settled = next.catch(() => undefined);
+  projectLocks.set(projectPath, settled);
+  void settled.then(() => {
+    if (projectLocks.get(projectPath) === settled) projectLocks.delete(projectPath);
+  });
+  return next;
+}
+
+/**
+ * Apply one coalesced batch of file changes with a whole-project incremental sync
+ */
+async function syncWatchBatch(projectPath: string, batch: WatchBatch): Promise<void> {
+  // codexlens-search has no per-file update, but the sync is hash-incremental, so only
+  // the changed files are re-chunked and re-embedded
+  const result = await withProjectLock(projectPath, () =>
+    spawnCli('codexlens-search', ['--db-path', getProjectDbPath(projectPath), 'sync', '--root', projectPath]),
+  );
+  if (result.exitCode !== 0) {
+    throw new Error(result.stderr || `sync failed for ${batch.paths.length} changed files`);
+  }
+}
+
+function startWatcher(projectPath: string, debounceMs?: number): CodexLensWatcher {
+  const existing = watchers.get(projectPath);
+  if (existing?.running) {
+    // Starting again is how a watcher that gave up after repeated failures is retried
+    if (existing.failed) existing.resume();
+    return existing;
+  }
+  const env = { ...CODEXLENS_ENV_DEFAULTS, ...readEnvFile() };
+  const watcher = new CodexLensWatcher(projectPath, {
+    debounceMs: debounceMs ?? (Number(env.CODEXLENS_WATCHER_DEBOUNCE_MS) || 1000),
+    applyBatch: (batch) => syncWatchBatch(projectPath, batch),
+  });
+  watcher.start();
+  watchers.set(projectPath, watcher);
+  return watcher;
+}
+
+/**
+ * Auto-start the watcher after a sync or rebuild. A watcher that cannot start (e.g. no
+ * recursive fs.watch on this platform) must not turn the finished index write into an error.
+ */
+function autoStartWatcher(projectPath: string): { watcher: CodexLensWatcherStatus | null; watcherError?: string } {
+  if (!autoWatchEnabled()) {
+    return { watcher: watchers.get(projectPath)?.getStatus() ?? null };
+  }
+  try {
+    return { watcher: startWatcher(projectPath).getStatus() };
+  } catch (err) {
+    return { watcher: null, watcherError: (err as Error).message };
+  }
+}
+
+function autoWatchEnabled(): boolean {
+  return readEnvFile().CODEXLENS_AUTO_WATCH === 'true';
+}
+
 // ========== ROUTE HANDLER ==========
 
 /**
@@ -325,11 +395,13 @@ export async function handleCodexLensRoutes(ctx: RouteContext): Promise<boolean>
       }
       try {
         const dbPath = getProjectDbPath(projectPath);
-        const result = await spawnCli('codexlens-search', ['--db-path', dbPath, 'sync', '--root', projectPath]);
+        const result = await withProjectLock(projectPath, () =>
+          spawnCli('codexlens-search', ['--db-path', dbPath, 'sync', '--root', projectPath]),
+        );
         if (result.exitCode !== 0) {
           return { error: result.stderr || 'Failed to sync index', status: 500 };
         }
-        return { success: true, output: result.stdout };
+        return { success: true, output: result.stdout, ...autoStartWatcher(projectPath) };
       } catch (err) {
         return { error: (err as Error).message, status: 500 };
       }
@@ -347,17 +419,41 @@ export async function handleCodexLensRoutes(ctx: RouteContext): Promise<boolean>
       }
       try {
         const dbPath = getProjectDbPath(projectPath);
-        // Rebuild must discard stale index artifacts before reinitializing.
-        rmSync(dbPath, { recursive: true, force: true });
-        const initResult = await spawnCli('codexlens-search', ['--db-path', dbPath, 'init']);
-        if (initResult.exitCode !== 0) {
-          return { error: initResult.stderr || 'Failed to init index', status: 500 };
-        }
-        const syncResult = await spawnCli('codexlens-search', ['--db-path', dbPath, 'sync', '--root', projectPath]);
-        if (syncResult.exitCode !== 0) {
-          return { error: syncResult.stderr || 'Failed to sync after init', status: 500 };
-        }
-        return { success: true, initOutput: initResult.stdout, syncOutput: syncResult.stdout };
+        const outcome = await withProjectLock(projectPath, async () => {
+          // Rebuild must discard stale index artifacts before reinitializing.
+          rmSync(dbPath, { recursive: true, force: true });
+          const initResult = await spawnCli('codexlens-search', ['--db-path', dbPath, 'init']);
+          if (initResult.exitCode !== 0) {
+            return { error: initResult.stderr || 'Failed to init index', status: 500 };
+          }
+          const syncResult = await spawnCli('codexlens-search', ['--db-path', dbPath, 'sync', '--root', projectPath]);
+          if (syncResult.exitCode !== 0) {
+            return { error: syncResult.stderr || 'Failed to sync after init', status: 500 };
+          }
+          return { success: true, initOutput: initResult.stdout, syncOutput: syncResult.stdout };
+        });
+        return 'success' in outcome ? { ...outcome, ...autoStartWatcher(projectPath) } : outcome;
+      } catch (err) {
+        return { error: (err as Error).message, status: 500 };
+      }
+    });
+    return true;
+  }
+
+  // ========== WATCH START ==========
+  // POST /api/codexlens/watch/start
+  if (pathname === '/api/codexlens/watch/start' && req.method === 'POST') {
+    handlePostRequest(req, res, async (body: unknown) => {
+      const { projectPath, debounceMs } = body as { projectPath?: string; debounceMs?: number };
+      if (!projectPath) {
+        return { error: 'projectPath is required', status: 400 };
+      }
+      if (!existsSync(projectPath)) {
+        return { error: `Project path not found: ${projectPath}`, status: 404 };
+      }
+      try {
+        const watcher = startWatcher(projectPath, typeof debounceMs === 'number' ? debounceMs : undefined);
+        return { success: true, watcher: watcher.getStatus() };
       } catch (err) {
         return { error: (err as Error).message, status: 500 };
       }
@@ -365,6 +461,34 @@ export async function handleCodexLensRoutes(ctx: RouteContext): Promise<boolean>
     return true;
   }
 
+  // ========== WATCH STOP ==========
+  // POST /api/codexlens/watch/stop
+  if (pathname === '/api/codexlens/watch/stop' && req.method === 'POST') {
+    handlePostRequest(req, res, async (body: unknown) => {
+      const { projectPath } = body as { projectPath?: string };
+      if (!projectPath) {
+        return { error: 'projectPath is required', status: 400 };
+      }
+      const watcher = watchers.get(projectPath);
+      watcher?.stop();
+      watchers.delete(projectPath);
+      return { success: true, watcher: watcher?.getStatus() ?? null };
+    });
+    return true;
+  }
+
+  // ========== WATCH STATUS ==========
+  // GET /api/codexlens/watch/status?projectPath=
+  if (pathname === '/api/codexlens/watch/status' && req.method === 'GET') {
+    const projectPath = url.searchParams.get('projectPath');
+    const statuses = projectPath
+      ? [watchers.get(projectPath)?.getStatus()].filter(Boolean)
+      : [...watchers.values()].map((w) => w.getStatus());
+    res.writeHead(200, { 'Content-Type': 'application/json' });
+    res.end(JSON.stringify({ success: true, watchers: statuses }));
+    return true;
+  }
+
   // ========== GET ENV ==========
   // GET /api/codexlens/env
   if (pathname === '/api/codexlens/env' && req.method === 'GET') {
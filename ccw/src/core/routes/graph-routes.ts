@@ -6,6 +6,7 @@ import { join, resolve, normalize } from 'path';
 import { existsSync, readdirSync } from 'fs';
 import Database from 'better-sqlite3';
 import { validatePath as validateAllowedPath } from '../../utils/path-validator.js';
+import { ReverseEdgeIndex, type RefreshStats, type ReverseEdgeRow } from '../services/reverse-edge-index.js';
 import type { RouteContext } from './types.js';
 
 /**
@@ -82,9 +83,18 @@ interface GraphEdge {
 
 interface ImpactAnalysis {
   directDependents: string[];
+  /** Dependents reached through other dependents, with their distance from the symbol */
+  transitiveDependents: Array<{ id: string; depth: number }>;
   affectedFiles: string[];
+  maxDepth: number;
+  truncated: boolean;
+  index?: RefreshStats & { cached: boolean };
 }
 
+/** Default and maximum depth of the transitive impact walk */
+const DEFAULT_IMPACT_DEPTH = 3;
+const MAX_IMPACT_DEPTH = 10;
+
 /**
  * Validate and sanitize project path to prevent path traversal attacks
  * @returns sanitized absolute path or null if invalid
@@ -137,6 +147,128 @@ function findAllIndexDbs(dir: string): string[] {
   return dbs;
 }
 
+/**
+ * Shards attached per connection. SQLite allows 10 databases per connection
+ * by default (main included), so groups of 8 leave headroom.
+ */
+const SHARD_GROUP_SIZE = 8;
+
+/**
+ * Cost of reading one query across a tree of per-directory shards
+ */
+interface ShardFanOut {
+  shards: number;
+  groups: number;
+  fallbackShards: number;
+  failedShards: number;
+  openMs: number;
+  queryMs: number;
+}
+
+/**
+ * Run one SELECT across many _index.db shards.
+ * Shards are opened in groups: the first read-only as `main`, the rest ATTACHed
+ * as s1..s7, and the per-shard SELECTs are combined with UNION ALL, so a group
+ * costs one connection and one statement instead of one per shard.
+ * @param dbPaths Shard paths, in the order rows should come back
+ * @param select Builds the SELECT for one schema name (`main`, `s1`, ...)
+ * @param params Bound parameters of one per-shard SELECT (repeated per shard)
+ * @param orderBy Result columns to sort by within each shard
+ * @returns Rows in shard order (each tagged with `_shard`) and the fan-out cost
+ */
+function queryShardTree(
+  dbPaths: string[],
+  select: (schema: string) => string,
+  params: unknown[] = [],
+  orderBy = ''
+): { rows: any[]; fanOut: ShardFanOut } {
+  const rows: any[] = [];
+  const fanOut: ShardFanOut = { shards: dbPaths.length, groups: 0, fallbackShards: 0, failedShards: 0, openMs: 0, queryMs: 0 };
+  const order = orderBy ? `_shard, ${orderBy}` : '_shard';
+
+  for (let offset = 0; offset < dbPaths.length; offset += SHARD_GROUP_SIZE) {
+    const group = dbPaths.slice(offset, offset + SHARD_GROUP_SIZE);
+    fanOut.groups++;
+
+    let db: Database.Database | null = null;
+    try {
+      let start = performance.now();
+      // Attached databases inherit the read-only flag of the main connection
+      db = Database(group[0], { readonly: true, fileMustExist: true });
+      const schemas = ['main'];
+      for (let i = 1; i < group.length; i++) {
+        db.prepare(`ATTACH DATABASE ? AS s${i}`).run(group[i]);
+        schemas.push(`s${i}`);
+      }
+      fanOut.openMs += performance.now() - start;
+
+      start = performance.now();
+      const union = schemas
+        .map((schema, i) => `SELECT ${offset + i} AS _shard, * FROM (${select(schema)})`)
+        .join('\nUNION ALL\n');
+      rows.push(...db.prepare(`SELECT * FROM (${union}) ORDER BY ${order}`).all(...schemas.flatMap(() => params)));
+      fanOut.queryMs += performance.now() - start;
+    } catch (err) {
+      // One shard with a missing table or a bad file fails the whole union;
+      // fall back to querying this group one shard at a time
+      const message = err instanceof Error ? err.message : String(err);
+      console.error(`[Graph] Grouped query failed (${message}), retrying ${group.length} shards one by one`);
+      fanOut.fallbackShards += group.length;
+      group.forEach((dbPath, i) => {
+        try {
+          const start = performance.now();
+          const shardDb = Database(dbPath, { readonly: true, fileMustExist: true });
+          try {
+            rows.push(...shardDb.prepare(
+              `SELECT ${offset + i} AS _shard, * FROM (${select('main')}) ORDER BY ${order}`
+            ).all(...params));
+          } finally {
+            shardDb.close();
+          }
+          fanOut.queryMs += performance.now() - start;
+        } catch (shardErr) {
+          const shardMessage = shardErr instanceof Error ? shardErr.message : String(shardErr);
+          console.error(`[Graph] Failed to query ${dbPath}: ${shardMessage}`);
+          fanOut.failedShards++;
+        }
+      });
+    } finally {
+      db?.close();
+    }
+  }
+
+  fanOut.openMs = Math.round(fanOut.openMs * 100) / 100;
+  fanOut.queryMs = Math.round(fanOut.queryMs * 100) / 100;
+  return { rows, fanOut };
+}
+
+/**
+ * Build the shared file/module LIKE filter used by the graph queries
+ */
+function buildPathFilter(fileFilter?: string, moduleFilter?: string): { whereClause: string; params: string[] } {
+  if (fileFilter) {
+    return { whereClause: 'WHERE f.full_path LIKE ?', params: [`%${sanitizeForLike(fileFilter)}%`] };
+  }
+  if (moduleFilter) {
+    return { whereClause: 'WHERE f.full_path LIKE ?', params: [`${sanitizeForLike(moduleFilter)}%`] };
+  }
+  return { whereClause: '', params: [] };
+}
+
+/**
+ * Locate every shard under the index directory of projectPath
+ */
+function findProjectIndexDbs(projectPath: string): string[] {
+  const mapper = new PathMapper();
+  const rootDbPath = mapper.sourceToIndexDb(projectPath);
+  const indexRoot = rootDbPath.replace(/[\\/]_index\.db$/, '');
+
+  if (!existsSync(indexRoot)) {
+    return [];
+  }
+  return findAllIndexDbs(indexRoot);
+}
+
 /**
  * Map codex-lens symbol kinds to graph node types
  * Returns null for non-code symbols (markdown headings, etc.)
@@ -185,80 +317,38 @@ function mapRelationType(relType: string): string {
  * @param fileFilter Optional file path filter (supports wildcards)
  * @param moduleFilter Optional module/directory filter
  */
-async function querySymbols(projectPath: string, fileFilter?: string, moduleFilter?: string): Promise<GraphNode[]> {
-  const mapper = new PathMapper();
-  const rootDbPath = mapper.sourceToIndexDb(projectPath);
-  const indexRoot = rootDbPath.replace(/[\\/]_index\.db$/, '');
-
-  if (!existsSync(indexRoot)) {
-    return [];
-  }
-
-  // Find all _index.db files recursively
-  const dbPaths = findAllIndexDbs(indexRoot);
-
-  if (dbPaths.length === 0) {
-    return [];
-  }
-
-  const allNodes: GraphNode[] = [];
-
-  for (const dbPath of dbPaths) {
-    try {
-      const db = Database(dbPath, { readonly: true });
-
-      // Build WHERE clause for filtering
-      let whereClause = '';
-      const params: string[] = [];
-
-      if (fileFilter) {
-        const sanitized = sanitizeForLike(fileFilter);
-        whereClause = 'WHERE f.full_path LIKE ?';
-        params.push(`%${sanitized}%`);
-      } else if (moduleFilter) {
-        const sanitized = sanitizeForLike(moduleFilter);
-        whereClause = 'WHERE f.full_path LIKE ?';
-        params.push(`${sanitized}%`);
-      }
-
-      const query = `
-        SELECT
-          s.id,
-          s.name,
-          s.kind,
-          s.start_line,
-          f.full_path as file
-        FROM symbols s
-        JOIN files f ON s.file_id = f.id
-        ${whereClause}
-        ORDER BY f.full_path, s.start_line
-      `;
-
-      const rows = params.length > 0 ? db.prepare(query).all(...params) : db.prepare(query).all();
-
-      db.close();
-
-      // Filter out non-code symbols (markdown headings, etc.)
-      rows.forEach((row: any) => {
-        const type = mapSymbolKind(row.kind);
-        if (type !== null) {
-          allNodes.push({
-            id: `${row.file}:${row.name}:${row.start_line}`,
-            name: row.name,
-            type,
-            file: row.file,
-            line: row.start_line,
-          });
-        }
+async function querySymbols(projectPath: string, fileFilter?: string, moduleFilter?: string): Promise<{ nodes: GraphNode[]; fanOut: ShardFanOut }> {
+  const dbPaths = findProjectIndexDbs(projectPath);
+  const { whereClause, params } = buildPathFilter(fileFilter, moduleFilter);
+
+  const { rows, fanOut } = queryShardTree(dbPaths, (schema) => `
+    SELECT
+      s.id,
+      s.name,
+      s.kind,
+      s.start_line,
+      f.full_path as file
+    FROM ${schema}.symbols s
+    JOIN ${schema}.files f ON s.file_id = f.id
+    ${whereClause}
+  `, params, 'file, start_line');
+
+  const nodes: GraphNode[] = [];
+  // Filter out non-code symbols (markdown headings, etc.)
+  rows.forEach((row: any) => {
+    const type = mapSymbolKind(row.kind);
+    if (type !== null) {
+      nodes.push({
+        id: `${row.file}:${row.name}:${row.start_line}`,
+        name: row.name,
+        type,
+        file: row.file,
+        line: row.start_line,
       });
-    } catch (err) {
-      const message = err instanceof Error ? err.message : String(err);
-      console.error(`[Graph] Failed to query symbols from ${dbPath}: ${message}`);
-      // Continue with other databases even if one fails
     }
-  }
+  });
 
-  return allNodes;
+  return { nodes, fanOut };
 }
 
 /**
@@ -267,76 +357,33 @@ async function querySymbols(projectPath: string, fileFilter?: string, moduleFilt
  * @param fileFilter Optional file path filter (supports wildcards)
  * @param moduleFilter Optional module/directory filter
  */
-async function queryRelationships(projectPath: string, fileFilter?: string, moduleFilter?: string): Promise<GraphEdge[]> {
-  const mapper = new PathMapper();
-  const rootDbPath = mapper.sourceToIndexDb(projectPath);
-  const indexRoot = rootDbPath.replace(/[\\/]_index\.db$/, '');
-
-  if (!existsSync(indexRoot)) {
-    return [];
-  }
-
-  // Find all _index.db files recursively
-  const dbPaths = findAllIndexDbs(indexRoot);
-
-  if (dbPaths.length === 0) {
-    return [];
-  }
-
-  const allEdges: GraphEdge[] = [];
-
-  for (const dbPath of dbPaths) {
-    try {
-      const db = Database(dbPath, { readonly: true });
-
-      // Build WHERE clause for filtering
-      let whereClause = '';
-      const params: string[] = [];
-
-      if (fileFilter) {
-        const sanitized = sanitizeForLike(fileFilter);
-        whereClause = 'WHERE f.full_path LIKE ?';
-        params.push(`%${sanitized}%`);
-      } else if (moduleFilter) {
-        const sanitized = sanitizeForLike(moduleFilter);
-        whereClause = 'WHERE f.full_path LIKE ?';
-        params.push(`${sanitized}%`);
-      }
-
-      const query = `
-        SELECT
-          s.name as source_name,
-          s.start_line as source_line,
-          f.full_path as source_file,
-          r.target_qualified_name,
-          r.relationship_type,
-          r.target_file
-        FROM code_relationships r
-        JOIN symbols s ON r.source_symbol_id = s.id
-        JOIN files f ON s.file_id = f.id
-        ${whereClause}
-        ORDER BY f.full_path, s.start_line
-      `;
-
-      const rows = params.length > 0 ? db.prepare(query).all(...params) : db.prepare(query).all();
-
-      db.close();
-
-      allEdges.push(...rows.map((row: any) => ({
-        source: `${row.source_file}:${row.source_name}:${row.source_line}`,
-        target: row.target_qualified_name,
-        type: mapRelationType(row.relationship_type),
-        sourceLine: row.source_line,
-        sourceFile: row.source_file,
-      })));
-    } catch (err) {
-      const message = err instanceof Error ? err.message : String(err);
-      console.error(`[Graph] Failed to query relationships from ${dbPath}: ${message}`);
-      // Continue with other databases even if one fails
-    }
-  }
-
-  return allEdges;
+async function queryRelationships(projectPath: string, fileFilter?: string, moduleFilter?: string): Promise<{ edges: GraphEdge[]; fanOut: ShardFanOut }> {
+  const dbPaths = findProjectIndexDbs(projectPath);
+  const { whereClause, params } = buildPathFilter(fileFilter, moduleFilter);
+
+  const { rows, fanOut } = queryShardTree(dbPaths, (schema) => `
+    SELECT
+      s.name as source_name,
+      s.start_line as source_line,
+      f.full_path as source_file,
+      r.target_qualified_name,
+      r.relationship_type,
+      r.target_file
+    FROM ${schema}.code_relationships r
+    JOIN ${schema}.symbols s ON r.source_symbol_id = s.id
+    JOIN ${schema}.files f ON s.file_id = f.id
+    ${whereClause}
+  `, params, 'source_file, source_line');
+
+  const edges = rows.map((row: any) => ({
+    source: `${row.source_file}:${row.source_name}:${row.source_line}`,
+    target: row.target_qualified_name,
+    type: mapRelationType(row.relationship_type),
+    sourceLine: row.source_line,
+    sourceFile: row.source_file,
+  }));
+
+  return { edges, fanOut };
 }
 
 /**
@@ -375,59 +422,80 @@ function parseSymbolId(symbolId: string): string | null {
   return sanitized.trim() || null;
 }
 
+/**
+ * Reverse-edge indexes by index root, refreshed from shard mtimes on each use
+ */
+const reverseEdgeIndexes = new Map<string, ReverseEdgeIndex>();
+
+/**
+ * Read the code_relationships edges of the given shards
+ */
+function loadReverseEdges(dbPaths: string[]): ReverseEdgeRow[] {
+  const { rows } = queryShardTree(dbPaths, (schema) => `
+    SELECT
+      s.name as source_name,
+      s.start_line as source_line,
+      f.full_path as source_file,
+      r.target_qualified_name,
+      r.relationship_type
+    FROM ${schema}.code_relationships r
+    JOIN ${schema}.symbols s ON r.source_symbol_id = s.id
+    JOIN ${schema}.files f ON s.file_id = f.id
+  `);
+  return rows.map((row: any) => ({
+    shard: dbPaths[row._shard],
+    sourceName: row.source_name,
+    sourceFile: row.source_file,
+    sourceLine: row.source_line,
+    target: row.target_qualified_name,
+    relationshipType: mapRelationType(row.relationship_type),
+  }));
+}
+
 /**
  * Perform impact analysis for a symbol
- * Find all symbols that depend on this symbol (direct and transitive)
+ * Find all symbols that depend on this symbol (direct and transitive, up to maxDepth levels),
+ * across every shard of the project, through the reverse-edge index
  */
-async function analyzeImpact(projectPath: string, symbolId: string): Promise<ImpactAnalysis> {
-  const mapper = new PathMapper();
-  const dbPath = mapper.sourceToIndexDb(projectPath);
+async function analyzeImpact(projectPath: string, symbolId: string, maxDepth = DEFAULT_IMPACT_DEPTH): Promise<ImpactAnalysis> {
+  const empty: ImpactAnalysis = { directDependents: [], transitiveDependents: [], affectedFiles: [], maxDepth, truncated: false };
+  const dbPaths = findProjectIndexDbs(projectPath);
 
-  if (!existsSync(dbPath)) {
-    return { directDependents: [], affectedFiles: [] };
+  if (dbPaths.length === 0) {
+    return empty;
   }
 
   // Parse and validate symbol ID
   const symbolName = parseSymbolId(symbolId);
   if (!symbolName) {
     console.error(`[Graph] Invalid symbol ID format: ${symbolId}`);
-    return { directDependents: [], affectedFiles: [] };
+    return empty;
   }
 
   try {
-    const db = Database(dbPath, { readonly: true });
-
-    // Sanitize for LIKE query to prevent injection via special characters
-    const sanitizedName = sanitizeForLike(symbolName);
-
-    // Find all symbols that reference this symbol
-    const rows = db.prepare(`
-      SELECT DISTINCT
-        s.name as dependent_name,
-        f.full_path as dependent_file,
-        s.start_line as dependent_line
-      FROM code_relationships r
-      JOIN symbols s ON r.source_symbol_id = s.id
-      JOIN files f ON s.file_id = f.id
-      WHERE r.target_qualified_name LIKE ?
-    `).all(`%${sanitizedName}%`);
-
-    db.close();
-
-    const directDependents = rows.map((row: any) =>
-      `${row.dependent_file}:${row.dependent_name}:${row.dependent_line}`
-    );
+    const indexRoot = new PathMapper().sourceToIndexDb(projectPath);
+    let index = reverseEdgeIndexes.get(indexRoot);
+    if (!index) {
+      index = new ReverseEdgeIndex({ loadEdges: loadReverseEdges });
+      reverseEdgeIndexes.set(indexRoot, index);
+    }
 
-    const affectedFiles = [...new Set(rows.map((row: any) => row.dependent_file))];
+    // Only shards rewritten since the last request are re-read
+    const refresh = index.refresh(dbPaths);
+    const closure = index.closure(symbolName, maxDepth);
 
     return {
-      directDependents,
-      affectedFiles,
+      directDependents: (closure.levels[0] ?? []).map((dep) => dep.id),
+      transitiveDependents: closure.levels.slice(1).flatMap((level, i) => level.map((dep) => ({ id: dep.id, depth: i + 2 }))),
+      affectedFiles: closure.affectedFiles,
+      maxDepth,
+      truncated: closure.truncated,
+      index: { ...refresh, cached: closure.cached },
     };
   } catch (err) {
     const message = err instanceof Error ? err.message : String(err);
     console.error(`[Graph] Failed to analyze impact: ${message}`);
-    return { directDependents: [], affectedFiles: [] };
+    return empty;
   }
 }
 
@@ -456,7 +524,7 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
     const projectPath = projectPathResult.path;
 
     try {
-      const allNodes = await querySymbols(projectPath, fileFilter, moduleFilter);
+      const { nodes: allNodes, fanOut } = await querySymbols(projectPath, fileFilter, moduleFilter);
       const nodes = allNodes.slice(0, limit);
       res.writeHead(200, { 'Content-Type': 'application/json' });
       res.end(JSON.stringify({
@@ -464,7 +532,8 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
         total: allNodes.length,
         limit,
         hasMore: allNodes.length > limit,
-        filters: { file: fileFilter, module: moduleFilter }
+        filters: { file: fileFilter, module: moduleFilter },
+        fanOut
       }));
     } catch (err) {
       console.error(`[Graph] Error fetching nodes:`, err);
@@ -492,7 +561,7 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
     const projectPath = projectPathResult.path;
 
     try {
-      const allEdges = await queryRelationships(projectPath, fileFilter, moduleFilter);
+      const { edges: allEdges, fanOut } = await queryRelationships(projectPath, fileFilter, moduleFilter);
       const edges = allEdges.slice(0, limit);
       res.writeHead(200, { 'Content-Type': 'application/json' });
       res.end(JSON.stringify({
@@ -500,7 +569,8 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
         total: allEdges.length,
         limit,
         hasMore: allEdges.length > limit,
-        filters: { file: fileFilter, module: moduleFilter }
+        filters: { file: fileFilter, module: moduleFilter },
+        fanOut
       }));
     } catch (err) {
       console.error(`[Graph] Error fetching edges:`, err);
@@ -524,48 +594,28 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
     const projectPath = projectPathResult.path;
 
     try {
-      const mapper = new PathMapper();
-      const rootDbPath = mapper.sourceToIndexDb(projectPath);
-      const indexRoot = rootDbPath.replace(/[\\/]_index\.db$/, '');
-
-      if (!existsSync(indexRoot)) {
-        res.writeHead(200, { 'Content-Type': 'application/json' });
-        res.end(JSON.stringify({ files: [], modules: [] }));
-        return true;
-      }
-
-      const dbPaths = findAllIndexDbs(indexRoot);
+      const dbPaths = findProjectIndexDbs(projectPath);
       const filesSet = new Set<string>();
       const modulesSet = new Set<string>();
 
-      for (const dbPath of dbPaths) {
-        try {
-          const db = Database(dbPath, { readonly: true });
-          const rows = db.prepare(`SELECT DISTINCT full_path FROM files`).all();
-          db.close();
-
-          rows.forEach((row: any) => {
-            const filePath = row.full_path;
-            filesSet.add(filePath);
-
-            // Extract module path (directory)
-            const lastSlash = Math.max(filePath.lastIndexOf('/'), filePath.lastIndexOf('\\'));
-            if (lastSlash > 0) {
-              const modulePath = filePath.substring(0, lastSlash);
-              modulesSet.add(modulePath);
-            }
-          });
-        } catch (err) {
-          const message = err instanceof Error ? err.message : String(err);
-          console.error(`[Graph] Failed to query files from ${dbPath}: ${message}`);
+      const { rows, fanOut } = queryShardTree(dbPaths, (schema) => `SELECT DISTINCT full_path FROM ${schema}.files`);
+      rows.forEach((row: any) => {
+        const filePath = row.full_path;
+        filesSet.add(filePath);
+
+        // Extract module path (directory)
+        const lastSlash = Math.max(filePath.lastIndexOf('/'), filePath.lastIndexOf('\\'));
+        if (lastSlash > 0) {
+          const modulePath = filePath.substring(0, lastSlash);
+          modulesSet.add(modulePath);
         }
-      }
+      });
 
       const files = Array.from(filesSet).sort();
       const modules = Array.from(modulesSet).sort();
 
       res.writeHead(200, { 'Content-Type': 'application/json' });
-      res.end(JSON.stringify({ files, modules }));
+      res.end(JSON.stringify({ files, modules, fanOut }));
     } catch (err) {
       console.error(`[Graph] Error fetching files:`, err);
       res.writeHead(500, { 'Content-Type': 'application/json' });
@@ -579,6 +629,8 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
     const rawPath = url.searchParams.get('path') || initialPath;
     const projectPathResult = await validateProjectPath(rawPath, initialPath);
     const symbolId = url.searchParams.get('symbol');
+    const depthStr = url.searchParams.get('depth');
+    const depth = Math.min(Math.max(parseInt(depthStr || '', 10) || DEFAULT_IMPACT_DEPTH, 1), MAX_IMPACT_DEPTH);
 
     if (projectPathResult.path === null) {
       res.writeHead(projectPathResult.status, { 'Content-Type': 'application/json' });
@@ -595,7 +647,7 @@ export async function handleGraphRoutes(ctx: RouteContext): Promise<boolean> {
     }
 
     try {
-      const impact = await analyzeImpact(projectPath, symbolId);
+      const impact = await analyzeImpact(projectPath, symbolId, depth);
       res.writeHead(200, { 'Content-Type': 'application/json' });
       res.end(JSON.stringify(impact));
     } catch (err) {
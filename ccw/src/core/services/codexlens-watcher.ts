@@ -0,0 +1,309 @@
+/**
+ * CodexLens Index Watcher
+ *
+ * Watches a project tree and turns bursts of filesystem events (git
+ * checkout, formatter runs, bulk renames) into a few batched index updates
+ * instead of one sync per event or a manual full rescan.
+ *
+ * - Events are coalesced per path while a batch is pending.
+ * - A batch is flushed once no event arrived for `debounceMs`, or once the
+ *   oldest pending event is `maxWaitMs` old, so a steady event stream
+ *   cannot postpone indexing forever.
+ * - Only one batch runs at a time; events arriving meanwhile form the next
+ *   batch.
+ * - A failed batch is re-queued and retried with exponential backoff
+ *   (`retryBaseMs` doubling up to `retryMaxMs`). After `maxRetries`
+ *   consecutive failures the watcher stops retrying and reports `failed`
+ *   until `resume()` is called; events keep being queued meanwhile.
+ *
+ * Each batch is applied as one whole-project incremental sync (codexlens
+ * has no per-file update command), so a batch's paths say what triggered
+ * the sync, not which shards it touched.
+ *
+ * Queue depth, lag and retry state are exposed through `getStatus()` so the
+ * dashboard can show how far the index trails the working tree.
+ */
+
+import { watch, type FSWatcher } from 'fs';
+import { isAbsolute, relative, sep } from 'path';
+
+export interface WatchBatch {
+  /** Project-relative paths (forward slashes) touched since the last batch */
+  paths: string[];
+  /** Epoch ms of the oldest event in the batch */
+  firstEventAt: number;
+}
+
+export type CodexLensWatcherState = 'idle' | 'pending' | 'running' | 'backoff' | 'failed';
+
+export interface CodexLensWatcherOptions {
+  debounceMs?: number;
+  maxWaitMs?: number;
+  /** Delay before the first retry of a failed batch; doubles per consecutive failure */
+  retryBaseMs?: number;
+  /** Upper bound on the retry delay */
+  retryMaxMs?: number;
+  /** Consecutive failures after which retries stop until resume() */
+  maxRetries?: number;
+  /** Path segments whose events are dropped (index output, VCS metadata, dependencies) */
+  ignore?: string[];
+  applyBatch: (batch: WatchBatch) => Promise<void>;
+}
+
+export interface CodexLensWatcherStatus {
+  projectPath: string;
+  running: boolean;
+  state: CodexLensWatcherState;
+  debounceMs: number;
+  maxWaitMs: number;
+  queueDepth: number;
+  inFlight: number;
+  lagMs: number;
+  eventsSeen: number;
+  eventsCoalesced: number;
+  eventsIgnored: number;
+  batchesRun: number;
+  batchesFailed: number;
+  consecutiveFailures: number;
+  /** Epoch ms of the next retry while in backoff */
+  nextRetryAt: number | null;
+  /** Changed paths that triggered the last sync (which always covers the whole project) */
+  lastBatchSize: number;
+  lastBatchMs: number;
+  lastBatchLagMs: number;
+  lastBatchAt: number | null;
+  lastError: string | null;
+}
+
+export const DEFAULT_WATCH_IGNORE = ['.git', '.codexlens', 'node_modules', '.venv', '__pycache__', 'dist', '.ccw'];
+
+export class CodexLensWatcher {
+  readonly projectPath: string;
+  private readonly debounceMs: number;
+  private readonly maxWaitMs: number;
+  private readonly retryBaseMs: number;
+  private readonly retryMaxMs: number;
+  private readonly maxRetries: number;
+  private readonly ignore: Set<string>;
+  private readonly applyBatch: (batch: WatchBatch) => Promise<void>;
+
+  private watcher: FSWatcher | null = null;
+  private timer: NodeJS.Timeout | null = null;
+  private pending = new Map<string, number>();
+  private oldestPendingAt: number | null = null;
+  private inFlight: WatchBatch | null = null;
+  private consecutiveFailures = 0;
+  private retryAt: number | null = null;
+  private idleWaiters: Array<() => void> = [];
+
+  private counters = {
+    eventsSeen: 0,
+    eventsCoalesced: 0,
+    eventsIgnored: 0,
+    batchesRun: 0,
+    batchesFailed: 0,
+    lastBatchSize: 0,
+    lastBatchMs: 0,
+    lastBatchLagMs: 0,
+    lastBatchAt: null as number | null,
+    lastError: null as string | null,
+  };
+
+  constructor(projectPath: string, options: CodexLensWatcherOptions) {
+    this.projectPath = projectPath;
+    this.debounceMs = Math.max(0, options.debounceMs ?? 1000);
+    this.maxWaitMs = Math.max(this.debounceMs, options.maxWaitMs ?? this.debounceMs * 10);
+    this.retryBaseMs = Math.max(1, options.retryBaseMs ?? Math.max(this.debounceMs, 1000));
+    this.retryMaxMs = Math.max(this.retryBaseMs, options.retryMaxMs ?? 5 * 60 * 1000);
+    this.maxRetries = Math.max(0, options.maxRetries ?? 8);
+    this.ignore = new Set(options.ignore ?? DEFAULT_WATCH_IGNORE);
+    this.applyBatch = options.applyBatch;
+  }
+
+  /**
+   * Subscribe to recursive filesystem events under the project root.
+   */
+  start(): void {
+    if (this.watcher) return;
+    this.watcher = watch(this.projectPath, { recursive: true }, (_eventType, filename) => {
+      if (filename) {
+        this.enqueue(filename.toString());
+      }
+    });
+    this.watcher.on('error', (err: Error) => {
+      this.counters.lastError = err.message;
+    });
+    this.watcher.unref?.();
+  }
+
+  /**
+   * Stop watching; pending events are dropped, a running batch finishes.
+   */
+  stop(): void {
+    this.watcher?.close();
+    this.watcher = null;
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    this.pending.clear();
+    this.oldestPendingAt = null;
+    this.notifyIdle();
+  }
+
+  get running(): boolean {
+    return this.watcher !== null;
+  }
+
+  /**
+   * True once maxRetries consecutive batches failed; nothing runs until resume().
+   */
+  get failed(): boolean {
+    return this.consecutiveFailures > this.maxRetries;
+  }
+
+  /**
+   * Clear the failure state and retry the queued paths after the usual debounce.
+   */
+  resume(): void {
+    this.consecutiveFailures = 0;
+    this.retryAt = null;
+    if (this.pending.size > 0 && this.running) {
+      this.schedule(Date.now());
+    }
+  }
+
+  /**
+   * Record a change to a path (absolute or project-relative).
+   */
+  enqueue(filePath: string): void {
+    const rel = (isAbsolute(filePath) ? relative(this.projectPath, filePath) : filePath).split(sep).join('/');
+    this.counters.eventsSeen++;
+    if (!rel || rel.startsWith('../') || rel.split('/').some((part) => this.ignore.has(part))) {
+      this.counters.eventsIgnored++;
+      return;
+    }
+
+    const now = Date.now();
+    if (this.pending.has(rel)) {
+      this.counters.eventsCoalesced++;
+    } else {
+      this.pending.set(rel, now);
+    }
+    this.oldestPendingAt ??= now;
+    this.schedule(now);
+  }
+
+  private schedule(now: number): void {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    if (this.failed) return;
+    const untilMaxWait = (this.oldestPendingAt ?? now) + this.maxWaitMs - now;
+    // New events must not cut a retry backoff short
+    const untilRetry = this.retryAt === null ? 0 : this.retryAt - now;
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      void this.flush();
+    }, Math.max(0, untilRetry, Math.min(this.debounceMs, untilMaxWait)));
+  }
+
+  /**
+   * Run the pending events as one batch now, even during backoff (no-op if empty or
+   * a batch is running; the running batch reschedules the rest when it finishes).
+   */
+  async flush(): Promise<void> {
+    if (this.inFlight || this.pending.size === 0) {
+      if (!this.inFlight) this.notifyIdle();
+      return;
+    }
+
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    const paths = [...this.pending.keys()].sort();
+    const batch: WatchBatch = {
+      paths,
+      firstEventAt: this.oldestPendingAt ?? Date.now(),
+    };
+    this.pending.clear();
+    this.oldestPendingAt = null;
+    this.inFlight = batch;
+
+    const start = Date.now();
+    try {
+      await this.applyBatch(batch);
+      this.counters.lastError = null;
+      this.consecutiveFailures = 0;
+      this.retryAt = null;
+    } catch (err) {
+      this.counters.batchesFailed++;
+      this.counters.lastError = (err as Error).message;
+      this.consecutiveFailures++;
+      const delay = Math.min(this.retryMaxMs, this.retryBaseMs * 2 ** (this.consecutiveFailures - 1));
+      this.retryAt = this.failed ? null : Date.now() + delay;
+      // Put the paths back so the next batch retries them
+      for (const p of batch.paths) {
+        if (!this.pending.has(p)) this.pending.set(p, batch.firstEventAt);
+      }
+      this.oldestPendingAt = Math.min(this.oldestPendingAt ?? batch.firstEventAt, batch.firstEventAt);
+    } finally {
+      const end = Date.now();
+      this.inFlight = null;
+      this.counters.batchesRun++;
+      this.counters.lastBatchSize = batch.paths.length;
+      this.counters.lastBatchMs = end - start;
+      this.counters.lastBatchLagMs = end - batch.firstEventAt;
+      this.counters.lastBatchAt = end;
+    }
+
+    if (this.pending.size > 0 && this.running && !this.failed) {
+      this.schedule(Date.now());
+    } else {
+      this.notifyIdle();
+    }
+  }
+
+  /**
+   * Resolve once nothing is pending or running (for tests and shutdown).
+   */
+  whenIdle(): Promise<void> {
+    if (!this.inFlight && (this.pending.size === 0 || this.failed)) {
+      return Promise.resolve();
+    }
+    return new Promise((resolve) => this.idleWaiters.push(resolve));
+  }
+
+  private notifyIdle(): void {
+    if (this.inFlight || (this.pending.size > 0 && !this.failed)) return;
+    const waiters = this.idleWaiters;
+    this.idleWaiters = [];
+    waiters.forEach((resolve) => resolve());
+  }
+
+  private get state(): CodexLensWatcherState {
+    if (this.inFlight) return 'running';
+    if (this.failed) return 'failed';
+    if (this.retryAt !== null && this.pending.size > 0) return 'backoff';
+    return this.pending.size > 0 ? 'pending' : 'idle';
+  }
+
+  getStatus(): CodexLensWatcherStatus {
+    const oldest = this.inFlight?.firstEventAt ?? this.oldestPendingAt;
+    return {
+      projectPath: this.projectPath,
+      running: this.running,
+      state: this.state,
+      debounceMs: this.debounceMs,
+      maxWaitMs: this.maxWaitMs,
+      queueDepth: this.pending.size,
+      inFlight: this.inFlight?.paths.length ?? 0,
+      lagMs: oldest === null ? 0 : Date.now() - oldest,
+      consecutiveFailures: this.consecutiveFailures,
+      nextRetryAt: this.state === 'backoff' ? this.retryAt : null,
+      ...this.counters,
+    };
+  }
+}
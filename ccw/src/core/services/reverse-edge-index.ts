@@ -0,0 +1,308 @@
+/**
+ * Reverse-Edge Index for impact analysis
+ *
+ * Maps a normalized target name to the symbols that reference it, across
+ * every `_index.db` shard of a project, so "who depends on X" is a map
+ * lookup instead of a `LIKE '%X%'` scan of `code_relationships`.
+ *
+ * - Each edge is keyed by its normalized qualified name (`pkg.mod.fn`) and
+ *   by its last segment (`fn`), so both forms of a symbol ID resolve.
+ * - `refresh()` stats the shards and re-reads only those whose mtime or
+ *   size changed (the indexer rewrote them) or that appeared; edges of
+ *   removed shards are dropped.
+ * - `closure()` walks dependents breadth-first up to a depth limit. Results
+ *   are cached until the next refresh that changes a shard.
+ */
+
+import { statSync } from 'fs';
+
+/** One `code_relationships` row joined with its source symbol */
+export interface ReverseEdgeRow {
+  shard: string;
+  sourceName: string;
+  sourceFile: string;
+  sourceLine: number;
+  target: string;
+  relationshipType: string;
+}
+
+export interface Dependent {
+  id: string;
+  name: string;
+  file: string;
+  line: number;
+  type: string;
+}
+
+export interface ImpactClosure {
+  /** Dependents per depth; `levels[0]` are the direct dependents */
+  levels: Dependent[][];
+  affectedFiles: string[];
+  maxDepth: number;
+  /** True when the depth or node limit stopped the walk with dependents left */
+  truncated: boolean;
+  cached: boolean;
+}
+
+export interface RefreshStats {
+  shards: number;
+  changedShards: number;
+  removedShards: number;
+  edges: number;
+  loadMs: number;
+}
+
+export interface ReverseEdgeIndexOptions {
+  /** Read the edges of the given shards (called only for changed shards) */
+  loadEdges: (dbPaths: string[]) => ReverseEdgeRow[];
+  /** Upper bound on dependents returned by one closure (wide graphs) */
+  maxNodes?: number;
+  /** Closures kept in the cache */
+  cacheSize?: number;
+}
+
+interface ShardState {
+  mtimeMs: number;
+  size: number;
+  keys: Set<string>;
+  edges: number;
+}
+
+/**
+ * Normalize a qualified name: drop call parens and generics, unify
+ * `::`, `/`, `\` and `#` separators to `.`, lower-case.
+ */
+export function normalizeTargetName(name: string): string {
+  return name
+    .trim()
+    .replace(/\(.*\)$/, '')
+    .replace(/<[^<>]*>/g, '')
+    .replace(/::|[/\\#]/g, '.')
+    .replace(/\.+/g, '.')
+    .replace(/^\.|\.$/g, '')
+    .toLowerCase();
+}
+
+/**
+ * Keys an edge target is indexed under: the full normalized name and its last segment
+ */
+export function targetKeys(name: string): string[] {
+  const full = normalizeTargetName(name);
+  if (!full) return [];
+  const last = full.slice(full.lastIndexOf('.') + 1);
+  return last === full ? [full] : [full, last];
+}
+
+function shardStat(dbPath: string): { mtimeMs: number; size: number } | null {
+  try {
+    const main = statSync(dbPath);
+    let mtimeMs = main.mtimeMs;
+    let size = main.size;
+    try {
+      // Writes in WAL mode land in the -wal file until a checkpoint
+      const wal = statSync(`${dbPath}-wal`);
+      mtimeMs = Math.max(mtimeMs, wal.mtimeMs);
+      size += wal.size;
+    } catch {
+      // No WAL file
+    }
+    return { mtimeMs, size };
+  } catch {
+    return null;
+  }
+}
+
+export class ReverseEdgeIndex {
+  private readonly loadEdges: (dbPaths: string[]) => ReverseEdgeRow[];
+  private readonly maxNodes: number;
+  private readonly cacheSize: number;
+
+  private shards = new Map<string, ShardState>();
+  /** key -> shard -> dependents */
+  private byTarget = new Map<string, Map<string, Dependent[]>>();
+  private closures = new Map<string, ImpactClosure>();
+  private edgeCount = 0;
+
+  constructor(options: ReverseEdgeIndexOptions) {
+    this.loadEdges = options.loadEdges;
+    this.maxNodes = options.maxNodes ?? 10000;
+    this.cacheSize = options.cacheSize ?? 256;
+  }
+
+  /**
+   * Bring the index in line with the shards on disk.
+   */
+  refresh(dbPaths: string[]): RefreshStats {
+    const start = performance.now();
+    const current = new Set(dbPaths);
+    let removedShards = 0;
+    for (const dbPath of [...this.shards.keys()]) {
+      if (!current.has(dbPath)) {
+        this.dropShard(dbPath);
+        removedShards++;
+      }
+    }
+
+    const changed: string[] = [];
+    const stats = new Map<string, { mtimeMs: number; size: number }>();
+    for (const dbPath of dbPaths) {
+      const stat = shardStat(dbPath);
+      if (!stat) continue;
+      const known = this.shards.get(dbPath);
+      if (!known || known.mtimeMs !== stat.mtimeMs || known.size !== stat.size) {
+        changed.push(dbPath);
+        stats.set(dbPath, stat);
+      }
+    }
+
+    if (changed.length > 0) {
+      changed.forEach((dbPath) => this.dropShard(dbPath));
+      for (const dbPath of changed) {
+        this.shards.set(dbPath, { ...stats.get(dbPath)!, keys: new Set(), edges: 0 });
+      }
+      for (const row of this.loadEdges(changed)) {
+        this.addEdge(row);
+      }
+    }
+    if (changed.length > 0 || removedShards > 0) {
+      this.closures.clear();
+    }
+
+    return {
+      shards: this.shards.size,
+      changedShards: changed.length,
+      removedShards,
+      edges: this.edgeCount,
+      loadMs: Math.round((performance.now() - start) * 100) / 100,
+    };
+  }
+
+  /**
+   * Direct dependents of a symbol name or qualified name.
+   */
+  dependents(name: string): Dependent[] {
+    const key = normalizeTargetName(name);
+    const shards = this.byTarget.get(key);
+    if (!shards) return [];
+    const seen = new Set<string>();
+    const result: Dependent[] = [];
+    for (const list of shards.values()) {
+      for (const dep of list) {
+        if (!seen.has(dep.id)) {
+          seen.add(dep.id);
+          result.push(dep);
+        }
+      }
+    }
+    return result;
+  }
+
+  /**
+   * Transitive dependents of `name`, breadth-first, at most `maxDepth` levels deep.
+   */
+  closure(name: string, maxDepth: number): ImpactClosure {
+    const cacheKey = `${maxDepth}\0${normalizeTargetName(name)}`;
+    const hit = this.closures.get(cacheKey);
+    if (hit) {
+      // Refresh LRU position
+      this.closures.delete(cacheKey);
+      this.closures.set(cacheKey, hit);
+      return { ...hit, cached: true };
+    }
+
+    const levels: Dependent[][] = [];
+    const visited = new Set<string>();
+    const expanded = new Set<string>([normalizeTargetName(name)]);
+    let frontier = [name];
+    let total = 0;
+    let truncated = false;
+
+    while (frontier.length > 0) {
+      if (levels.length >= maxDepth) {
+        truncated = frontier.some((n) => this.dependents(n).some((dep) => !visited.has(dep.id)));
+        break;
+      }
+      const level: Dependent[] = [];
+      const next: string[] = [];
+      for (const target of frontier) {
+        for (const dep of this.dependents(target)) {
+          if (visited.has(dep.id)) continue;
+          if (total >= this.maxNodes) {
+            truncated = true;
+            break;
+          }
+          visited.add(dep.id);
+          level.push(dep);
+          total++;
+          const depKey = normalizeTargetName(dep.name);
+          if (!expanded.has(depKey)) {
+            expanded.add(depKey);
+            next.push(dep.name);
+          }
+        }
+      }
+      if (level.length === 0) break;
+      levels.push(level);
+      if (truncated) break;
+      frontier = next;
+    }
+
+    const result: ImpactClosure = {
+      levels,
+      affectedFiles: [...new Set(levels.flat().map((dep) => dep.file))],
+      maxDepth,
+      truncated,
+      cached: false,
+    };
+    this.closures.set(cacheKey, result);
+    if (this.closures.size > this.cacheSize) {
+      this.closures.delete(this.closures.keys().next().value as string);
+    }
+    return result;
+  }
+
+  get size(): { shards: number; edges: number; targets: number; cachedClosures: number } {
+    return { shards: this.shards.size, edges: this.edgeCount, targets: this.byTarget.size, cachedClosures: this.closures.size };
+  }
+
+  private addEdge(row: ReverseEdgeRow): void {
+    const state = this.shards.get(row.shard);
+    if (!state) return;
+    const dep: Dependent = {
+      id: `${row.sourceFile}:${row.sourceName}:${row.sourceLine}`,
+      name: row.sourceName,
+      file: row.sourceFile,
+      line: row.sourceLine,
+      type: row.relationshipType,
+    };
+    for (const key of targetKeys(row.target)) {
+      let shards = this.byTarget.get(key);
+      if (!shards) {
+        shards = new Map();
+        this.byTarget.set(key, shards);
+      }
+      let list = shards.get(row.shard);
+      if (!list) {
+        list = [];
+        shards.set(row.shard, list);
+      }
+      list.push(dep);
+      state.keys.add(key);
+    }
+    state.edges++;
+    this.edgeCount++;
+  }
+
+  private dropShard(dbPath: string): void {
+    const state = this.shards.get(dbPath);
+    if (!state) return;
+    for (const key of state.keys) {
+      const shards = this.byTarget.get(key);
+      if (!shards) continue;
+      shards.delete(dbPath);
+      if (shards.size === 0) this.byTarget.delete(key);
+    }
+    this.edgeCount -= state.edges;
+    this.shards.delete(dbPath);
+  }
+}
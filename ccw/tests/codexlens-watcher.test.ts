@@ -0,0 +1,168 @@
+/**
+ * Unit tests for the CodexLens index watcher (ccw/src/core/services/codexlens-watcher.ts)
+ *
+ * Drives the watcher through enqueue() with a fake applyBatch, so no
+ * filesystem events or codexlens CLI are needed.
+ * Uses Node's built-in test runner (node:test).
+ */
+
+import { describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { mkdtempSync, rmSync } from 'fs';
+import { tmpdir } from 'os';
+import { join } from 'path';
+
+import { CodexLensWatcher, type WatchBatch } from '../src/core/services/codexlens-watcher.js';
+
+function collectingWatcher(options: { debounceMs?: number; maxWaitMs?: number; failFirst?: boolean } = {}) {
+  const batches: WatchBatch[] = [];
+  let failures = options.failFirst ? 1 : 0;
+  const watcher = new CodexLensWatcher('/project', {
+    debounceMs: options.debounceMs ?? 20,
+    maxWaitMs: options.maxWaitMs,
+    applyBatch: async (batch) => {
+      batches.push(batch);
+      if (failures > 0) {
+        failures--;
+        throw new Error('sync failed');
+      }
+    },
+  });
+  return { watcher, batches };
+}
+
+describe('CodexLensWatcher', () => {
+  it('coalesces a burst of events into one batch', async () => {
+    const { watcher, batches } = collectingWatcher();
+    for (let i = 0; i < 50; i++) {
+      watcher.enqueue(`src/mod${i % 5}.ts`);
+    }
+    watcher.enqueue('/project/lib/util.py');
+    assert.equal(watcher.getStatus().queueDepth, 6);
+
+    await watcher.whenIdle();
+
+    assert.equal(batches.length, 1);
+    assert.deepEqual(batches[0].paths, ['lib/util.py', 'src/mod0.ts', 'src/mod1.ts', 'src/mod2.ts', 'src/mod3.ts', 'src/mod4.ts']);
+    const status = watcher.getStatus();
+    assert.equal(status.eventsSeen, 51);
+    assert.equal(status.eventsCoalesced, 45);
+    assert.equal(status.queueDepth, 0);
+    assert.equal(status.lastBatchSize, 6);
+  });
+
+  it('drops events from ignored directories and outside the project', async () => {
+    const { watcher, batches } = collectingWatcher();
+    watcher.enqueue('.codexlens/index.db');
+    watcher.enqueue('node_modules/pkg/index.js');
+    watcher.enqueue('/elsewhere/file.ts');
+    watcher.enqueue('src/app.ts');
+
+    await watcher.whenIdle();
+
+    assert.equal(watcher.getStatus().eventsIgnored, 3);
+    assert.deepEqual(batches.map((b) => b.paths), [['src/app.ts']]);
+  });
+
+  it('flushes by maxWaitMs while events keep arriving', async () => {
+    const { watcher, batches } = collectingWatcher({ debounceMs: 50, maxWaitMs: 60 });
+    const started = Date.now();
+    while (Date.now() - started < 150) {
+      watcher.enqueue('src/hot.ts');
+      await new Promise((resolve) => setTimeout(resolve, 10));
+    }
+    assert.ok(batches.length >= 1, 'a steady stream must not postpone every batch');
+    await watcher.whenIdle();
+  });
+
+  it('re-queues the paths of a failed batch', async () => {
+    const { watcher, batches } = collectingWatcher({ failFirst: true });
+    watcher.enqueue('src/a.ts');
+    await watcher.flush();
+
+    const failed = watcher.getStatus();
+    assert.equal(failed.batchesFailed, 1);
+    assert.equal(failed.lastError, 'sync failed');
+    assert.equal(failed.queueDepth, 1);
+
+    await watcher.flush();
+    assert.equal(batches.length, 2);
+    assert.deepEqual(batches[1].paths, ['src/a.ts']);
+    assert.equal(watcher.getStatus().lastError, null);
+  });
+
+  it('backs off exponentially between retries and gives up after maxRetries', async () => {
+    const projectPath = mkdtempSync(join(tmpdir(), 'codexlens-watcher-'));
+    const attempts: number[] = [];
+    const watcher = new CodexLensWatcher(projectPath, {
+      debounceMs: 5,
+      retryBaseMs: 20,
+      maxRetries: 2,
+      applyBatch: async () => {
+        attempts.push(Date.now());
+        throw new Error('codexlens-search not found');
+      },
+    });
+    try {
+      watcher.start();
+      watcher.enqueue('src/a.ts');
+      await new Promise((resolve) => setTimeout(resolve, 10));
+      assert.equal(watcher.getStatus().state, 'backoff');
+      assert.ok(watcher.getStatus().nextRetryAt);
+
+      // Events during backoff must not trigger an early retry
+      watcher.enqueue('src/b.ts');
+      await watcher.whenIdle();
+
+      assert.equal(attempts.length, 3, 'first attempt plus maxRetries retries');
+      assert.ok(attempts[1] - attempts[0] >= 18, 'first retry waits retryBaseMs');
+      assert.ok(attempts[2] - attempts[1] >= 38, 'second retry waits twice as long');
+      const status = watcher.getStatus();
+      assert.equal(status.state, 'failed');
+      assert.equal(status.consecutiveFailures, 3);
+      assert.equal(status.queueDepth, 2);
+      assert.equal(status.lastError, 'codexlens-search not found');
+
+      // Nothing more runs until resume()
+      await new Promise((resolve) => setTimeout(resolve, 100));
+      assert.equal(attempts.length, 3);
+    } finally {
+      watcher.stop();
+      rmSync(projectPath, { recursive: true, force: true });
+    }
+  });
+
+  it('resumes a failed watcher and clears the failure state on success', async () => {
+    const projectPath = mkdtempSync(join(tmpdir(), 'codexlens-watcher-'));
+    let failing = true;
+    const batches: WatchBatch[] = [];
+    const watcher = new CodexLensWatcher(projectPath, {
+      debounceMs: 5,
+      retryBaseMs: 5,
+      maxRetries: 0,
+      applyBatch: async (batch) => {
+        batches.push(batch);
+        if (failing) throw new Error('broken index');
+      },
+    });
+    try {
+      watcher.start();
+      watcher.enqueue('src/a.ts');
+      await watcher.whenIdle();
+      assert.equal(watcher.getStatus().state, 'failed');
+
+      failing = false;
+      watcher.resume();
+      await watcher.whenIdle();
+
+      assert.equal(batches.length, 2);
+      const status = watcher.getStatus();
+      assert.equal(status.state, 'idle');
+      assert.equal(status.consecutiveFailures, 0);
+      assert.equal(status.lastError, null);
+    } finally {
+      watcher.stop();
+      rmSync(projectPath, { recursive: true, force: true });
+    }
+  });
+});
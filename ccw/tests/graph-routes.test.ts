@@ -3,18 +3,70 @@
  *
  * Notes:
  * - Targets runtime implementation shipped in `ccw/dist`.
- * - Focuses on path validation behavior (rejects paths outside initialPath).
+ * - Focuses on path validation behavior (rejects paths outside initialPath),
+ *   shard fan-out and impact analysis over the reverse-edge index.
  */
 
 import { after, before, describe, it, mock } from 'node:test';
 import assert from 'node:assert/strict';
 import http from 'node:http';
-import { mkdtempSync, rmSync } from 'node:fs';
+import { mkdirSync, mkdtempSync, realpathSync, rmSync } from 'node:fs';
 import { tmpdir } from 'node:os';
 import { join } from 'node:path';
+import Database from 'better-sqlite3';
 
 const PROJECT_ROOT = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-project-'));
 const OUTSIDE_ROOT = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-outside-'));
+const INDEX_DIR = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-index-'));
+const SHARDED_ROOT = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-sharded-'));
+const IMPACT_INDEX_DIR = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-impact-index-'));
+const IMPACT_ROOT = mkdtempSync(join(tmpdir(), 'ccw-graph-routes-impact-'));
+
+const originalEnv = {
+  CODEXLENS_INDEX_DIR: process.env.CODEXLENS_INDEX_DIR,
+};
+
+/**
+ * Write a minimal codex-lens shard with one function symbol per file.
+ * withSymbols=false leaves out the symbols table to simulate a broken shard.
+ */
+function writeShard(dir: string, files: string[], withSymbols = true): void {
+  mkdirSync(dir, { recursive: true });
+  const db = new Database(join(dir, '_index.db'));
+  db.exec('CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, full_path TEXT)');
+  if (withSymbols) {
+    db.exec('CREATE TABLE symbols (id INTEGER PRIMARY KEY, file_id INTEGER, name TEXT, kind TEXT, start_line INTEGER, end_line INTEGER)');
+  }
+  files.forEach((fullPath, i) => {
+    db.prepare('INSERT INTO files (id, name, full_path) VALUES (?, ?, ?)').run(i + 1, fullPath.split('/').pop(), fullPath);
+    if (withSymbols) {
+      db.prepare('INSERT INTO symbols (file_id, name, kind, start_line, end_line) VALUES (?, ?, ?, ?, ?)')
+        .run(i + 1, `fn${i}`, 'function', 1, 2);
+    }
+  });
+  db.close();
+}
+
+/**
+ * Write a shard whose symbols reference other symbols through code_relationships.
+ */
+function writeRelationshipShard(dir: string, symbols: Array<{ file: string; name: string; line: number; calls: string[] }>): void {
+  mkdirSync(dir, { recursive: true });
+  const db = new Database(join(dir, '_index.db'));
+  db.exec('CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, full_path TEXT)');
+  db.exec('CREATE TABLE symbols (id INTEGER PRIMARY KEY, file_id INTEGER, name TEXT, kind TEXT, start_line INTEGER, end_line INTEGER)');
+  db.exec('CREATE TABLE code_relationships (id INTEGER PRIMARY KEY, source_symbol_id INTEGER, target_qualified_name TEXT, relationship_type TEXT, source_line INTEGER, target_file TEXT)');
+  symbols.forEach((symbol, i) => {
+    db.prepare('INSERT INTO files (id, name, full_path) VALUES (?, ?, ?)').run(i + 1, symbol.file.split('/').pop(), symbol.file);
+    db.prepare('INSERT INTO symbols (id, file_id, name, kind, start_line, end_line) VALUES (?, ?, ?, ?, ?, ?)')
+      .run(i + 1, i + 1, symbol.name, 'function', symbol.line, symbol.line + 1);
+    for (const target of symbol.calls) {
+      db.prepare('INSERT INTO code_relationships (source_symbol_id, target_qualified_name, relationship_type, source_line) VALUES (?, ?, ?, ?)')
+        .run(i + 1, target, 'call', symbol.line);
+    }
+  });
+  db.close();
+}
 
 const graphRoutesUrl = new URL('../dist/core/routes/graph-routes.js', import.meta.url);
 graphRoutesUrl.searchParams.set('t', String(Date.now()));
@@ -143,3 +195,134 @@ describe('graph routes path validation', async () => {
   });
 });
 
+describe('graph routes shard fan-out', async () => {
+  before(async () => {
+    mock.method(console, 'log', () => {});
+    mock.method(console, 'error', () => {});
+    process.env.CODEXLENS_INDEX_DIR = INDEX_DIR;
+    mod = await import(graphRoutesUrl.href);
+
+    // Root shard plus 10 directory shards spans two ATTACH groups of 8
+    const projectIndex = join(INDEX_DIR, realpathSync(SHARDED_ROOT).replace(/\\/g, '/').replace(/^([A-Za-z]):/, '$1').replace(/^\//, ''));
+    writeShard(projectIndex, ['/src/root.ts']);
+    for (let i = 0; i < 10; i++) {
+      const name = `d${String(i).padStart(2, '0')}`;
+      writeShard(join(projectIndex, name), [`/src/${name}/a.ts`, `/src/${name}/b.ts`], name !== 'd09');
+    }
+  });
+
+  after(() => {
+    mock.restoreAll();
+    process.env.CODEXLENS_INDEX_DIR = originalEnv.CODEXLENS_INDEX_DIR;
+    if (originalEnv.CODEXLENS_INDEX_DIR === undefined) delete process.env.CODEXLENS_INDEX_DIR;
+    rmSync(INDEX_DIR, { recursive: true, force: true });
+    rmSync(SHARDED_ROOT, { recursive: true, force: true });
+  });
+
+  it('GET /api/graph/nodes reads every shard through grouped ATTACH', async () => {
+    const { server, baseUrl } = await createServer(SHARDED_ROOT);
+    try {
+      const res = await requestJson(baseUrl, 'GET', '/api/graph/nodes');
+      assert.equal(res.status, 200);
+      assert.equal(res.json.total, 1 + 9 * 2);
+      assert.deepEqual(res.json.nodes.slice(0, 3).map((n: any) => n.file), ['/src/root.ts', '/src/d00/a.ts', '/src/d00/b.ts']);
+      assert.equal(res.json.fanOut.shards, 11);
+      assert.equal(res.json.fanOut.groups, 2);
+      // The group holding the shard without a symbols table falls back to per-shard reads
+      assert.equal(res.json.fanOut.fallbackShards, 3);
+      assert.equal(res.json.fanOut.failedShards, 1);
+    } finally {
+      await new Promise<void>((resolve) => server.close(() => resolve()));
+    }
+  });
+
+  it('GET /api/graph/files lists files across all shards', async () => {
+    const { server, baseUrl } = await createServer(SHARDED_ROOT);
+    try {
+      const res = await requestJson(baseUrl, 'GET', '/api/graph/files');
+      assert.equal(res.status, 200);
+      assert.equal(res.json.files.length, 1 + 10 * 2);
+      assert.equal(res.json.fanOut.failedShards, 0);
+    } finally {
+      await new Promise<void>((resolve) => server.close(() => resolve()));
+    }
+  });
+});
+
+describe('graph routes impact analysis', async () => {
+  let projectIndex = '';
+
+  before(async () => {
+    mock.method(console, 'log', () => {});
+    mock.method(console, 'error', () => {});
+    process.env.CODEXLENS_INDEX_DIR = IMPACT_INDEX_DIR;
+    mod = await import(graphRoutesUrl.href);
+
+    // parse <- load (root shard) <- main (api shard) <- cli (cli shard); parser_test calls reparse,
+    // which a substring match on 'parse' would wrongly report
+    projectIndex = join(IMPACT_INDEX_DIR, realpathSync(IMPACT_ROOT).replace(/\\/g, '/').replace(/^([A-Za-z]):/, '$1').replace(/^\//, ''));
+    writeRelationshipShard(projectIndex, [
+      { file: '/src/core.py', name: 'parse', line: 1, calls: [] },
+      { file: '/src/core.py', name: 'load', line: 10, calls: ['core.parse'] },
+    ]);
+    writeRelationshipShard(join(projectIndex, 'api'), [
+      { file: '/src/api/main.py', name: 'main', line: 5, calls: ['src.core.load'] },
+      { file: '/src/api/tests.py', name: 'parser_test', line: 2, calls: ['reparse'] },
+    ]);
+    writeRelationshipShard(join(projectIndex, 'cli'), [
+      { file: '/src/cli/run.py', name: 'cli', line: 7, calls: ['main'] },
+    ]);
+  });
+
+  after(() => {
+    mock.restoreAll();
+    process.env.CODEXLENS_INDEX_DIR = originalEnv.CODEXLENS_INDEX_DIR;
+    if (originalEnv.CODEXLENS_INDEX_DIR === undefined) delete process.env.CODEXLENS_INDEX_DIR;
+    rmSync(IMPACT_INDEX_DIR, { recursive: true, force: true });
+    rmSync(IMPACT_ROOT, { recursive: true, force: true });
+  });
+
+  it('GET /api/graph/impact returns direct and transitive dependents across shards', async () => {
+    const { server, baseUrl } = await createServer(IMPACT_ROOT);
+    try {
+      const res = await requestJson(baseUrl, 'GET', '/api/graph/impact?symbol=' + encodeURIComponent('/src/core.py:parse:1'));
+      assert.equal(res.status, 200);
+      assert.deepEqual(res.json.directDependents, ['/src/core.py:load:10']);
+      assert.deepEqual(res.json.transitiveDependents, [
+        { id: '/src/api/main.py:main:5', depth: 2 },
+        { id: '/src/cli/run.py:cli:7', depth: 3 },
+      ]);
+      assert.deepEqual(res.json.affectedFiles, ['/src/core.py', '/src/api/main.py', '/src/cli/run.py']);
+      assert.equal(res.json.truncated, false);
+      assert.equal(res.json.index.shards, 3);
+
+      const shallow = await requestJson(baseUrl, 'GET', '/api/graph/impact?symbol=parse&depth=2');
+      assert.equal(shallow.json.transitiveDependents.length, 1);
+      assert.equal(shallow.json.truncated, true);
+
+      const again = await requestJson(baseUrl, 'GET', '/api/graph/impact?symbol=parse');
+      assert.equal(again.json.index.changedShards, 0);
+      assert.equal(again.json.index.cached, true);
+    } finally {
+      await new Promise<void>((resolve) => server.close(() => resolve()));
+    }
+  });
+
+  it('re-reads only a shard that was re-indexed', async () => {
+    const { server, baseUrl } = await createServer(IMPACT_ROOT);
+    try {
+      await requestJson(baseUrl, 'GET', '/api/graph/impact?symbol=parse');
+      rmSync(join(projectIndex, 'cli', '_index.db'));
+      writeRelationshipShard(join(projectIndex, 'cli'), [
+        { file: '/src/cli/run.py', name: 'cli', line: 7, calls: [] },
+      ]);
+
+      const res = await requestJson(baseUrl, 'GET', '/api/graph/impact?symbol=parse');
+      assert.equal(res.json.index.changedShards, 1);
+      assert.equal(res.json.index.cached, false);
+      assert.deepEqual(res.json.transitiveDependents, [{ id: '/src/api/main.py:main:5', depth: 2 }]);
+    } finally {
+      await new Promise<void>((resolve) => server.close(() => resolve()));
+    }
+  });
+});
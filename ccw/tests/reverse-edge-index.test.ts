@@ -0,0 +1,219 @@
+/**
+ * Unit tests and timings for the reverse-edge index (ccw/src/core/services/reverse-edge-index.ts)
+ *
+ * The benchmark cases build a deep call chain and a wide fan-in graph as
+ * real SQLite shards and time the transitive closure through the index
+ * against the previous approach: one `LIKE '%name%'` query per shard for
+ * every symbol on the frontier. Timings are reported as test diagnostics.
+ * Uses Node's built-in test runner (node:test).
+ */
+
+import { after, describe, it } from 'node:test';
+import assert from 'node:assert/strict';
+import { mkdirSync, mkdtempSync, rmSync, writeFileSync } from 'node:fs';
+import { tmpdir } from 'node:os';
+import { join } from 'node:path';
+import Database from 'better-sqlite3';
+
+import {
+  ReverseEdgeIndex,
+  normalizeTargetName,
+  targetKeys,
+  type ReverseEdgeRow,
+} from '../src/core/services/reverse-edge-index.js';
+
+const TMP_ROOT = mkdtempSync(join(tmpdir(), 'ccw-reverse-edge-index-'));
+
+function edge(shard: string, sourceName: string, target: string, line = 1): ReverseEdgeRow {
+  return { shard, sourceName, sourceFile: `/src/${sourceName}.ts`, sourceLine: line, target, relationshipType: 'CALLS' };
+}
+
+/**
+ * Write rows into `shards` SQLite shards with the codex-lens relationship schema.
+ * Returns the shard paths and an in-memory loader for the index.
+ */
+function writeGraph(name: string, rows: Array<{ source: string; target: string }>, shards: number) {
+  const dbPaths: string[] = [];
+  const byShard = new Map<string, ReverseEdgeRow[]>();
+  for (let s = 0; s < shards; s++) {
+    const dir = join(TMP_ROOT, name, `d${s}`);
+    mkdirSync(dir, { recursive: true });
+    dbPaths.push(join(dir, '_index.db'));
+    byShard.set(dbPaths[s], []);
+  }
+  const dbs = dbPaths.map((dbPath) => {
+    const db = new Database(dbPath);
+    db.exec('CREATE TABLE files (id INTEGER PRIMARY KEY, full_path TEXT)');
+    db.exec('CREATE TABLE symbols (id INTEGER PRIMARY KEY, file_id INTEGER, name TEXT, start_line INTEGER)');
+    db.exec('CREATE TABLE code_relationships (id INTEGER PRIMARY KEY, source_symbol_id INTEGER, target_qualified_name TEXT, relationship_type TEXT)');
+    return db;
+  });
+  rows.forEach((row, i) => {
+    const s = i % shards;
+    const db = dbs[s];
+    db.prepare('INSERT INTO files (id, full_path) VALUES (?, ?)').run(i + 1, `/src/${row.source}.ts`);
+    db.prepare('INSERT INTO symbols (id, file_id, name, start_line) VALUES (?, ?, ?, 1)').run(i + 1, i + 1, row.source);
+    db.prepare('INSERT INTO code_relationships (source_symbol_id, target_qualified_name, relationship_type) VALUES (?, ?, ?)')
+      .run(i + 1, row.target, 'call');
+    byShard.get(dbPaths[s])!.push(edge(dbPaths[s], row.source, row.target));
+  });
+  dbs.forEach((db) => db.close());
+  return { dbPaths, loadEdges: (paths: string[]) => paths.flatMap((p) => byShard.get(p) ?? []) };
+}
+
+/**
+ * The pre-index approach: a LIKE scan of every shard per frontier symbol
+ */
+function likeClosure(dbPaths: string[], name: string, maxDepth: number): number {
+  const dbs = dbPaths.map((dbPath) => new Database(dbPath, { readonly: true }));
+  const statements = dbs.map((db) => db.prepare(`
+    SELECT DISTINCT s.name as dependent_name, f.full_path as dependent_file, s.start_line as dependent_line
+    FROM code_relationships r
+    JOIN symbols s ON r.source_symbol_id = s.id
+    JOIN files f ON s.file_id = f.id
+    WHERE r.target_qualified_name LIKE ?
+  `));
+  const seen = new Set<string>();
+  let frontier = [name];
+  for (let depth = 0; depth < maxDepth && frontier.length > 0; depth++) {
+    const next: string[] = [];
+    for (const target of frontier) {
+      for (const statement of statements) {
+        for (const row of statement.all(`%${target}%`) as any[]) {
+          const id = `${row.dependent_file}:${row.dependent_name}:${row.dependent_line}`;
+          if (!seen.has(id)) {
+            seen.add(id);
+            next.push(row.dependent_name);
+          }
+        }
+      }
+    }
+    frontier = next;
+  }
+  dbs.forEach((db) => db.close());
+  return seen.size;
+}
+
+function timeMs(fn: () => void): number {
+  const start = performance.now();
+  fn();
+  return Math.round((performance.now() - start) * 100) / 100;
+}
+
+after(() => {
+  rmSync(TMP_ROOT, { recursive: true, force: true });
+});
+
+describe('normalizeTargetName', () => {
+  it('unifies separators, call parens, generics and case', () => {
+    assert.equal(normalizeTargetName('Foo::Bar<T>::baz()'), 'foo.bar.baz');
+    assert.equal(normalizeTargetName('src/utils/helper'), 'src.utils.helper');
+    assert.deepEqual(targetKeys('pkg.Module.run'), ['pkg.module.run', 'run']);
+    assert.deepEqual(targetKeys('run'), ['run']);
+  });
+});
+
+describe('ReverseEdgeIndex', () => {
+  it('resolves qualified and bare names and walks dependents by depth', () => {
+    const { dbPaths, loadEdges } = writeGraph('small', [
+      { source: 'load', target: 'core.parse' },
+      { source: 'main', target: 'app.load()' },
+      { source: 'cli', target: 'main' },
+      { source: 'reparse_all', target: 'reparse' },
+    ], 2);
+    const index = new ReverseEdgeIndex({ loadEdges });
+    index.refresh(dbPaths);
+
+    assert.deepEqual(index.dependents('core.parse').map((d) => d.name), ['load']);
+    assert.deepEqual(index.dependents('parse').map((d) => d.name), ['load']);
+
+    const closure = index.closure('parse', 5);
+    assert.deepEqual(closure.levels.map((level) => level.map((d) => d.name)), [['load'], ['main'], ['cli']]);
+    assert.equal(closure.truncated, false);
+    assert.equal(index.closure('parse', 5).cached, true);
+
+    const shallow = index.closure('parse', 2);
+    assert.equal(shallow.levels.length, 2);
+    assert.equal(shallow.truncated, true);
+  });
+
+  it('re-reads only changed shards and drops removed ones', () => {
+    const { dbPaths, loadEdges } = writeGraph('refresh', [
+      { source: 'a', target: 'x' },
+      { source: 'b', target: 'x' },
+    ], 2);
+    const loaded: string[][] = [];
+    const index = new ReverseEdgeIndex({ loadEdges: (paths) => { loaded.push(paths); return loadEdges(paths); } });
+
+    assert.equal(index.refresh(dbPaths).changedShards, 2);
+    assert.equal(index.refresh(dbPaths).changedShards, 0);
+    index.closure('x', 3);
+
+    writeFileSync(`${dbPaths[1]}-wal`, 'pending write');
+    const stats = index.refresh(dbPaths);
+    assert.equal(stats.changedShards, 1);
+    assert.deepEqual(loaded[loaded.length - 1], [dbPaths[1]]);
+    assert.equal(index.closure('x', 3).cached, false);
+    assert.equal(index.dependents('x').length, 2);
+
+    const removed = index.refresh([dbPaths[0]]);
+    assert.equal(removed.removedShards, 1);
+    assert.equal(removed.edges, 1);
+    assert.deepEqual(index.dependents('x').map((d) => d.name), ['a']);
+  });
+
+  it('stops wide walks at maxNodes', () => {
+    const rows = Array.from({ length: 50 }, (_, i) => ({ source: `caller${i}`, target: 'hub' }));
+    const { dbPaths, loadEdges } = writeGraph('capped', rows, 1);
+    const index = new ReverseEdgeIndex({ loadEdges, maxNodes: 10 });
+    index.refresh(dbPaths);
+    const closure = index.closure('hub', 3);
+    assert.equal(closure.levels[0].length, 10);
+    assert.equal(closure.truncated, true);
+  });
+});
+
+describe('ReverseEdgeIndex timings', () => {
+  it('deep chain: 400 levels over 16 shards', (t) => {
+    const depth = 400;
+    const rows = Array.from({ length: depth }, (_, i) => ({ source: `step${i + 1}`, target: `chain.step${i}` }));
+    const { dbPaths, loadEdges } = writeGraph('deep', rows, 16);
+    const index = new ReverseEdgeIndex({ loadEdges });
+
+    const buildMs = timeMs(() => index.refresh(dbPaths));
+    const refreshMs = timeMs(() => index.refresh(dbPaths));
+    let closure = index.closure('step0', depth);
+    const coldMs = timeMs(() => { index.refresh([]); index.refresh(dbPaths); closure = index.closure('step0', depth); });
+    const cachedMs = timeMs(() => index.closure('step0', depth));
+    // step1 LIKE-matches step10..step19, step100.. too, so the old scan also over-reports
+    let likeCount = 0;
+    const likeMs = timeMs(() => { likeCount = likeClosure(dbPaths, 'step0', depth); });
+
+    assert.equal(closure.levels.length, depth);
+    assert.equal(closure.levels.flat().length, depth);
+    t.diagnostic(`deep: build ${buildMs}ms, no-op refresh ${refreshMs}ms, rebuild+closure ${coldMs}ms, ` +
+      `cached closure ${cachedMs}ms; LIKE scan ${likeMs}ms (${likeCount} dependents reported)`);
+  });
+
+  it('wide fan-in: 20000 direct dependents, 2 levels, over 16 shards', (t) => {
+    const rows = [
+      ...Array.from({ length: 20000 }, (_, i) => ({ source: `user${i}`, target: 'lib.hub' })),
+      ...Array.from({ length: 2000 }, (_, i) => ({ source: `top${i}`, target: `user${i * 10}` })),
+    ];
+    const { dbPaths, loadEdges } = writeGraph('wide', rows, 16);
+    const index = new ReverseEdgeIndex({ loadEdges, maxNodes: 50000 });
+
+    const buildMs = timeMs(() => index.refresh(dbPaths));
+    let closure = index.closure('hub', 2);
+    index.refresh([]);
+    index.refresh(dbPaths);
+    const closureMs = timeMs(() => { closure = index.closure('hub', 2); });
+    const cachedMs = timeMs(() => index.closure('hub', 2));
+    const directLikeMs = timeMs(() => likeClosure(dbPaths, 'hub', 1));
+
+    assert.equal(closure.levels[0].length, 20000);
+    assert.equal(closure.levels[1].length, 2000);
+    t.diagnostic(`wide: build ${buildMs}ms, closure ${closureMs}ms, cached ${cachedMs}ms; ` +
+      `LIKE scan for direct dependents only ${directLikeMs}ms (the transitive LIKE walk would run 20000 x 16 scans)`);
+  });
+});